@@ -0,0 +1 @@
+# This package contains the benchmarks of the parsing, cleaning, and loading code.
@@ -0,0 +1,124 @@
+"""
+Benchmark the cached release date normalizer against the original DatePipeline code.
+
+From the actors_repo directory, run:
+    python -m benchmarks.date_bench [--archive ARCHIVE_PATH] [--repeat N]
+
+The corpus is a set of release dates in the forms found in film infoboxes, each repeated as often as
+release dates repeat across films, or, with --archive, the release dates extracted from the film pages
+stored in a ResponseArchive (see ARCHIVE_MODE). The dates/sec of each implementation is reported (for
+normalize_date, without its cache, with the cache cleared before each pass, which only the first occurrence
+of each distinct date misses, and with the cache warmed by a previous pass), along with the share of the
+dates each one parses, and the dates they parse differently.
+"""
+import argparse
+import time
+
+from typing import Callable, List, Optional, Text, Tuple
+
+from benchmarks import legacy
+from data_collection.archive import ResponseArchive
+from data_collection.dates import normalize_date
+from data_collection.infobox import extract_film
+from data_collection.spiders.actors_wiki_spider import is_film_page
+
+# Release dates as they come out of the infoboxes: a single date, a list of releases, or a partial date.
+CORPUS = ["June 15, 2005",
+          "June 15, 2005 (United States)",
+          "May 19, 2005 (Cannes) June 15, 2005 (United States)",
+          "15 June 2005",
+          "15 June 2005 (United Kingdom)",
+          "2005-06-15",
+          "2005/06/15",
+          "2005 6 15",
+          "2005-06",
+          "6/2005",
+          "2005",
+          "June 2005",
+          "2005 June",
+          "2005-Jun-15",
+          "Jun 15, 2005",
+          "Sept 9, 2005",
+          "Sep 9, 2005",
+          "December 25, 2009",
+          "January 1, 2003",
+          "February 29, 2004",
+          "February 30, 2005",
+          "Summer 2005",
+          "Fall 2005",
+          "2005 (limited)",
+          "TBA",
+          "Unreleased",
+          "",
+          ]
+
+
+def archive_dates(archive_path: Text) -> List[Text]:
+    """
+    Extract the release date of each film page stored in the archive.
+    """
+    archive = ResponseArchive(archive_path)
+    dates = []
+    for url in archive.urls(include_redirects=False):
+        if is_film_page(url):
+            release_date = extract_film(archive.retrieve(url))["release_date"]
+            if release_date:
+                dates.append(release_date)
+    archive.close()
+    return dates
+
+
+def legacy_normalize(release_date: Text) -> Optional[Text]:
+    """
+    Run the original code, which raised a ValueError on some dates instead of dropping the item.
+    """
+    try:
+        return legacy.clean_release_date(release_date)
+    except ValueError:
+        return None
+
+
+def run(normalize: Callable[[Text], Optional[Text]], dates: List[Text], repeat: int,
+        clear_cache: bool) -> Tuple[float, List]:
+    """
+    Normalize every date, and return the best total time and the results.
+    """
+    best = float("inf")
+    results = []
+    for _ in range(repeat):
+        if clear_cache:
+            normalize_date.cache_clear()
+        start = time.perf_counter()
+        results = [normalize(release_date) for release_date in dates]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive", help="the path of a ResponseArchive to take the release dates from")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Each distinct date is shared by about twenty films in a year of films.
+    dates = archive_dates(args.archive) if args.archive else CORPUS * 200
+    print(f"{len(dates)} release dates, {len(set(dates))} distinct")
+    runs = [("original DatePipeline", legacy_normalize, True),
+            ("normalize_date (uncached)", normalize_date.__wrapped__, True),
+            ("normalize_date (cache cleared per pass)", normalize_date, True),
+            ("normalize_date (warm)", normalize_date, False)]
+    results = {}
+    for name, normalize, clear_cache in runs:
+        best, results[name] = run(normalize, dates, args.repeat, clear_cache)
+        parsed = sum(result is not None for result in results[name])
+        print(f"  {name:>39}: {len(dates) / best:10.1f} dates/sec, {parsed / len(dates):7.2%} parsed")
+
+    before, after = results["original DatePipeline"], results["normalize_date (uncached)"]
+    differences = sorted({(release_date, old, new) for release_date, old, new in zip(dates, before, after) if old != new})
+    print(f"{len(differences)} distinct dates parsed differently:")
+    for release_date, old, new in differences:
+        print(f"  {release_date!r}: {old!r} -> {new!r}")
+
+
+if __name__ == "__main__":
+    main()
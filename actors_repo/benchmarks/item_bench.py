@@ -0,0 +1,106 @@
+"""
+Measure the memory taken by the slotted dataclass items against the original scrapy.Item classes.
+
+From the actors_repo directory, run:
+    python -m benchmarks.item_bench [--count N] [--archive ARCHIVE_PATH]
+
+N items of each class are built with the fields the spider fills in, and the bytes allocated per item
+are reported for both implementations (the field values are shared, so only the items themselves are
+counted). With --archive, a crawl is also replayed from a ResponseArchive (see ARCHIVE_MODE) once with
+each implementation, in a fresh process, through the cleaning pipelines (without DBPipeline, so no
+database is needed); every scraped item is kept until the crawl ends, as items pile up when the
+pipelines fall behind, and the number of items and the peak RSS of the process are reported.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+from decimal import Decimal
+from typing import Callable, Dict, Text
+
+from benchmarks import legacy
+from data_collection import items
+from data_collection.spiders import actors_wiki_spider
+
+# The fields of each item class, with values like the ones the spider produces.
+FIELDS = {"CastItem": {"film": "The Film", "actor_name": "An Actor"},
+          "DirectorItem": {"film": "The Film", "director": "A Director"},
+          "DistributorItem": {"film": "The Film", "distributor": "A Distributor"},
+          "MovieItem": {"film": "The Film", "budget": Decimal("12.500000"),
+                        "box_office": Decimal("100.000000"), "release_date": "2005-06-15"},
+          "ProductionCoItem": {"film": "The Film", "prod_co": "A Production Company"}
+          }
+
+
+def bytes_per_item(item_class: Callable, fields: Dict, count: int) -> float:
+    """
+    Get the memory allocated per item while count items of the class are held at once.
+    """
+    tracemalloc.start()
+    built = [item_class(**fields) for _ in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size / count
+
+
+def crawl(archive_path: Text, implementation: Text) -> Dict:
+    """
+    Replay a crawl from the archive, keeping every scraped item, and return the item count and peak RSS.
+    """
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    if implementation == "scrapy":
+        for name, item_class in legacy.SCRAPY_ITEMS.items():
+            setattr(actors_wiki_spider, name, item_class)
+    settings = get_project_settings()
+    settings.set("ARCHIVE_MODE", "replay")
+    settings.set("ARCHIVE_PATH", archive_path)
+    settings.set("ITEM_PIPELINES", {"data_collection.pipelines.DropEmptyPipeline": 100,
+                                    "data_collection.pipelines.DatePipeline": 300,
+                                    "data_collection.pipelines.MoneyPipeline": 600})
+    settings.set("LOG_FILE", None)
+    settings.set("LOG_ENABLED", False)
+    kept = []
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(actors_wiki_spider.Actorswiki)
+    crawler.signals.connect(lambda item, **kwargs: kept.append(item), signal=signals.item_scraped, weak=False)
+    process.crawl(crawler)
+    process.start()
+    # ru_maxrss is in kilobytes on Linux.
+    return {"items": len(kept), "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000, help="the number of items built per class")
+    parser.add_argument("--archive", help="the path of a ResponseArchive to replay a crawl from")
+    parser.add_argument("--crawl", choices=["scrapy", "slotted"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crawl:
+        print(json.dumps(crawl(args.archive, args.crawl)))
+        return
+
+    print(f"bytes per item ({args.count} items per class):")
+    for name, fields in FIELDS.items():
+        before = bytes_per_item(legacy.SCRAPY_ITEMS[name], fields, args.count)
+        after = bytes_per_item(getattr(items, name), fields, args.count)
+        print(f"  {name:>16}: scrapy.Item {before:7.1f}, slotted {after:7.1f} ({after / before:.0%})")
+
+    if args.archive:
+        print(f"replayed crawl from {args.archive}:")
+        for implementation in ["scrapy", "slotted"]:
+            command = [sys.executable, "-m", "benchmarks.item_bench", "--archive", args.archive, "--crawl", implementation]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"  {implementation:>7}: {result['items']} items, peak RSS {result['peak_rss'] / 2 ** 20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark the cached money parser against the original MoneyPipeline code.
+
+From the actors_repo directory, run:
+    python -m benchmarks.money_bench [--archive ARCHIVE_PATH] [--repeat N]
+
+The corpus is a set of budgets and box offices in the forms found in film infoboxes, each repeated as
+often as such strings repeat across films, or, with --archive, the budgets and box offices extracted
+from the film pages stored in a ResponseArchive (see ARCHIVE_MODE). The strings/sec of each
+implementation is reported (for parse_money, both with an empty cache and with the cache warmed by a
+previous pass), along with the strings parse_money cannot parse (which the original code turned into
+0.000001), and the strings the two implementations parse to different amounts.
+"""
+import argparse
+import time
+
+from decimal import Decimal
+from typing import Callable, List, Optional, Text, Tuple
+
+from benchmarks import legacy
+from data_collection.archive import ResponseArchive
+from data_collection.infobox import extract_film
+from data_collection.money import parse_money
+from data_collection.spiders.actors_wiki_spider import is_film_page
+
+# Budgets and box offices as they come out of the infoboxes.
+CORPUS = ["$12.5 million",
+          "$12.5\xa0million",
+          "$100 million[1]",
+          "$1.2 billion",
+          "$1.084 billion[3]",
+          "$15,000,000",
+          "$850,000",
+          "$10–12 million",
+          "$10-12 million",
+          "$150–200 million[2]",
+          "$10 million to $12 million",
+          "$40 million – $50 million",
+          "US$50 million",
+          "est. $10 million",
+          "over $100 million",
+          "$533.3 million",
+          "$500 thousand",
+          "£5.5 million",
+          "N/A",
+          "Unknown",
+          "",
+          ]
+
+
+def archive_money(archive_path: Text) -> List[Text]:
+    """
+    Extract the budget and box office of each film page stored in the archive.
+    """
+    archive = ResponseArchive(archive_path)
+    strings = []
+    for url in archive.urls(include_redirects=False):
+        if is_film_page(url):
+            fields = extract_film(archive.retrieve(url))
+            strings.extend(fields[field] for field in ["budget", "box_office"] if fields[field])
+    archive.close()
+    return strings
+
+
+def legacy_parse(money: Text) -> Optional[Decimal]:
+    """
+    Run the original code, turning its string into a Decimal.
+    """
+    return Decimal(legacy.number_cleaner(money))
+
+
+def run(parse: Callable[[Text], Optional[Decimal]], strings: List[Text], repeat: int,
+        clear_cache: bool) -> Tuple[float, List]:
+    """
+    Parse every string, and return the best total time and the results.
+    """
+    best = float("inf")
+    results = []
+    for _ in range(repeat):
+        if clear_cache:
+            parse_money.cache_clear()
+        start = time.perf_counter()
+        results = [parse(money) for money in strings]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive", help="the path of a ResponseArchive to take the budgets and box offices from")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    strings = archive_money(args.archive) if args.archive else [money for money in CORPUS if money] * 200
+    print(f"{len(strings)} budgets and box offices, {len(set(strings))} distinct")
+    runs = [("original MoneyPipeline", legacy_parse, True),
+            ("parse_money (cold)", parse_money, True),
+            ("parse_money (warm)", parse_money, False)]
+    results = {}
+    for name, parse, clear_cache in runs:
+        best, results[name] = run(parse, strings, args.repeat, clear_cache)
+        print(f"  {name:>22}: {len(strings) / best:10.1f} strings/sec")
+
+    before, after, _ = results.values()
+    failures = sorted({money for money, new in zip(strings, after) if new is None})
+    print(f"{len(failures)} distinct strings parse_money cannot parse:")
+    for money in failures:
+        print(f"  {money!r}")
+    differences = sorted({(money, old, new) for money, old, new in zip(strings, before, after)
+                          if new is not None and old != new})
+    print(f"{len(differences)} distinct strings parsed to different amounts:")
+    for money, old, new in differences:
+        print(f"  {money!r}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
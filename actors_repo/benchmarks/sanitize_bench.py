@@ -0,0 +1,154 @@
+"""
+Check and benchmark the single-scan name sanitizer against the original regex based clean_name.
+
+From the actors_repo directory, run:
+    python -m benchmarks.sanitize_bench [--random N] [--seed N] [--repeat N]
+
+Both implementations are run over a regression corpus of names taken from film infoboxes (and the
+bracket and punctuation debris found around them), over N random strings made of the characters the
+pattern treats specially, and over adversarial strings of growing length. Any difference between
+their keep/drop decisions or cleaned names is reported, with the names/sec of each implementation
+and the time per name on the adversarial strings, which grows with the cube of the length for the
+regex and linearly for the scan.
+"""
+import argparse
+import random
+import time
+
+from typing import Callable, List, Optional, Text, Tuple
+
+from benchmarks import legacy
+from data_collection.sanitize import clean_name
+
+# Names as they come out of the infoboxes, including the footnotes, notes, and punctuation left around them.
+CORPUS = ["Tom Hanks",
+          "Meryl Streep",
+          "Robert Downey Jr.",
+          "Samuel L. Jackson",
+          "Guillermo del Toro",
+          "Jean-Claude Van Damme",
+          "Lupita Nyong'o",
+          "Renée Zellweger",
+          "20th Century Fox",
+          "Metro-Goldwyn-Mayer",
+          "Walt Disney Studios Motion Pictures",
+          "Lionsgate Films",
+          "Columbia Pictures",
+          "Touchstone Pictures / Miramax",
+          ", Paramount Pictures",
+          ",/Universal Pictures",
+          "/ Warner Bros.",
+          "(uncredited)",
+          "(voice)",
+          " (voice)",
+          "(United States)",
+          "[1]",
+          "[2][3]",
+          "[a]",
+          "[note 1]",
+          "{{citation needed}}",
+          "(",
+          ")",
+          ",",
+          ", ",
+          "/",
+          " / ",
+          ":",
+          "; ",
+          "+",
+          "-",
+          "and",
+          "with",
+          " ",
+          "",
+          "John Smith (actor)",
+          "John Smith[1]",
+          "(credited as) John Smith",
+          "[citation needed] John Smith",
+          "Pixar (animation) [1]",
+          "DreamWorks Animation\nPacific Data Images",
+          "\n",
+          "((",
+          "[[Jane Doe]]",
+          "{Jane Doe}",
+          "{Jane Doe",
+          "Jane Doe}",
+          "[Jane Doe)",
+          "(Jane Doe]",
+          "[}",
+          "{)",
+          "a)",
+          "a}",
+          "-(",
+          "/{",
+          ";[",
+          ", (",
+          "Ltd.)",
+          "Inc. (",
+          "Castle Rock Entertainment (in association with)",
+          "Studio Babelsberg[b]",
+          ]
+# The characters the pattern treats specially, plus a letter, a space, a newline, and a carriage return.
+ALPHABET = "[]{}(),;!:+-/a .\n\r"
+
+
+def adversarial(length: int) -> List[Text]:
+    """
+    Build strings on which the regex backtracks the most: runs of unclosed brackets, and long strings
+    whose only closing bracket or unknown character is at the end.
+    """
+    return ["[" * length,
+            "{" * length + "x",
+            "[{" * (length // 2) + "x",
+            "[a" * (length // 2),
+            " " * length + "[",
+            ]
+
+
+def run(clean: Callable[[Text], Optional[Text]], names: List[Text], repeat: int) -> Tuple[float, List]:
+    """
+    Clean every name, and return the best total time and the results.
+    """
+    best = float("inf")
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [clean(name) for name in names]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--random", type=int, default=100000, help="the number of random strings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random_names = ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 16))) for _ in range(args.random)]
+    implementations = {"regex clean_name": legacy.clean_name, "single-scan clean_name": clean_name}
+
+    for label, names in [("regression corpus", CORPUS * 100), (f"{args.random} random strings", random_names)]:
+        print(f"{label}:")
+        results = {}
+        for name, clean in implementations.items():
+            best, results[name] = run(clean, names, args.repeat)
+            print(f"  {name:>22}: {len(names) / best:10.1f} names/sec")
+        before, after = results.values()
+        mismatches = [(text, old, new) for text, old, new in zip(names, before, after) if old != new]
+        print(f"  {len(names) - len(mismatches)}/{len(names)} names cleaned identically")
+        for text, old, new in mismatches[:10]:
+            print(f"    differs: {text!r}: {old!r} != {new!r}")
+
+    print("adversarial strings (seconds per string):")
+    for length in [100, 200, 400, 800]:
+        timings = []
+        for name, clean in implementations.items():
+            best, _ = run(clean, adversarial(length), 1)
+            timings.append(f"{name} {best / 5:.6f}")
+        print(f"  length {length:>4}: " + ", ".join(timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark parse_films on whole film pages against the pages trimmed by TrimFilmPageMiddleware.
+
+From the actors_repo directory, run:
+    python -m benchmarks.trim_bench PAGES_DIR [--repeat N]
+
+where PAGES_DIR contains the saved film pages as .html files. The items produced from the whole
+and the trimmed pages are compared page by page, and the body size, the pages/sec (including the
+lxml parse), and the peak memory allocated while parsing all of the pages at once are reported.
+"""
+import argparse
+import time
+import tracemalloc
+
+from typing import List, Tuple
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from benchmarks.infobox_bench import load_pages
+from data_collection.middlewares import TrimFilmPageMiddleware
+from data_collection.spiders.actors_wiki_spider import Actorswiki
+
+
+def run(spider: Actorswiki, responses: List[HtmlResponse], repeat: int) -> Tuple[float, List]:
+    """
+    Parse each page with a fresh copy of its response, and return the best total time and the items.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        items = []
+        start = time.perf_counter()
+        for response in responses:
+            items.append([dict(item) for item in spider.parse_films(response.replace())])
+        best = min(best, time.perf_counter() - start)
+    return best, items
+
+
+def peak_memory(responses: List[HtmlResponse]) -> int:
+    """
+    Get the peak memory allocated while the lxml trees of all of the pages are held at once, as when
+    many responses are in flight.
+    """
+    tracemalloc.start()
+    copies = [response.replace() for response in responses]
+    for copy in copies:
+        copy.selector
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages_dir")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    spider = Actorswiki()
+    spider.settings = Settings({"FILM_RECORDS": False})
+    whole = load_pages(args.pages_dir)
+    trimmed = []
+    for response in whole:
+        body = TrimFilmPageMiddleware.trim(response.body)
+        trimmed.append(response if body is None else response.replace(body=body))
+
+    results = {}
+    for name, responses in [("whole pages", whole), ("trimmed pages", trimmed)]:
+        size = sum(len(response.body) for response in responses)
+        best, results[name] = run(spider, responses, args.repeat)
+        peak = peak_memory(responses)
+        print(f"{name:>13}: {size / len(responses) / 1024:8.1f} KB/page, {len(responses) / best:8.1f} pages/sec, "
+              f"{peak / 2 ** 20:8.1f} MB peak for {len(responses)} pages")
+
+    before, after = results.values()
+    mismatches = [response.url for response, old, new in zip(whole, before, after) if old != new]
+    print(f"{len(whole) - len(mismatches)}/{len(whole)} pages produce identical items")
+    for url in mismatches:
+        print(f"  differs: {url}")
+
+
+if __name__ == "__main__":
+    main()
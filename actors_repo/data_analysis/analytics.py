@@ -1,40 +1,38 @@
 import csv
 import os
 
-from typing import List, Text
+from typing import List, Optional, Text
 from abc import ABC, abstractmethod
 
-import pymysql
-from dotenv import load_dotenv
+from scrapy.utils.project import get_project_settings
 
-load_dotenv()
+from data_collection.storage import MySQLBackend, StorageBackend, open_backend
 
 
 class AnalyticsInterface(ABC):
     """
     This abstract class is used as an interface to query the actorswiki database.
 
+    Each subclass holds its query in QUERIES for each storage backend, keyed by the backend's name, and
+    the indexes its query plan is expected to use in INDEXES (see data_analysis/explain_check.py).
+
     Attributes:
-        u (Text): the username to use for logging into MySQL (set
-            as an environment variable)
-        p (Text): the password to use for logging into MySQL (set
-            as an environment variable)
-        h (Text): the hostname to use for logging into MySQL (set
-            as an environment variable)
-        conn (pymysql.connections.Connection): the Connection object created to
-            connect to MySQL
-        cursor (pymysql.cursors.Cursor): the resulting cursor created from the
+        backend (StorageBackend): the database the actors_wiki tables are stored in (MySQL by default), which
+            is read as it is: the schema is neither created nor migrated
+        conn (Union[pymysql.connections.Connection, sqlite3.Connection]): the Connection object created
+            by the backend
+        cursor (Union[pymysql.cursors.Cursor, sqlite3.Cursor]): the resulting cursor created from the
             Connection object
         table (List[List[Text]]): the table of the statistics (after calling the query method);
             initially this is set to None
     """
-    def __init__(self):
-        self.u = os.environ.get('DB_USER')
-        self.p = os.environ.get('DB_PSWD')
-        self.h = os.environ.get('DB_HOST')
-        self.conn = pymysql.connect(user=self.u, password=self.p, host=self.h)
+    QUERIES = {}
+    INDEXES = []
+
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or MySQLBackend()
+        self.conn = self.backend.connect(migrate=False)
         self.cursor = self.conn.cursor()
-        self.cursor.execute("USE actors_wiki")
         self.table = None
 
     @abstractmethod
@@ -56,11 +54,8 @@ class ActorsAnalysis(AnalyticsInterface):
     """
     Find the box office max, min, average, standard deviation, and film count for each actor.
     """
-    def query(self):
-        """
-        Store the table containing the box office statistics for each actor in the table attribute.
-        """
-        actors_query = """
+    INDEXES = ["castlist_actor"]
+    QUERIES = {"mysql": """
                        With cte AS (
                            SELECT a.actor AS actor,
                                a.actor_id AS actor_id,
@@ -85,8 +80,40 @@ class ActorsAnalysis(AnalyticsInterface):
                        WHERE box_office is not null
                        GROUP BY actor
                        ORDER BY box_office_max DESC, box_office_avg DESC, film_count DESC
+                       """,
+               "sqlite": """
+                       With cte AS (
+                           SELECT a.actor AS actor,
+                               a.actor_id AS actor_id,
+                               c.movie_id AS movie_id
+                           FROM actors AS a
+                           LEFT JOIN castlist AS c
+                           ON a.actor_id = c.actor_id
+                           )
+                       SELECT
+                           actor,
+                           MAX(box_office) AS box_office_max,
+                           MIN(box_office) AS box_office_min,
+                           ROUND(AVG(box_office), 6) AS box_office_avg,
+                           CASE WHEN STDDEV(box_office)
+                               THEN ROUND(STDDEV(box_office), 6)
+                               ELSE 0
+                           END AS box_office_std,
+                           COUNT(movie) AS film_count
+                       FROM cte AS c
+                       LEFT JOIN movies AS m
+                       ON c.movie_id = m.movie_id
+                       WHERE box_office is not null
+                       GROUP BY actor
+                       ORDER BY box_office_max DESC, box_office_avg DESC, film_count DESC
                        """
-        self.cursor.execute(actors_query)
+               }
+
+    def query(self):
+        """
+        Store the table containing the box office statistics for each actor in the table attribute.
+        """
+        self.cursor.execute(self.QUERIES[self.backend.name])
         self.table = self.cursor.fetchall()
 
     def store_csv(self, file_path):
@@ -111,11 +138,8 @@ class DirectorsAnalysis(AnalyticsInterface):
     """
     Find the box office max, min, average, standard deviation and film count for each director.
     """
-    def query(self):
-        """
-        Store the table containing the box office statistics for each director in the table attribute.
-        """
-        directors_query = """
+    INDEXES = ["filmdirectors_director"]
+    QUERIES = {"mysql": """
                           With cte AS (
                               SELECT 
                                   d.director AS director,
@@ -141,8 +165,41 @@ class DirectorsAnalysis(AnalyticsInterface):
                           WHERE box_office is not null
                           GROUP BY director
                           ORDER BY box_office_max DESC, box_office_avg DESC, film_count DESC
+                          """,
+               "sqlite": """
+                          With cte AS (
+                              SELECT
+                                  d.director AS director,
+                                  d.director_id AS director_id,
+                                  f.movie_id AS movie_id
+                              FROM directors AS d
+                              LEFT JOIN filmdirectors AS f
+                              ON d.director_id = f.director_id
+                              )
+                          SELECT
+                              director,
+                              MAX(box_office) AS box_office_max,
+                              MIN(box_office) AS box_office_min,
+                              ROUND(AVG(box_office), 6) AS box_office_avg,
+                              CASE WHEN STDDEV(box_office)
+                                  THEN ROUND(STDDEV(box_office), 6)
+                                  ELSE 0
+                              END AS box_office_std,
+                              COUNT(movie) AS film_count
+                          FROM cte AS c
+                          LEFT JOIN movies AS m
+                          ON c.movie_id = m.movie_id
+                          WHERE box_office is not null
+                          GROUP BY director
+                          ORDER BY box_office_max DESC, box_office_avg DESC, film_count DESC
                           """
-        self.cursor.execute(directors_query)
+               }
+
+    def query(self):
+        """
+        Store the table containing the box office statistics for each director in the table attribute.
+        """
+        self.cursor.execute(self.QUERIES[self.backend.name])
         self.table = self.cursor.fetchall()
 
     def store_csv(self, file_path):
@@ -170,11 +227,8 @@ class DistributorsAnalysis(AnalyticsInterface):
     Given that the distribution companies are likely to have distributed more than one film each year,
     we consider these statistics per year, as well as cumulatively (across all years).
     """
-    def query(self):
-        """
-        Store the table containing the box office statistic for each distributor in the table attribute.
-        """
-        distributors_query = """
+    INDEXES = ["filmdistributors_distributor"]
+    QUERIES = {"mysql": """
                              With cte AS (
                                  SELECT d.distributor AS distributor,
                                      YEAR(m.release_date) AS release_year,
@@ -209,8 +263,94 @@ class DistributorsAnalysis(AnalyticsInterface):
                                  distributor,
                                  release_year
                              WITH ROLLUP
+                             """,
+               "sqlite": """
+                             With cte AS (
+                                 SELECT
+                                     d.distributor AS distributor,
+                                     CAST(strftime('%Y', m.release_date) AS INTEGER) AS release_year,
+                                     m.box_office AS box_office,
+                                     m.movie AS movie
+                                 FROM distributors AS d
+                                 LEFT JOIN filmdistributors AS f
+                                 ON d.distributor_id = f.distributor_id
+                                 LEFT JOIN movies AS m
+                                 ON f.movie_id = m.movie_id
+                                 WHERE box_office IS NOT NULL
+                                 ),
+                             rollup AS (
+                                 SELECT
+                                     0 AS all_distributors,
+                                     0 AS all_years,
+                                     distributor,
+                                     release_year,
+                                     MAX(box_office) AS box_office_max,
+                                     MIN(box_office) AS box_office_min,
+                                     COUNT(movie) AS film_count,
+                                     ROUND(AVG(box_office), 6) AS box_office_avg,
+                                     CASE WHEN STDDEV(box_office)
+                                         THEN ROUND(STDDEV(box_office), 6)
+                                         ELSE 0
+                                     END AS box_office_std
+                                 FROM cte
+                                 GROUP BY distributor, release_year
+                                 UNION ALL
+                                 SELECT
+                                     0,
+                                     1,
+                                     distributor,
+                                     NULL,
+                                     MAX(box_office) AS box_office_max,
+                                     MIN(box_office) AS box_office_min,
+                                     COUNT(movie) AS film_count,
+                                     ROUND(AVG(box_office), 6) AS box_office_avg,
+                                     CASE WHEN STDDEV(box_office)
+                                         THEN ROUND(STDDEV(box_office), 6)
+                                         ELSE 0
+                                     END AS box_office_std
+                                 FROM cte
+                                 GROUP BY distributor
+                                 UNION ALL
+                                 SELECT
+                                     1,
+                                     1,
+                                     NULL,
+                                     NULL,
+                                     MAX(box_office) AS box_office_max,
+                                     MIN(box_office) AS box_office_min,
+                                     COUNT(movie) AS film_count,
+                                     ROUND(AVG(box_office), 6) AS box_office_avg,
+                                     CASE WHEN STDDEV(box_office)
+                                         THEN ROUND(STDDEV(box_office), 6)
+                                         ELSE 0
+                                     END AS box_office_std
+                                 FROM cte
+                                 HAVING COUNT(*) > 0
+                                 )
+                             SELECT
+                                 CASE WHEN all_distributors
+                                     THEN 'All distributors'
+                                     ELSE distributor
+                                 END AS distributor,
+                                 CASE WHEN all_years
+                                     THEN 'All years'
+                                     ELSE release_year
+                                 END AS release_year,
+                                 box_office_max,
+                                 box_office_min,
+                                 film_count,
+                                 box_office_avg,
+                                 box_office_std
+                             FROM rollup
+                             ORDER BY all_distributors, distributor, all_years, release_year
                              """
-        self.cursor.execute(distributors_query)
+               }
+
+    def query(self):
+        """
+        Store the table containing the box office statistic for each distributor in the table attribute.
+        """
+        self.cursor.execute(self.QUERIES[self.backend.name])
         self.table = self.cursor.fetchall()
 
     def store_csv(self, file_path):
@@ -240,11 +380,8 @@ class ProductionCoAnalysis(AnalyticsInterface):
     these statistics per year, as well as cumulatively (across all years).
 
         """
-    def query(self):
-        """
-        Store the table containing the box office statistic for each production company in the table attribute.
-        """
-        prod_co_query = """
+    INDEXES = ["filmprodco_prod_co"]
+    QUERIES = {"mysql": """
                              With cte AS (
                                  SELECT 
                                      p.prod_co AS prod_co,
@@ -280,8 +417,94 @@ class ProductionCoAnalysis(AnalyticsInterface):
                                  prod_co,
                                  release_year
                              WITH ROLLUP
+                             """,
+               "sqlite": """
+                             With cte AS (
+                                 SELECT
+                                     p.prod_co AS prod_co,
+                                     CAST(strftime('%Y', m.release_date) AS INTEGER) AS release_year,
+                                     m.box_office AS box_office,
+                                     m.movie AS movie
+                                 FROM productionco AS p
+                                 LEFT JOIN filmprodco AS f
+                                 ON p.prod_co_id = f.prod_co_id
+                                 LEFT JOIN movies AS m
+                                 ON f.movie_id = m.movie_id
+                                 WHERE box_office IS NOT NULL
+                                 ),
+                             rollup AS (
+                                 SELECT
+                                     0 AS all_prod_cos,
+                                     0 AS all_years,
+                                     prod_co,
+                                     release_year,
+                                     MAX(box_office) AS box_office_max,
+                                     MIN(box_office) AS box_office_min,
+                                     COUNT(movie) AS film_count,
+                                     ROUND(AVG(box_office), 6) AS box_office_avg,
+                                     CASE WHEN STDDEV(box_office)
+                                         THEN ROUND(STDDEV(box_office), 6)
+                                         ELSE 0
+                                     END AS box_office_std
+                                 FROM cte
+                                 GROUP BY prod_co, release_year
+                                 UNION ALL
+                                 SELECT
+                                     0,
+                                     1,
+                                     prod_co,
+                                     NULL,
+                                     MAX(box_office) AS box_office_max,
+                                     MIN(box_office) AS box_office_min,
+                                     COUNT(movie) AS film_count,
+                                     ROUND(AVG(box_office), 6) AS box_office_avg,
+                                     CASE WHEN STDDEV(box_office)
+                                         THEN ROUND(STDDEV(box_office), 6)
+                                         ELSE 0
+                                     END AS box_office_std
+                                 FROM cte
+                                 GROUP BY prod_co
+                                 UNION ALL
+                                 SELECT
+                                     1,
+                                     1,
+                                     NULL,
+                                     NULL,
+                                     MAX(box_office) AS box_office_max,
+                                     MIN(box_office) AS box_office_min,
+                                     COUNT(movie) AS film_count,
+                                     ROUND(AVG(box_office), 6) AS box_office_avg,
+                                     CASE WHEN STDDEV(box_office)
+                                         THEN ROUND(STDDEV(box_office), 6)
+                                         ELSE 0
+                                     END AS box_office_std
+                                 FROM cte
+                                 HAVING COUNT(*) > 0
+                                 )
+                             SELECT
+                                 CASE WHEN all_prod_cos
+                                     THEN 'All production companies'
+                                     ELSE prod_co
+                                 END AS prod_co,
+                                 CASE WHEN all_years
+                                     THEN 'All years'
+                                     ELSE release_year
+                                 END AS release_year,
+                                 box_office_max,
+                                 box_office_min,
+                                 film_count,
+                                 box_office_avg,
+                                 box_office_std
+                             FROM rollup
+                             ORDER BY all_prod_cos, prod_co, all_years, release_year
                              """
-        self.cursor.execute(prod_co_query)
+               }
+
+    def query(self):
+        """
+        Store the table containing the box office statistic for each production company in the table attribute.
+        """
+        self.cursor.execute(self.QUERIES[self.backend.name])
         self.table = self.cursor.fetchall()
 
     def store_csv(self, file_path):
@@ -304,26 +527,21 @@ class ProductionCoAnalysis(AnalyticsInterface):
 
 
 if __name__ == "__main__":
-    actors_stats = ActorsAnalysis()
+    settings = get_project_settings()
+    backend = open_backend(settings.get("DB_BACKEND", "mysql"), settings.get("DB_PATH"))
+    actors_stats = ActorsAnalysis(backend)
     actors_stats.query()
     actors_stats_csv = os.environ.get('actors_path')
     actors_stats.store_csv(actors_stats_csv)
-    directors_stats = DirectorsAnalysis()
+    directors_stats = DirectorsAnalysis(backend)
     directors_stats.query()
     directors_stats_csv = os.environ.get('directors_path')
     directors_stats.store_csv(directors_stats_csv)
-    distributors_stats = DistributorsAnalysis()
+    distributors_stats = DistributorsAnalysis(backend)
     distributors_stats.query()
     distributors_stats_csv = os.environ.get('distributors_path')
     distributors_stats.store_csv(distributors_stats_csv)
-    production_co_stats = ProductionCoAnalysis()
+    production_co_stats = ProductionCoAnalysis(backend)
     production_co_stats.query()
     production_co_stats_csv = os.environ.get('production_co_path')
     production_co_stats.store_csv(production_co_stats_csv)
-
-
-
-
-
-
-
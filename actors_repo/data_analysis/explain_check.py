@@ -0,0 +1,84 @@
+"""
+Check that the query plans of the analytics use the indexes added by the schema migrations.
+
+From the actors_repo directory, run:
+    python -m data_analysis.explain_check
+
+The database is selected by the DB_BACKEND and DB_PATH settings, as for analytics.py, and is not migrated. Each
+analytics query is explained (EXPLAIN on MySQL, EXPLAIN QUERY PLAN on SQLite) and must use the reverse
+index of its junction table; a year-window query and a box-office ranking must use the covering indexes
+on movies. The indexes used by each query are printed, and the exit status is 1 if any index is unused.
+On a MySQL database whose movies table is partitioned by release year (see DB_PARTITION_YEARS), a query of
+one year must only read the partition of that year.
+The plans depend on the statistics of the tables, so the check is meant to be run on a crawled database.
+"""
+import sys
+
+from typing import Set, Text
+
+from scrapy.utils.project import get_project_settings
+
+from data_analysis.analytics import ActorsAnalysis, DirectorsAnalysis, DistributorsAnalysis, ProductionCoAnalysis
+from data_collection.partitions import list_partitions
+from data_collection.storage import open_backend
+
+# Queries on movies alone, with the covering index each should be answered from.
+MOVIES_QUERIES = {"movies_release_date": """SELECT COUNT(*), MAX(box_office), MIN(box_office), AVG(box_office)
+                                            FROM movies
+                                            WHERE release_date >= '2010-01-01' AND release_date < '2011-01-01'
+                                         """,
+                  "movies_box_office": """SELECT release_date, box_office
+                                          FROM movies
+                                          WHERE box_office IS NOT NULL
+                                          ORDER BY box_office DESC
+                                          LIMIT 10
+                                       """
+                  }
+
+# A query of a single release year, which only reads the year's partition of a partitioned movies table.
+YEAR_QUERY = """SELECT COUNT(*), MAX(box_office), MIN(box_office), AVG(box_office)
+                FROM movies
+                WHERE release_year = {year}
+             """
+
+
+def used_partitions(cursor, query: Text) -> Set[Text]:
+    """
+    Get the names of the partitions MySQL's query plan reads for the query.
+    """
+    cursor.execute("EXPLAIN " + query)
+    column = [column[0] for column in cursor.description].index("partitions")
+    return {name for row in cursor.fetchall() if row[column] for name in row[column].split(",")}
+
+
+def main():
+    settings = get_project_settings()
+    backend = open_backend(settings.get("DB_BACKEND", "mysql"), settings.get("DB_PATH"))
+    checks = []
+    for analysis_class in [ActorsAnalysis, DirectorsAnalysis, DistributorsAnalysis, ProductionCoAnalysis]:
+        checks.append((analysis_class.__name__, analysis_class.QUERIES[backend.name], analysis_class.INDEXES))
+    for index, query in MOVIES_QUERIES.items():
+        checks.append((index, query, [index]))
+
+    conn = backend.connect(migrate=False)
+    cursor = conn.cursor()
+    failed = False
+    for name, query, indexes in checks:
+        used = backend.used_indexes(cursor, query)
+        missing = [index for index in indexes if index not in used]
+        failed = failed or bool(missing)
+        print(f"{'FAIL' if missing else 'ok':>4} {name}: uses {', '.join(sorted(used)) or 'no index'}"
+              + (f"; missing {', '.join(missing)}" if missing else ""))
+    if backend.name == "mysql":
+        years = [name for name, _ in list_partitions(conn) if name[1:].isdigit()]
+        if years:
+            used = used_partitions(cursor, YEAR_QUERY.format(year=years[-1][1:]))
+            pruned = used == {years[-1]}
+            failed = failed or not pruned
+            print(f"{'ok' if pruned else 'FAIL':>4} movies_{years[-1]}: reads {', '.join(sorted(used)) or 'no partition'}")
+    conn.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
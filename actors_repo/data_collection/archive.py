@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+from typing import Iterator, Optional, Text
+
+import scrapy
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import Settings
+from scrapy.utils.project import data_path
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseArchive:
+    """
+    This class is used to store fetched responses in a single SQLite file, keyed by URL.
+
+    The bodies are compressed with zlib, and the writes are committed in batches.
+
+    Attributes:
+        path (Text): the path of the SQLite file
+        conn (sqlite3.Connection): the connection to the SQLite file
+        commit_every (int): the number of stored responses after which the writes are committed
+        pending (int): the number of stored responses which have not been committed yet
+    """
+    def __init__(self, path: Text, commit_every: int = 100):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses(
+                                 url TEXT PRIMARY KEY,
+                                 response_url TEXT NOT NULL,
+                                 status INTEGER NOT NULL,
+                                 headers TEXT NOT NULL,
+                                 body BLOB NOT NULL,
+                                 fetched REAL NOT NULL
+                                 )
+                          """
+                          )
+        self.commit_every = commit_every
+        self.pending = 0
+
+    def store(self, url: Text, response: Response) -> None:
+        """
+        Store the response under the url, replacing any response already stored for it.
+
+        Args:
+            url (Text): The URL to store the response under; this is the response's URL, or
+                the URL of a request which was redirected to it.
+            response (scrapy.http.Response): The response.
+
+        Returns:
+            None
+        """
+        headers = {key.decode("latin-1"): [value.decode("latin-1") for value in values]
+                   for key, values in response.headers.items()}
+        self.conn.execute("""INSERT OR REPLACE INTO responses(url, response_url, status, headers, body, fetched)
+                             VALUES (?, ?, ?, ?, ?, ?)
+                          """, (url, response.url, response.status, json.dumps(headers),
+                                zlib.compress(response.body), time.time()))
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def retrieve(self, url: Text, max_age: float = 0) -> Optional[Response]:
+        """
+        Get the response stored under the url.
+
+        Args:
+            url (Text): The URL the response was stored under.
+            max_age (float): If positive, the responses stored more than max_age seconds ago are ignored.
+
+        Returns:
+            (Optional[scrapy.http.Response]): The response (an HtmlResponse for the wikipedia pages),
+            with the URL it was fetched from, or None if nothing (recent enough) is stored under the url.
+        """
+        row = self.conn.execute("""SELECT response_url, status, headers, body
+                                   FROM responses
+                                   WHERE url = ?
+                                   AND fetched >= ?
+                                """, (url, time.time() - max_age if max_age > 0 else 0)).fetchone()
+        if row is None:
+            return None
+        response_url, status, headers, body = row
+        headers = Headers(json.loads(headers))
+        body = zlib.decompress(body)
+        respcls = responsetypes.from_args(headers=headers, url=response_url, body=body)
+        return respcls(url=response_url, status=status, headers=headers, body=body)
+
+    def urls(self, include_redirects: bool = True) -> Iterator[Text]:
+        """
+        Iterate over the URLs of the stored responses.
+
+        Args:
+            include_redirects (bool): Whether to include the URLs which were redirected to another
+                stored response; without them, each stored page is visited once.
+
+        Returns:
+            (Iterator[Text]): The URLs, in sorted order.
+        """
+        query = "SELECT url FROM responses"
+        if not include_redirects:
+            query += " WHERE url = response_url"
+        for (url,) in self.conn.execute(query + " ORDER BY url"):
+            yield url
+
+    def purge(self, max_age: float) -> int:
+        """
+        Delete the responses stored more than max_age seconds ago.
+
+        Args:
+            max_age (float): The age in seconds after which a stored response has expired.
+
+        Returns:
+            (int): The number of responses deleted.
+        """
+        deleted = self.conn.execute("""DELETE FROM responses
+                                       WHERE fetched < ?
+                                    """, (time.time() - max_age,)).rowcount
+        self.commit()
+        return deleted
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def commit(self) -> None:
+        """
+        Commit the stored responses.
+        """
+        self.conn.commit()
+        self.pending = 0
+
+    def close(self) -> None:
+        """
+        Commit the stored responses and close the connection.
+        """
+        self.commit()
+        self.conn.close()
+
+
+class SQLiteCacheStorage:
+    """
+    This class is a scrapy HTTP cache storage which keeps the responses in a single ResponseArchive file.
+
+    Unlike the default FilesystemCacheStorage, which creates a directory per request, the cache is a
+    single indexed SQLite file (HTTPCACHE_DIR/<spider name>.sqlite) with zlib compressed bodies, which
+    is cheap to open and scan, and easy to copy between machines. The responses are keyed by request
+    fingerprint. With HTTPCACHE_EXPIRATION_SECS, the responses older than that are ignored, and are
+    deleted from the file when the spider opens.
+
+    To use it, set HTTPCACHE_ENABLED = True and HTTPCACHE_STORAGE = "data_collection.archive.SQLiteCacheStorage".
+
+    Attributes:
+        cachedir (Text): the directory of the cache files
+        expiration_secs (int): the age in seconds after which a cached response has expired; 0 means never
+        archive (Optional[ResponseArchive]): the archive of the spider's cached responses, once the spider is open
+    """
+    def __init__(self, settings: Settings):
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.archive = None
+        self._fingerprinter = None
+
+    def open_spider(self, spider: scrapy.Spider) -> None:
+        path = os.path.join(self.cachedir, f"{spider.name}.sqlite")
+        self.archive = ResponseArchive(path)
+        if self.expiration_secs > 0:
+            deleted = self.archive.purge(self.expiration_secs)
+            logger.debug(f"Deleted {deleted} expired responses from the HTTP cache {path}")
+        logger.debug(f"Using the SQLite HTTP cache storage in {path}")
+        self._fingerprinter = spider.crawler.request_fingerprinter
+
+    def close_spider(self, spider: scrapy.Spider) -> None:
+        self.archive.close()
+
+    def retrieve_response(self, spider: scrapy.Spider, request: scrapy.Request) -> Optional[Response]:
+        """
+        Get the cached response to the request, or None if it is not cached or has expired.
+        """
+        return self.archive.retrieve(self._fingerprinter.fingerprint(request).hex(), self.expiration_secs)
+
+    def store_response(self, spider: scrapy.Spider, request: scrapy.Request, response: Response) -> None:
+        """
+        Cache the response to the request.
+        """
+        self.archive.store(self._fingerprinter.fingerprint(request).hex(), response)
@@ -0,0 +1,241 @@
+"""
+Load the item shards spooled with SPOOL_DIR into the actors_wiki database with set-based statements.
+
+From the actors_repo directory, run:
+    python -m data_collection.bulkload SPOOL_DIR [--workers N] [--chunk-size N]
+
+The shards are decompressed and parsed by a pool of worker processes, with at most two shards per worker
+read ahead, and their items are streamed in the order they were spooled, in chunks of at most --chunk-size
+items. The items of each chunk are collapsed as DBPipeline would have written them: a later MovieItem (or
+FilmRecord with a release date) for a film overwrites the title, budget, box office, and release date of an
+earlier one, and a FilmRecord fetched in incremental mode replaces the links of its film. The films are found
+or inserted by page_id as in DBPipeline, the collapsed rows are inserted into temporary staging tables
+with multi-row inserts, and moved into the movies, dimension, and junction tables with one INSERT ... SELECT
+(or UPDATE) per table. The chunks are loaded one after the other, so a later chunk overwrites the films and
+replaces the links of an earlier one just as a later item does, all in a single transaction.
+The database is the one selected by DB_BACKEND, as for DBPipeline. No network access is needed, and loading
+the same shards again leaves the database as it is.
+"""
+import argparse
+import logging
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Text, Tuple
+
+import scrapy
+from scrapy.utils.project import get_project_settings
+
+from .items import RECORD_FIELDS, FilmRecord
+from .pipelines import NAME_TABLES, DBPipeline, film_key
+from .reparse import bounded_map
+from .spool import read_shard, shard_paths
+
+logger = logging.getLogger(__name__)
+
+
+class Staging:
+    """
+    This class is used to collapse the spooled items into the rows of the staging tables.
+
+    Attributes:
+        films (Dict[int, Text]): the latest title of every film with an item, keyed by page_id
+        movies (Dict[int, Tuple]): the latest film, budget, box_office, and release_date of each film
+        links (Dict[int, Set[Tuple[Text, Text]]]): the (item_field, name) pairs linked to each film
+        pages (Dict[Text, Tuple]): the latest page_id, etag, last_modified, and revision_id of each page
+            fetched in incremental mode, keyed by url
+        items (int): the number of items added
+    """
+    def __init__(self):
+        self.films = {}
+        self.movies = {}
+        self.links = {}
+        self.pages = {}
+        self.items = 0
+
+    def add(self, item: scrapy.Item) -> None:
+        """
+        Add an item, in the order the items were spooled.
+
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord.
+
+        Returns:
+            None
+        """
+        film = item.get("film")
+        page_id = film_key(item)
+        self.films[page_id] = film
+        self.items += 1
+        if isinstance(item, FilmRecord):
+            if item.get("url"):
+                # As in DBPipeline, the record replaces the links stored for the film so far.
+                self.links[page_id] = set()
+                self.pages[item.get("url")] = (page_id, item.get("etag"), item.get("last_modified"),
+                                               item.get("revision_id"))
+            if item.get("release_date"):
+                self.movies[page_id] = (film, item.get("budget"), item.get("box_office"), item.get("release_date"))
+            for item_field, record_field in RECORD_FIELDS.items():
+                for name in item.get(record_field) or []:
+                    self.links.setdefault(page_id, set()).add((item_field, name))
+        elif "budget" in item.keys():
+            self.movies[page_id] = (film, item.get("budget"), item.get("box_office"), item.get("release_date"))
+        else:
+            for item_field in NAME_TABLES:
+                if item.get(item_field, None):
+                    self.links.setdefault(page_id, set()).add((item_field, item.get(item_field)))
+                    break
+
+    def movie_rows(self, movie_ids: Dict[int, int]) -> List[Tuple]:
+        """
+        Get the (movie_id, movie, budget, box_office, release_date) row of each updated film, sorted by movie_id.
+        """
+        return sorted((movie_ids[page_id], *fields) for page_id, fields in self.movies.items())
+
+    def link_rows(self, movie_ids: Dict[int, int]) -> List[Tuple[Text, int, Text]]:
+        """
+        Get the (item_field, movie_id, name) row of each link, sorted.
+        """
+        return sorted((item_field, movie_ids[page_id], name)
+                      for page_id, links in self.links.items() for item_field, name in links)
+
+
+def load(loader: DBPipeline, staging: Staging) -> None:
+    """
+    Write the staged rows into the actors_wiki tables, without committing.
+
+    The films are found or inserted with the loader's get_movie_ids and their fields updated first,
+    and the links of the films fetched in incremental mode are deleted. Then the names of each dimension
+    table are inserted, the (movie_id, name_id) pairs are inserted into the junction tables, and finally
+    the validators of the pages are stored. The statements run on any of the loader's backends: the comparisons put
+    the column of the actors_wiki table first, so that the names are matched with its collation, as
+    its unique keys match them.
+
+    Args:
+        loader (DBPipeline): The pipeline whose connection (and schema) is used.
+        staging (Staging): The collapsed items.
+
+    Returns:
+        None
+    """
+    cur = loader.cursor
+    backend = loader.backend
+    p = backend.param
+    movie_ids = loader.get_movie_ids(staging.films)
+    # The temporary tables are not dropped by a rollback, so they may be left by a failed attempt.
+    for stage in ["stage_films", "stage_links"]:
+        cur.execute(f"{backend.drop_temporary} IF EXISTS {stage}")
+    cur.execute("""CREATE TEMPORARY TABLE stage_films(
+                       movie_id INT NOT NULL PRIMARY KEY,
+                       movie VARCHAR(200) NOT NULL,
+                       budget DECIMAL(12,6) DEFAULT NULL,
+                       box_office DECIMAL(12,6) DEFAULT NULL,
+                       release_date DATE DEFAULT NULL
+                       )
+                """
+                )
+    cur.execute("""CREATE TEMPORARY TABLE stage_links(
+                       item_field VARCHAR(20) NOT NULL,
+                       movie_id INT NOT NULL,
+                       name VARCHAR(200) NOT NULL
+                       )
+                """
+                )
+    cur.execute("CREATE INDEX stage_links_name ON stage_links(item_field, name)")
+    # pymysql sends each executemany of an INSERT ... VALUES as multi-row inserts of up to 1MB each.
+    cur.executemany(f"""INSERT INTO stage_films(movie_id, movie, budget, box_office, release_date)
+                        VALUES ({p}, {p}, {p}, {p}, {p})
+                     """, staging.movie_rows(movie_ids))
+    cur.executemany(f"""INSERT INTO stage_links(item_field, movie_id, name)
+                        VALUES ({p}, {p}, {p})
+                     """, staging.link_rows(movie_ids))
+
+    cur.execute(backend.update_from("movies", "stage_films", "movie_id",
+                                    ["movie", "budget", "box_office", "release_date"]))
+    loader.clear_links(movie_ids[page_id] for page_id, *_ in staging.pages.values())
+    for item_field, (table, id_col, name_col, junction) in NAME_TABLES.items():
+        cur.execute(f"""{backend.insert_ignore} INTO {table}({name_col})
+                        SELECT DISTINCT name
+                        FROM stage_links
+                        WHERE item_field = {p}
+                        ORDER BY name
+                     """, (item_field,))
+        cur.execute(f"""{backend.insert_ignore} INTO {junction}(movie_id, {id_col})
+                        SELECT stage_links.movie_id, {table}.{id_col}
+                        FROM stage_links
+                        JOIN {table} ON {table}.{name_col} = stage_links.name
+                        WHERE stage_links.item_field = {p}
+                        ORDER BY stage_links.movie_id, {table}.{id_col}
+                     """, (item_field,))
+    loader.store_pages((url, movie_ids[page_id], *validators)
+                       for url, (page_id, *validators) in sorted(staging.pages.items()))
+    for stage in ["stage_films", "stage_links"]:
+        cur.execute(f"{backend.drop_temporary} {stage}")
+
+
+def load_shards(loader: DBPipeline, pool: ProcessPoolExecutor, paths: Sequence[Text], workers: int,
+                chunk_size: int) -> Dict[Text, int]:
+    """
+    Read the shards in the pool and load their items in chunks, without committing.
+
+    The shards are read again from the start whenever the loader retries the transaction, so only
+    the chunk being collapsed and the shards read ahead are held in memory.
+
+    Args:
+        loader (DBPipeline): The pipeline whose connection (and schema) is used.
+        pool (ProcessPoolExecutor): The pool of processes reading the shards.
+        paths (Sequence[Text]): The paths of the shards, in the order they were spooled.
+        workers (int): The number of processes in the pool.
+        chunk_size (int): The maximum number of items per chunk.
+
+    Returns:
+        (Dict[Text, int]): The number of items and chunks loaded, and of films, links, and pages staged.
+    """
+    totals = dict.fromkeys(["items", "chunks", "films", "links", "pages"], 0)
+    staging = Staging()
+
+    def load_chunk():
+        load(loader, staging)
+        totals["items"] += staging.items
+        totals["chunks"] += 1
+        totals["films"] += len(staging.films)
+        totals["links"] += sum(len(links) for links in staging.links.values())
+        totals["pages"] += len(staging.pages)
+
+    for items in bounded_map(pool, read_shard, paths, 2 * workers):
+        for item in items:
+            staging.add(item)
+            if staging.items >= chunk_size:
+                load_chunk()
+                staging = Staging()
+    if staging.items:
+        load_chunk()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("spool_dir", help="the SPOOL_DIR the items were spooled to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="the number of processes reading the shards")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="the number of items staged at once")
+    args = parser.parse_args()
+
+    paths = shard_paths(args.spool_dir)
+    start = time.perf_counter()
+    loader = DBPipeline.from_settings(get_project_settings(), writer_thread=False)
+    totals = {}
+    with ProcessPoolExecutor(args.workers) as pool:
+        def write():
+            totals.update(load_shards(loader, pool, paths, args.workers, args.chunk_size))
+        loader.transaction(write)
+    loader.conn.close()
+    elapsed = time.perf_counter() - start
+    print(f"{totals['items']} items from {len(paths)} shards loaded in {totals['chunks']} chunks in {elapsed:.2f}s "
+          f"with {args.workers} workers reading: {totals['films']} films, {totals['links']} links, "
+          f"{totals['pages']} pages staged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional, Tuple
+
+
+class IdentityMap:
+    """
+    This class is used to map the names stored in the database to their ids, so that repeated
+    lookups of the same name do not need to reach the database.
+
+    Attributes:
+        max_size (int): the maximum number of entries to keep; once this is exceeded the least
+            recently used entry is evicted. If this is 0, the map is unbounded.
+        entries (OrderedDict): the cached ids keyed by name, ordered from least to most recently used
+        hits (int): the number of lookups that were answered by the map
+        misses (int): the number of lookups that were not
+    """
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[int]:
+        """
+        Look up the id of key, marking it as the most recently used entry.
+
+        Args:
+            key (Hashable): The name to look up.
+
+        Returns:
+            (Optional[int]): The id of the name, or None if it is not in the map.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: int) -> None:
+        """
+        Store the id of key, evicting the least recently used entry if the map is full.
+
+        Args:
+            key (Hashable): The name.
+            value (int): The id of the name.
+
+        Returns:
+            None
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if self.max_size and len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def update(self, pairs: Iterable[Tuple[Hashable, int]]) -> None:
+        """
+        Store several (name, id) pairs, e.g. the rows of a SELECT on one of the dimension tables.
+
+        Args:
+            pairs (Iterable[Tuple[Hashable, int]]): The (name, id) pairs to store.
+
+        Returns:
+            None
+        """
+        for key, value in pairs:
+            self.put(key, value)
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+from typing import Iterable, List, Optional, Text
+
+
+class Checkpoint:
+    """
+    This class is used to record the progress of a resumable crawl in a single SQLite file.
+
+    The spider records the films linked from each list page once it has parsed it, and DBPipeline
+    marks each film as persisted once the transaction writing it has been committed. A list page
+    is complete once all of its films are persisted.
+
+    The spider and DBPipeline's writer thread share the checkpoint, so every access takes a lock.
+
+    Attributes:
+        path (Text): the path of the SQLite file
+        conn (sqlite3.Connection): the connection to the SQLite file
+        lock (threading.Lock): the lock serializing the accesses to conn
+    """
+    def __init__(self, path: Text):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS list_films(
+                                 list_url TEXT NOT NULL,
+                                 film_url TEXT NOT NULL,
+                                 PRIMARY KEY(list_url, film_url)
+                                 )
+                          """
+                          )
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS lists(
+                                 url TEXT PRIMARY KEY
+                                 )
+                          """
+                          )
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS films(
+                                 url TEXT PRIMARY KEY
+                                 )
+                          """
+                          )
+        self.conn.commit()
+
+    def record_list(self, list_url: Text, film_urls: Iterable[Text]) -> None:
+        """
+        Record the films linked from a list page, once it has been parsed.
+
+        Args:
+            list_url (Text): The URL of the List of American films page.
+            film_urls (Iterable[Text]): The URLs of the films it links to.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.conn.executemany("""INSERT OR IGNORE INTO list_films(list_url, film_url)
+                                     VALUES (?, ?)
+                                  """, [(list_url, film_url) for film_url in film_urls])
+            self.conn.execute("""INSERT OR IGNORE INTO lists(url)
+                                 VALUES (?)
+                              """, (list_url,))
+            self.conn.commit()
+
+    def mark_films(self, film_urls: Iterable[Text]) -> None:
+        """
+        Mark the films as persisted, once the transaction writing them has been committed.
+
+        Args:
+            film_urls (Iterable[Text]): The URLs of the films, as linked from the list pages.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.conn.executemany("""INSERT OR IGNORE INTO films(url)
+                                     VALUES (?)
+                                  """, [(film_url,) for film_url in film_urls])
+            self.conn.commit()
+
+    def pending_films(self, list_url: Text) -> Optional[List[Text]]:
+        """
+        Get the films of a list page which are not persisted yet.
+
+        Args:
+            list_url (Text): The URL of the List of American films page.
+
+        Returns:
+            (Optional[List[Text]]): The URLs of the films which are not persisted (empty if the list page
+            is complete), or None if the list page has not been parsed yet.
+        """
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM lists WHERE url = ?", (list_url,)).fetchone() is None:
+                return None
+            rows = self.conn.execute("""SELECT film_url
+                                        FROM list_films
+                                        WHERE list_url = ?
+                                        AND film_url NOT IN (SELECT url FROM films)
+                                        ORDER BY film_url
+                                     """, (list_url,)).fetchall()
+        return [film_url for (film_url,) in rows]
+
+    def close(self) -> None:
+        """
+        Close the connection.
+        """
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,69 @@
+import re
+
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Text
+
+# Parenthesized notes, e.g. "(United States)" or "(Sundance)", removed before the date is parsed.
+JUNK = re.compile(r"\(.+\)")
+LOWERCASE = re.compile(r"[a-z]")
+# The patterns tried (in order) on dates with a month name, and on numeric dates. The first pattern
+# found anywhere in the string is used, even if a later pattern matches earlier in the string.
+ALPHA_PATTERNS = [re.compile(r"(?P<Month>[A-Z][a-z]+)\s(?P<Day>[0-3][0-9]|[0-9]),\s(?P<Year>[0-9]{4})"),
+                  re.compile(r"(?P<Day>[0-3][0-9]|[0-9])\s(?P<Month>[A-Z][a-z]+)\s(?P<Year>[0-9]{4})"),
+                  re.compile(r"(?P<Year>[0-9]{4})[/\-](?P<Month>[A-Z][a-z]+)[/\-](?P<Day>[0-3][0-9]|[0-9])"),
+                  re.compile(r"(?P<Year>[0-9]{4})[/\- ](?P<Month>[A-Z][a-z]+)"),
+                  re.compile(r"(?P<Month>[A-Z][a-z]+)[/\- ](?P<Year>[0-9]{4})")
+                  ]
+NUMERIC_PATTERNS = [re.compile(r"(?P<Year>[0-9]{4})[/\- ](?P<Month>[0-1][0-9]|[0-9])[/\- ](?P<Day>[0-3][0-9]|[0-9])"),
+                    re.compile(r"(?P<Year>[0-9]{4})[/\- ](?P<Month>[0-1][0-9]|[0-9])"),
+                    re.compile(r"(?P<Month>[0-1][0-9]|[0-9])[/\- ](?P<Year>[0-9]{4})"),
+                    re.compile(r"(?P<Year>[0-9]{4})")
+                    ]
+# The full and abbreviated English month names (as accepted by strptime's %B and %b), lowercased.
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december"]
+MONTHS = {**{name: number for number, name in enumerate(MONTH_NAMES, 1)},
+          **{name[:3]: number for number, name in enumerate(MONTH_NAMES, 1)}
+          }
+
+
+@lru_cache(maxsize=4096)
+def normalize_date(release_date: Text) -> Optional[Text]:
+    """
+    Rewrite a release date in the YYYY-MM-DD format.
+
+    Parenthesized notes are removed first. If the date has lowercase letters, it is matched against
+    ALPHA_PATTERNS (e.g. "June 15, 2005", "15 June 2005", "2005-Jun-15", "2005 June", or "June 2005"),
+    and otherwise against NUMERIC_PATTERNS (e.g. "2005-06-15", "2005/6", "6/2005", or "2005"); a
+    missing day or month is taken to be 01. A pattern whose match is not a valid date (e.g. "Fall 2005"
+    or "February 30, 2005") is skipped.
+
+    The release dates repeat across films, so the results are cached by the raw string.
+
+    Args:
+        release_date (Text): The release date, as found in the infobox.
+
+    Returns:
+        (Optional[Text]): The date in YYYY-MM-DD format, or None if it cannot be parsed.
+    """
+    release_date = JUNK.sub("", release_date)
+    alpha = LOWERCASE.search(release_date) is not None
+    for pattern in ALPHA_PATTERNS if alpha else NUMERIC_PATTERNS:
+        match = pattern.search(release_date)
+        if not match:
+            continue
+        fields = match.groupdict()
+        year = int(fields["Year"])
+        if alpha:
+            month = MONTHS.get(fields["Month"].lower())
+            if month is None:
+                continue
+        else:
+            month = int(fields.get("Month") or 1)
+        day = int(fields.get("Day") or 1)
+        try:
+            return date(year, month, day).isoformat()
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,266 @@
+"""
+Load the films from a local wikipedia XML dump instead of crawling.
+
+From the actors_repo directory, run:
+    python -m data_collection.dump DUMP_PATH [--index INDEX_PATH] [--workers N] [--chunk-size N]
+                                             [--start-year 2003] [--end-year 2022] [--no-load]
+
+where DUMP_PATH is a pages-articles.xml.bz2 (or pages-articles-multistream.xml.bz2) dump. The films
+are the articles linked from the List of American films of YYYY pages, as in parse_list; their
+{{Infobox film}} wikitext is parsed and cleaned by a pool of worker processes, and the cleaned
+items are written by DBPipeline (built from the project settings).
+
+The dump is streamed with an incremental XML parser, and each page is discarded once it has been
+seen, so the memory use does not grow with the size of the dump. Without an index, the dump is read
+once to find the list pages, and once more to find the films (and once more for the targets of any
+redirects). With the --index of a multistream dump, only the bz2 streams holding the wanted pages are
+read, and they are decompressed by the worker processes as well.
+"""
+import argparse
+import bz2
+import io
+import logging
+import os
+import time
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Set, Text, Tuple
+from xml.etree.ElementTree import iterparse
+
+import scrapy
+from scrapy.settings import Settings
+from scrapy.utils.project import get_project_settings
+
+from . import wikitext
+from .pipelines import DatePipeline, DBPipeline, DropEmptyPipeline, MoneyPipeline
+from .reparse import bounded_map, chunked, clean_items
+from .spiders.actors_wiki_spider import Actorswiki
+
+logger = logging.getLogger(__name__)
+
+# The state of each worker process, set by init_worker.
+worker_spider = None
+worker_stages = None
+
+
+def local_name(tag: Text) -> Text:
+    """
+    Strip the namespace from an element's tag, e.g. '{http://www.mediawiki.org/xml/export-0.10/}page'.
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_pages(source: BinaryIO) -> Iterator[Tuple[Text, Optional[Text], Text, Optional[int]]]:
+    """
+    Stream the articles of a dump.
+
+    Each page element is cleared from the tree once it has been read, so only one page is held in memory.
+
+    Args:
+        source (BinaryIO): The decompressed XML of the dump, or of part of it.
+
+    Yields:
+        (Tuple[Text, Optional[Text], Text, Optional[int]]): The title of each article (pages in other
+        namespaces are skipped), the title it redirects to or None, its wikitext, and its article id.
+    """
+    root = None
+    for event, element in iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            continue
+        if local_name(element.tag) != "page":
+            continue
+        children = {local_name(child.tag): child for child in element}
+        if children.get("ns") is not None and children["ns"].text == "0":
+            redirect = children.get("redirect")
+            text = None
+            if children.get("revision") is not None:
+                text = next((child.text for child in children["revision"] if local_name(child.tag) == "text"), None)
+            page_id = int(children["id"].text) if children.get("id") is not None else None
+            yield (children["title"].text, redirect.get("title") if redirect is not None else None, text or "", page_id)
+        root.clear()
+
+
+def read_index(index_path: Text) -> Iterator[Tuple[int, Text]]:
+    """
+    Stream the index of a multistream dump.
+
+    Args:
+        index_path (Text): The path of the pages-articles-multistream-index.txt.bz2 file.
+
+    Yields:
+        (Tuple[int, Text]): The offset of the bz2 stream holding each page, and the page's title.
+    """
+    with bz2.open(index_path, "rt", encoding="utf-8") as index:
+        for line in index:
+            offset, _, title = line.rstrip("\n").split(":", 2)
+            yield int(offset), title
+
+
+def read_stream(task: Tuple[Text, int, List[Text]]) -> List[Tuple[Text, Optional[Text], Text, Optional[int]]]:
+    """
+    Decompress one bz2 stream of a multistream dump, and get the pages with the given titles from it.
+
+    Args:
+        task (Tuple[Text, int, List[Text]]): The path of the dump, the offset of the stream, and the titles.
+
+    Returns:
+        (List[Tuple[Text, Optional[Text], Text, Optional[int]]]): The title, redirect target, wikitext, and
+        article id of the pages found.
+    """
+    dump_path, offset, titles = task
+    decompressor = bz2.BZ2Decompressor()
+    blocks = []
+    with open(dump_path, "rb") as dump:
+        dump.seek(offset)
+        while not decompressor.eof:
+            block = dump.read(1 << 16)
+            if not block:
+                break
+            blocks.append(decompressor.decompress(block))
+    data = b"".join(blocks)
+    # The first stream starts with the siteinfo, and the last one ends with the closing mediawiki tag.
+    start = data.find(b"<page>")
+    end = data.rfind(b"</page>")
+    if start == -1:
+        return []
+    pages = iter_pages(io.BytesIO(b"<pages>" + data[start:end + len(b"</page>")] + b"</pages>"))
+    titles = set(titles)
+    return [page for page in pages if page[0] in titles]
+
+
+def find_pages(dump_path: Text, titles: Set[Text], index_path: Optional[Text], pool: Executor,
+               max_pending: int) -> Iterator[Tuple[Text, Optional[Text], Text, Optional[int]]]:
+    """
+    Find the articles with the given titles in the dump.
+
+    Args:
+        dump_path (Text): The path of the dump.
+        titles (Set[Text]): The titles of the articles.
+        index_path (Optional[Text]): The path of the multistream index, if there is one.
+        pool (Executor): The pool of workers which decompress the streams, when there is an index.
+        max_pending (int): The maximum number of streams being decompressed at once.
+
+    Yields:
+        (Tuple[Text, Optional[Text], Text, Optional[int]]): The title, redirect target, wikitext, and article
+        id of the articles found.
+    """
+    if index_path is None:
+        with bz2.open(dump_path) if dump_path.endswith(".bz2") else open(dump_path, "rb") as dump:
+            for page in iter_pages(dump):
+                if page[0] in titles:
+                    yield page
+        return
+    streams = {}
+    for offset, title in read_index(index_path):
+        if title in titles:
+            streams.setdefault(offset, []).append(title)
+    tasks = ((dump_path, offset, stream_titles) for offset, stream_titles in sorted(streams.items()))
+    for pages in bounded_map(pool, read_stream, tasks, max_pending):
+        yield from pages
+
+
+def resolve_pages(dump_path: Text, titles: Set[Text], index_path: Optional[Text], pool: Executor,
+                  max_pending: int) -> Iterator[Tuple[Text, Text, Optional[int]]]:
+    """
+    Find the articles with the given titles, following the redirects among them (once, as the API does).
+
+    Yields:
+        (Tuple[Text, Text, Optional[int]]): The title, wikitext, and article id of each article found.
+    """
+    found = set()
+    targets = set()
+    for title, redirect, text, page_id in find_pages(dump_path, titles, index_path, pool, max_pending):
+        if redirect:
+            targets.add(wikitext.normalize_title(redirect))
+        else:
+            found.add(title)
+            yield title, text, page_id
+    if targets - found:
+        for title, redirect, text, page_id in find_pages(dump_path, targets - found, index_path, pool, max_pending):
+            if not redirect:
+                yield title, text, page_id
+
+
+def init_worker(settings: dict) -> None:
+    """
+    Build the spider and cleaning pipelines of a worker process.
+
+    Args:
+        settings (dict): The settings used by film_items (e.g. FILM_RECORDS).
+
+    Returns:
+        None
+    """
+    global worker_spider, worker_stages
+    worker_spider = Actorswiki()
+    worker_spider.settings = Settings(settings)
+    worker_stages = [DropEmptyPipeline(), DatePipeline(), MoneyPipeline()]
+
+
+def parse_chunk(pages: List[Tuple[Text, Text, Optional[int]]]) -> Tuple[List[scrapy.Item], dict]:
+    """
+    Parse and clean the wikitext of the film articles in a worker process.
+
+    Args:
+        pages (List[Tuple[Text, Text, Optional[int]]]): The title, wikitext, and article id of each film article.
+
+    Returns:
+        (Tuple[List[scrapy.Item], dict]): The cleaned items, and the 'films', 'dropped', and 'errors' counts.
+    """
+    counts = {"films": len(pages), "dropped": 0, "errors": 0}
+    items = []
+    for title, text, page_id in pages:
+        fields = wikitext.extract_film(title, text, page_id)
+        items.extend(clean_items(worker_spider.film_items(fields), worker_stages, worker_spider, counts))
+    return items, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", help="the path of the pages-articles XML dump (.xml or .xml.bz2)")
+    parser.add_argument("--index", help="the path of the index of a multistream dump")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="the number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=20, help="the number of films per task")
+    parser.add_argument("--start-year", type=int, default=2003)
+    parser.add_argument("--end-year", type=int, default=2022)
+    parser.add_argument("--no-load", action="store_true", help="parse and clean the films without writing them")
+    args = parser.parse_args()
+
+    settings = get_project_settings()
+    spider = Actorswiki()
+    spider.settings = settings
+    loader = None
+    if not args.no_load:
+        loader = DBPipeline.from_settings(settings, writer_thread=False)
+        loader.open_spider(spider)
+    totals = {"films": 0, "items": 0, "dropped": 0, "errors": 0}
+    max_pending = 2 * args.workers
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=init_worker,
+                             initargs=({"FILM_RECORDS": settings.getbool("FILM_RECORDS")},)) as pool:
+        list_pages = {f"List of American films of {year}" for year in range(args.start_year, args.end_year + 1)}
+        films = set()
+        for _, text, _ in resolve_pages(args.dump, list_pages, args.index, pool, max_pending):
+            films.update(wikitext.list_titles(text))
+        logger.info(f"Found {len(films)} films in {len(list_pages)} list pages")
+
+        pages = resolve_pages(args.dump, films, args.index, pool, max_pending)
+        for items, counts in bounded_map(pool, parse_chunk, chunked(pages, args.chunk_size), max_pending):
+            for item in items:
+                if loader is not None:
+                    loader.process_item(item, spider)
+            totals["films"] += counts["films"]
+            totals["items"] += len(items)
+            totals["dropped"] += counts["dropped"]
+            totals["errors"] += counts["errors"]
+    if loader is not None:
+        loader.close_spider(spider)
+    elapsed = time.perf_counter() - start
+    print(f"{totals['films']} of {len(films)} listed films found in the dump by {args.workers} workers in {elapsed:.2f}s: "
+          f"{totals['items']} items loaded, {totals['dropped']} dropped, {totals['errors']} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import re
+from typing import Callable, Dict, List, Optional, Text, Tuple
+from urllib.parse import unquote, urlparse
+
+import scrapy
+from lxml import etree
+from parsel import Selector, SelectorList
+
+from .wikitext import page_key
+
+# The article id of a wikipedia page, from the page's RLCONF script (which the trimmed pages keep).
+ARTICLE_ID_PATTERN = re.compile(rb'"wgArticleId":(\d+)')
+
+# The relative xpaths tried (in order) from the infobox cell of the row whose label contains the key,
+# for the budget and box office.
+BUDGET_PATHS = [("Budget", './text()'),
+                ("Budget", './span/text()'),
+                ("Budget", './/li[1]/text()')
+                ]
+BOX_OFFICE_PATHS = [("Box office", './text()'),
+                    ("Box office", './span/text()'),
+                    ("Box office", './/li[contains(., "total")]/text()'),
+                    ("Box office", './/li[1]/text()')
+                    ]
+# The relative xpaths tried (in order) from the release date cell, with the condition which rejects
+# a result: 1) it is in a list of release dates, and we want the US release date, 2) it is the first
+# release date in a list, or 3) there is a single release date (or original air date) listed.
+RELEASE_DATE_PATHS = [('.//li[text()[contains(., "States") or contains(., "US")]]/span/span/text()',
+                       lambda x: re.sub(r"\(|\)", "", x) == "United States"),
+                      ('.//li[1]/span/span/text()', lambda x: len(x) < 4),
+                      ('./span/span/text()', lambda x: len(x) < 4),
+                      ('./text()', lambda x: len(x) < 4)
+                      ]
+# For each name field: the key of the row label, whether the key is matched against the label's div
+# (rather than the whole label), the relative path to the lists of names, and the relative path to
+# the names when they are not in a list.
+NAME_PATHS = {"actor_name": ("Starring", False, './div/ul', '.'),
+              "director": ("Directed by", False, './div/ul', '.'),
+              "distributor": ("Distributed", False, './div/ul', '.'),
+              "prod_co": ("Production", True, './div/div/ul', './div')
+              }
+
+
+def first_element(response: scrapy.http.Response, tag: Text, condition: Callable[[etree.ElementBase], bool]) -> SelectorList:
+    """
+    Find the first element with the tag which satisfies the condition.
+
+    Unlike an xpath such as '//table[...]', this stops at the first match instead of searching the
+    whole page, which matters since the heading and the infobox are near the top of the page.
+
+    Args:
+        response (scrapy.http.Response): The film page.
+        tag (Text): The element tag.
+        condition (Callable[[etree.ElementBase], bool]): The condition the lxml element must satisfy.
+
+    Returns:
+        (SelectorList): The first matching element, or an empty SelectorList.
+    """
+    for element in response.selector.root.iter(tag):
+        if condition(element):
+            return SelectorList([Selector(root=element, type="html")])
+    return SelectorList()
+
+
+class Infobox:
+    """
+    This class is used to extract the film fields from a film's wikipedia page in a single pass.
+
+    The infobox table is found once, and its rows are walked once to build the list of row labels
+    and cells; every field is then derived from these rows, instead of searching the whole page
+    for each field.
+
+    Attributes:
+        heading (scrapy.selector.SelectorList): the page's firstHeading, containing the film title
+        rows (List[Tuple[Text, Text, SelectorList]]): for each row of the infobox (in order), the
+            string value of its label, the string value of the label's div, and its cells
+    """
+    def __init__(self, response: scrapy.http.Response):
+        self.heading = first_element(response, "h1", lambda h1: h1.get("id") == "firstHeading")
+        table = first_element(response, "table", lambda table: "infobox" in table.get("class", ""))
+        self.rows = []
+        for row in table.xpath('./tbody/tr | ./tr'):
+            label = row.xpath('string(th)').get()
+            div_label = row.xpath('string(th/div)').get()
+            self.rows.append((label, div_label, row.xpath('./td')))
+
+    def cells(self, key: Text, div: bool = False) -> SelectorList:
+        """
+        Get the cells of the rows whose label contains key.
+
+        Args:
+            key (Text): The text to look for in the row labels.
+            div (bool): Whether to look for the key in the label's div rather than the whole label.
+
+        Returns:
+            (SelectorList): The cells of the matching rows, in order.
+        """
+        matches = SelectorList()
+        for label, div_label, tds in self.rows:
+            if key in (div_label if div else label):
+                matches.extend(tds)
+        return matches
+
+    def first_text(self, paths: List[Tuple[Text, Text]]) -> Optional[Text]:
+        """
+        Get the first result of the first path which produces any results.
+
+        Args:
+            paths (List[Tuple[Text, Text]]): The (row key, relative xpath) pairs to try.
+
+        Returns:
+            (Optional[Text]): The first text found, or None.
+        """
+        for key, rel_path in paths:
+            result = self.cells(key).xpath(rel_path)
+            if result:
+                return result.get()
+        return None
+
+    def title(self) -> Optional[Text]:
+        """
+        Get the film's title from the page heading.
+
+        Returns:
+            (Optional[Text]): The film title, or None.
+        """
+        for rel_path in ['./i/text()', './span/text()']:
+            result = self.heading.xpath(rel_path)
+            if result:
+                return result.get()
+        return None
+
+    def release_date(self) -> Optional[Text]:
+        """
+        Get the release date (or original air date) of the film.
+
+        Returns:
+            (Optional[Text]): The film's release date or None.
+        """
+        rows = SelectorList()
+        for label, _, tds in self.rows:
+            if "date" in label or "elease" in label:
+                rows.extend(tds)
+        if rows:
+            row = rows[0]
+            for rel_path, condition in RELEASE_DATE_PATHS:
+                potential_date = row.xpath(rel_path).get()
+                if potential_date and not condition(potential_date):
+                    return potential_date
+        return None
+
+    def names(self, item_field: Text) -> List[Text]:
+        """
+        Get the actors, directors, distributors, or production companies of the film.
+
+        Args:
+            item_field (Text): Either 'actor_name', 'director', 'distributor', or 'prod_co'.
+
+        Returns:
+            (List[Text]): The stripped, non-empty names, in the order they appear in the infobox.
+        """
+        key, div, list_path, cell_path = NAME_PATHS[item_field]
+        cells = self.cells(key, div)
+        lists = cells.xpath(list_path)
+        if lists and lists.xpath('li'):
+            texts = lists.xpath('.//li/a/text()').getall() + lists.xpath('.//li/text()').getall()
+        else:
+            cells = cells.xpath(cell_path)
+            texts = cells.xpath('./a/text()').getall() + cells.xpath('./text()').getall()
+        return [text.strip() for text in texts if text.strip()]
+
+
+def extract_film(response: scrapy.http.Response) -> Dict:
+    """
+    Extract the film's page key, title, budget, box office, release date, and names from its wikipedia page.
+
+    Args:
+        response (scrapy.http.Response): Scrapy's representation of the HTTP Response object
+            arising from the request for one of the film pages.
+
+    Returns:
+        (Dict): The 'page_id' of the film (see wikitext.page_key), its 'film', 'budget', 'box_office',
+        and 'release_date' (each a string or None), and the lists of 'actor_name', 'director',
+        'distributor', and 'prod_co' names.
+    """
+    infobox = Infobox(response)
+    article_id = ARTICLE_ID_PATTERN.search(response.body)
+    # Without an article id, the page is keyed by the title in its URL (after any redirect).
+    title = unquote(urlparse(response.url).path.rsplit("/wiki/", 1)[-1])
+    fields = {"page_id": page_key(int(article_id.group(1)) if article_id else None, title),
+              "film": infobox.title(),
+              "budget": infobox.first_text(BUDGET_PATHS),
+              "box_office": infobox.first_text(BOX_OFFICE_PATHS),
+              "release_date": infobox.release_date()
+              }
+    for item_field in NAME_PATHS:
+        fields[item_field] = infobox.names(item_field)
+    return fields
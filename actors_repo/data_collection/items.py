@@ -2,32 +2,106 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
+#
+# The items are slotted dataclasses, which itemadapter (and so scrapy) accepts as items. A crawl
+# creates hundreds of thousands of name items, and a slotted instance holds its fields in fixed slots
+# instead of the dict behind each scrapy.Item (see benchmarks/item_bench.py).
+#
+# Every item carries the page_id of its film's article (see wikitext.page_key), which identifies the
+# film in the movies table; the film field is only its title, which several films may share.
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, KeysView, List, Optional, Text, Union
+
+
+class SlottedItem:
+    """
+    This class gives the item dataclasses the mapping interface of scrapy.Item used by the pipelines.
+
+    Unlike a scrapy.Item, every field is always set: a field which was not filled in is None, and keys()
+    holds all of the item's fields.
+    """
+    __slots__ = ()
+
+    def keys(self) -> KeysView:
+        return self.__dataclass_fields__.keys()
+
+    def get(self, field: Text, default: Any = None) -> Any:
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __getitem__(self, field: Text) -> Any:
+        if field not in self.__dataclass_fields__:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field: Text, value: Any) -> None:
+        if field not in self.__dataclass_fields__:
+            raise KeyError(f"{type(self).__name__} does not support field: {field}")
+        setattr(self, field, value)
+
+
+@dataclass(slots=True)
+class CastItem(SlottedItem):
+    page_id: Optional[int] = None
+    film: Optional[Text] = None
+    actor_name: Optional[Text] = None
+
 
-import scrapy
+@dataclass(slots=True)
+class DirectorItem(SlottedItem):
+    page_id: Optional[int] = None
+    film: Optional[Text] = None
+    director: Optional[Text] = None
 
 
-class CastItem(scrapy.Item):
-    film = scrapy.Field()
-    actor_name = scrapy.Field()
+@dataclass(slots=True)
+class DistributorItem(SlottedItem):
+    page_id: Optional[int] = None
+    film: Optional[Text] = None
+    distributor: Optional[Text] = None
 
 
-class DirectorItem(scrapy.Item):
-    film = scrapy.Field()
-    director = scrapy.Field()
+@dataclass(slots=True)
+class MovieItem(SlottedItem):
+    page_id: Optional[int] = None
+    film: Optional[Text] = None
+    budget: Union[Text, Decimal, None] = None
+    box_office: Union[Text, Decimal, None] = None
+    release_date: Optional[Text] = None
 
 
-class DistributorItem(scrapy.Item):
-    film = scrapy.Field()
-    distributor = scrapy.Field()
+@dataclass(slots=True)
+class ProductionCoItem(SlottedItem):
+    page_id: Optional[int] = None
+    film: Optional[Text] = None
+    prod_co: Optional[Text] = None
 
 
-class MovieItem(scrapy.Item):
-    film = scrapy.Field()
-    budget = scrapy.Field()
-    box_office = scrapy.Field()
-    release_date = scrapy.Field()
+@dataclass(slots=True)
+class FilmRecord(SlottedItem):
+    page_id: Optional[int] = None
+    film: Optional[Text] = None
+    budget: Union[Text, Decimal, None] = None
+    box_office: Union[Text, Decimal, None] = None
+    release_date: Optional[Text] = None
+    cast: Optional[List[Text]] = None
+    directors: Optional[List[Text]] = None
+    distributors: Optional[List[Text]] = None
+    prod_cos: Optional[List[Text]] = None
+    url: Optional[Text] = None
+    etag: Optional[Text] = None
+    last_modified: Optional[Text] = None
+    revision_id: Optional[int] = None
+    listed_url: Optional[Text] = None
+    seen_urls: Optional[List[Text]] = None
 
 
-class ProductionCoItem(scrapy.Item):
-    film = scrapy.Field()
-    prod_co = scrapy.Field()
+# Maps the name field of CastItems, DirectorItems, DistributorItems, and ProductionCoItems
+# to the FilmRecord field holding the list of those names.
+RECORD_FIELDS = {"actor_name": "cast",
+                 "director": "directors",
+                 "distributor": "distributors",
+                 "prod_co": "prod_cos"
+                 }
@@ -3,11 +3,27 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import re
+
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import scrapy
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from .archive import ResponseArchive
+from .spiders.actors_wiki_spider import is_film_page
+from .storage import StorageBackend, open_backend
+
+# The revision id of a wikipedia article, from the page's RLCONF script.
+REVISION_PATTERN = re.compile(rb'"wgCurRevisionId":(\d+)')
+# The class attribute of an html start tag.
+CLASS_PATTERN = re.compile(rb'\sclass="([^"]*)"')
+
 
 class ActorsWikiSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -101,3 +117,342 @@ class ActorsWikiDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ResponseArchiveMiddleware:
+    """
+    This class is used to capture the fetched responses in a ResponseArchive, or to replay them from it.
+
+    With ARCHIVE_MODE = "capture", every response is stored in the archive at ARCHIVE_PATH under its
+    URL (and under the URLs of any requests which were redirected to it). With ARCHIVE_MODE = "replay",
+    every request is answered from the archive without touching the network, and requests whose URL
+    is not in the archive are ignored.
+
+    The middleware sits after HttpCompressionMiddleware and RedirectMiddleware, so the archive holds the
+    decoded bodies of the final responses.
+
+    Attributes:
+        archive (ResponseArchive): the archive the responses are stored in or replayed from
+        mode (Text): either "capture" or "replay"
+        stats (scrapy.statscollectors.StatsCollector): the crawler's stats collector
+    """
+    def __init__(self, archive: ResponseArchive, mode: str, stats):
+        self.archive = archive
+        self.mode = mode
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get("ARCHIVE_MODE")
+        if not mode:
+            raise NotConfigured
+        if mode not in ("capture", "replay"):
+            raise ValueError(f"ARCHIVE_MODE must be 'capture' or 'replay', not {mode!r}")
+        archive = ResponseArchive(crawler.settings.get("ARCHIVE_PATH"))
+        s = cls(archive, mode, crawler.stats)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_request(self, request: scrapy.Request, spider: scrapy.Spider) -> Optional[scrapy.http.Response]:
+        """
+        Answer the request from the archive in replay mode.
+
+        Raises:
+            scrapy.exceptions.IgnoreRequest: if the request's URL is not in the archive.
+        """
+        if self.mode != "replay":
+            return None
+        response = self.archive.retrieve(request.url)
+        if response is None:
+            self.stats.inc_value("archive/missing", spider=spider)
+            raise IgnoreRequest(f"{request.url} is not in the archive {self.archive.path}")
+        self.stats.inc_value("archive/replayed", spider=spider)
+        return response.replace(request=request)
+
+    def process_response(self, request: scrapy.Request, response: scrapy.http.Response,
+                         spider: scrapy.Spider) -> Union[scrapy.Request, scrapy.http.Response]:
+        """
+        Store the response in the archive in capture mode.
+        """
+        if self.mode == "capture":
+            for url in [*request.meta.get("redirect_urls", []), response.url]:
+                self.archive.store(url, response)
+            self.stats.inc_value("archive/stored", spider=spider)
+        return response
+
+    def spider_closed(self, spider):
+        self.archive.close()
+
+
+class IncrementalMiddleware:
+    """
+    This class is used to skip the film pages which have not changed since they were last written to the database.
+
+    With INCREMENTAL = True, the validators of each film page (its ETag, Last-Modified, and revision id)
+    are loaded from the pages table when the spider opens. Requests for known film pages are sent with
+    If-None-Match and If-Modified-Since headers, and a 304 response, or a 200 response whose revision id
+    is the stored one, is dropped before it reaches parse_films. The validators of the other film pages
+    are passed to parse_films in the 'page_validators' meta key, so DBPipeline stores them with the film.
+
+    The middleware sits after HttpCompressionMiddleware, so the revision id can be read from the decoded
+    body, and before ResponseArchiveMiddleware, so the skipped responses are not archived.
+
+    Attributes:
+        stats (scrapy.statscollectors.StatsCollector): the crawler's stats collector
+        backend (StorageBackend): the database holding the pages table (see DB_BACKEND)
+        validators (Dict[Text, Tuple]): the stored (etag, last_modified, revision_id) of each film page, keyed by URL
+    """
+    def __init__(self, stats, backend: StorageBackend):
+        self.stats = stats
+        self.backend = backend
+        self.validators = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("INCREMENTAL"):
+            raise NotConfigured
+        backend = open_backend(crawler.settings.get("DB_BACKEND", "mysql"), crawler.settings.get("DB_PATH"))
+        s = cls(crawler.stats, backend)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
+
+    def spider_opened(self, spider):
+        self.validators = self.load_validators(self.backend)
+        spider.logger.info(f"Loaded the validators of {len(self.validators)} film pages")
+
+    @staticmethod
+    def load_validators(backend: StorageBackend) -> Dict[str, Tuple]:
+        """
+        Load the validators stored in the pages table by DBPipeline.
+
+        Args:
+            backend (StorageBackend): The database holding the pages table.
+
+        Returns:
+            (Dict[Text, Tuple]): The (etag, last_modified, revision_id) of each film page, keyed by URL.
+        """
+        conn = backend.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""SELECT url, etag, last_modified, revision_id
+                              FROM pages
+                           """)
+            return {url: tuple(validators) for url, *validators in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    def process_request(self, request: scrapy.Request, spider: scrapy.Spider) -> None:
+        """
+        Make the request for a known film page conditional on its stored ETag and Last-Modified.
+        """
+        stored = self.validators.get(request.url)
+        if stored is None:
+            return None
+        etag, last_modified, _ = stored
+        if etag:
+            request.headers.setdefault("If-None-Match", etag)
+        if last_modified:
+            request.headers.setdefault("If-Modified-Since", last_modified)
+        return None
+
+    def process_response(self, request: scrapy.Request, response: scrapy.http.Response,
+                         spider: scrapy.Spider) -> scrapy.http.Response:
+        """
+        Drop the unchanged film pages, and pass the validators of the others on to parse_films.
+
+        Raises:
+            scrapy.exceptions.IgnoreRequest: if the film page was not modified, or its revision id
+                is the stored one.
+        """
+        if not is_film_page(request.url):
+            return response
+        if response.status == 304:
+            self.stats.inc_value("incremental/not_modified", spider=spider)
+            raise IgnoreRequest(f"{request.url} was not modified")
+        if response.status != 200:
+            return response
+        match = REVISION_PATTERN.search(response.body)
+        revision_id = int(match.group(1)) if match else None
+        stored = self.validators.get(request.url)
+        if stored is not None and revision_id is not None and stored[2] == revision_id:
+            self.stats.inc_value("incremental/unchanged", spider=spider)
+            raise IgnoreRequest(f"{request.url} is unchanged at revision {revision_id}")
+        self.stats.inc_value("incremental/new" if stored is None else "incremental/changed", spider=spider)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        request.meta["page_validators"] = {"url": request.url,
+                                           "etag": etag.decode("latin-1") if etag else None,
+                                           "last_modified": last_modified.decode("latin-1") if last_modified else None,
+                                           "revision_id": revision_id
+                                           }
+        return response
+
+
+class TrimFilmPageMiddleware:
+    """
+    This class is used to cut the body of each film page down to the parts parse_films reads.
+
+    With TRIM_FILM_PAGES = True, the body of a film page is replaced by a page holding only its
+    firstHeading, its infobox table, and its RLCONF script (which has the page's revision and article
+    ids), so lxml parses a few KB instead of the whole article, and far less memory is held by the
+    responses in flight. The parts are found by scanning the raw bytes, counting the nested tables
+    of the infobox; a page whose heading or infobox is not found is left untouched, as are the list
+    pages and the API responses.
+
+    The middleware sits before IncrementalMiddleware and ResponseArchiveMiddleware, so those still
+    see, and archive, the whole page; replayed pages are trimmed as well.
+
+    Attributes:
+        stats (scrapy.statscollectors.StatsCollector): the crawler's stats collector
+    """
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("TRIM_FILM_PAGES"):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_response(self, request: scrapy.Request, response: scrapy.http.Response,
+                         spider: scrapy.Spider) -> scrapy.http.Response:
+        """
+        Replace the body of a film page with its heading, infobox, and RLCONF script.
+        """
+        if not is_film_page(request.url) or response.status != 200 or not isinstance(response, scrapy.http.HtmlResponse):
+            return response
+        body = self.trim(response.body)
+        if body is None:
+            self.stats.inc_value("trim/untouched", spider=spider)
+            return response
+        self.stats.inc_value("trim/trimmed", spider=spider)
+        self.stats.inc_value("trim/bytes_in", len(response.body), spider=spider)
+        self.stats.inc_value("trim/bytes_out", len(body), spider=spider)
+        return response.replace(body=body)
+
+    @staticmethod
+    def element(body: bytes, start: int, tag: bytes) -> bytes:
+        """
+        Get the element whose start tag begins at start, including any elements of the same tag nested in it.
+
+        Args:
+            body (bytes): The html.
+            start (int): The index of the element's start tag.
+            tag (bytes): The element's tag, e.g. b'table'.
+
+        Returns:
+            (bytes): The element, up to its end tag (or the end of the body if it is not closed).
+        """
+        opening = b"<" + tag
+        closing = b"</" + tag + b">"
+        depth = 0
+        i = start
+        while True:
+            next_open = body.find(opening, i)
+            next_close = body.find(closing, i)
+            if next_close == -1:
+                return body[start:]
+            if next_open != -1 and next_open < next_close:
+                depth += 1
+                i = next_open + len(opening)
+            else:
+                depth -= 1
+                i = next_close + len(closing)
+                if depth == 0:
+                    return body[start:i]
+
+    @classmethod
+    def trim(cls, body: bytes) -> Optional[bytes]:
+        """
+        Build a page out of the heading, infobox, and RLCONF script of a film page.
+
+        Args:
+            body (bytes): The html of the film page.
+
+        Returns:
+            (Optional[bytes]): The trimmed html, or None if the page has no firstHeading or no infobox.
+        """
+        heading = body.find(b'id="firstHeading"')
+        if heading == -1 or body.rfind(b"<h1", 0, heading) == -1:
+            return None
+        heading = cls.element(body, body.rfind(b"<h1", 0, heading), b"h1")
+        infobox = None
+        start = body.find(b"<table")
+        while start != -1:
+            tag = body[start:body.find(b">", start) + 1]
+            match = CLASS_PATTERN.search(tag)
+            # As in infobox.Infobox, the infobox is the first table with an 'infobox' class.
+            if match and b"infobox" in match.group(1):
+                infobox = cls.element(body, start, b"table")
+                break
+            start = body.find(b"<table", start + len(b"<table"))
+        if infobox is None:
+            return None
+        script = b""
+        rlconf = body.find(b"RLCONF")
+        if rlconf != -1 and body.rfind(b"<script", 0, rlconf) != -1:
+            script = cls.element(body, body.rfind(b"<script", 0, rlconf), b"script")
+        return b"".join([b"<!DOCTYPE html>\n<html><head>", script, b"</head><body>", heading, infobox, b"</body></html>"])
+
+
+class SeenFilmsMiddleware:
+    """
+    This class is used to skip the film pages already persisted, by this run, a previous run, or another shard.
+
+    With SEEN_PATH set, the requests for film pages yielded by parse_list are dropped if their URL is
+    in the spider's SeenSet; in API mode, the seen titles are removed from each batch. The films are
+    added to the set by DBPipeline (or SpoolPipeline) once their FilmRecords are persisted, not when
+    they are parsed, so a film lost in a failed batch or a crash is crawled again by the next run.
+
+    Since the set only records that a page was persisted, it is not used in incremental mode, which
+    re-checks every known page for changes.
+
+    Attributes:
+        stats (scrapy.statscollectors.StatsCollector): the crawler's stats collector
+    """
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get("SEEN_PATH"):
+            raise NotConfigured
+        if settings.getbool("INCREMENTAL"):
+            raise NotConfigured("the seen films are not skipped in incremental mode")
+        return cls(crawler.stats)
+
+    def process_spider_output(self, response: scrapy.http.Response, result: Iterable,
+                              spider: scrapy.Spider) -> Iterator:
+        """
+        Drop the requests for seen films from the output of parse_list.
+        """
+        if is_film_page(response.url) or urlsplit(response.url).path == "/w/api.php":
+            yield from result
+            return
+        for output in result:
+            if isinstance(output, scrapy.Request):
+                output = self.filter_request(output, spider)
+            if output is not None:
+                yield output
+
+    def filter_request(self, request: scrapy.Request, spider: scrapy.Spider) -> Optional[scrapy.Request]:
+        """
+        Drop the request if its film was seen, or rebuild an API batch without the seen titles.
+
+        Returns:
+            (Optional[scrapy.Request]): The request, the rebuilt request, or None if there is nothing left to fetch.
+        """
+        titles = request.cb_kwargs.get("titles")
+        if titles is None:
+            if is_film_page(request.url) and request.url in spider.seen:
+                self.stats.inc_value("seen/skipped", spider=spider)
+                return None
+            return request
+        wiki_url = spider.settings.get("WIKI_URL", "https://en.wikipedia.org")
+        unseen = [title for title in titles if f"{wiki_url}/wiki/{title}" not in spider.seen]
+        if len(unseen) < len(titles):
+            self.stats.inc_value("seen/skipped", len(titles) - len(unseen), spider=spider)
+        if not unseen:
+            return None
+        return request if len(unseen) == len(titles) else spider.api_request(unseen)
@@ -0,0 +1,373 @@
+import logging
+
+from typing import Callable, Collection, Dict, List, Text, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# The junction tables, with the id column and the table of the names they link to the movies.
+JUNCTIONS = [("filmdirectors", "director_id", "directors"),
+             ("filmdistributors", "distributor_id", "distributors"),
+             ("filmprodco", "prod_co_id", "productionco"),
+             ("castlist", "actor_id", "actors")]
+
+MYSQL_TABLES = ["""CREATE TABLE IF NOT EXISTS actors(
+                       actor_id INT AUTO_INCREMENT PRIMARY KEY,
+                       actor VARCHAR(100) NOT NULL UNIQUE
+                       )
+                """,
+                """CREATE TABLE IF NOT EXISTS directors(
+                       director_id INT AUTO_INCREMENT PRIMARY KEY,
+                       director VARCHAR(100) NOT NULL UNIQUE
+                       )
+                """,
+                """CREATE TABLE IF NOT EXISTS distributors(
+                       distributor_id INT AUTO_INCREMENT PRIMARY KEY,
+                       distributor VARCHAR(200) NOT NULL UNIQUE
+                       )
+                """,
+                """CREATE TABLE IF NOT EXISTS productionco(
+                       prod_co_id INT AUTO_INCREMENT PRIMARY KEY,
+                       prod_co VARCHAR(200) NOT NULL UNIQUE
+                       )
+                """,
+                """CREATE TABLE IF NOT EXISTS movies(
+                       movie_id INT AUTO_INCREMENT PRIMARY KEY,
+                       movie VARCHAR(200) NOT NULL UNIQUE,
+                       budget DECIMAL(12,6) DEFAULT NULL,
+                       box_office DECIMAL (12,6) DEFAULT NULL,
+                       release_date DATE DEFAULT NULL
+                       )
+                """,
+                *[f"""CREATE TABLE IF NOT EXISTS {junction}(
+                          movie_id INT,
+                          {id_col} INT,
+                          PRIMARY KEY(movie_id, {id_col}),
+                          FOREIGN KEY(movie_id)
+                              REFERENCES movies(movie_id),
+                          FOREIGN KEY({id_col})
+                              REFERENCES {table}({id_col})
+                          )
+                   """ for junction, id_col, table in JUNCTIONS],
+                """CREATE TABLE IF NOT EXISTS pages(
+                       url VARCHAR(500) PRIMARY KEY,
+                       movie_id INT NOT NULL,
+                       etag VARCHAR(200) DEFAULT NULL,
+                       last_modified VARCHAR(64) DEFAULT NULL,
+                       revision_id BIGINT DEFAULT NULL,
+                       FOREIGN KEY(movie_id)
+                           REFERENCES movies(movie_id)
+                       )
+                """
+                ]
+
+# The name columns are case insensitive, as with MySQL's default collation, and the junction tables are
+# stored in their primary key order.
+SQLITE_TABLES = ["""CREATE TABLE IF NOT EXISTS actors(
+                        actor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        actor VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE
+                        )
+                 """,
+                 """CREATE TABLE IF NOT EXISTS directors(
+                        director_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        director VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE
+                        )
+                 """,
+                 """CREATE TABLE IF NOT EXISTS distributors(
+                        distributor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        distributor VARCHAR(200) NOT NULL UNIQUE COLLATE NOCASE
+                        )
+                 """,
+                 """CREATE TABLE IF NOT EXISTS productionco(
+                        prod_co_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        prod_co VARCHAR(200) NOT NULL UNIQUE COLLATE NOCASE
+                        )
+                 """,
+                 """CREATE TABLE IF NOT EXISTS movies(
+                        movie_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        movie VARCHAR(200) NOT NULL UNIQUE COLLATE NOCASE,
+                        budget DECIMAL(12,6) DEFAULT NULL,
+                        box_office DECIMAL(12,6) DEFAULT NULL,
+                        release_date DATE DEFAULT NULL
+                        )
+                 """,
+                 *[f"""CREATE TABLE IF NOT EXISTS {junction}(
+                           movie_id INTEGER,
+                           {id_col} INTEGER,
+                           PRIMARY KEY(movie_id, {id_col}),
+                           FOREIGN KEY(movie_id)
+                               REFERENCES movies(movie_id),
+                           FOREIGN KEY({id_col})
+                               REFERENCES {table}({id_col})
+                           ) WITHOUT ROWID
+                    """ for junction, id_col, table in JUNCTIONS],
+                 """CREATE TABLE IF NOT EXISTS pages(
+                        url VARCHAR(500) PRIMARY KEY,
+                        movie_id INTEGER NOT NULL,
+                        etag VARCHAR(200) DEFAULT NULL,
+                        last_modified VARCHAR(64) DEFAULT NULL,
+                        revision_id BIGINT DEFAULT NULL,
+                        FOREIGN KEY(movie_id)
+                            REFERENCES movies(movie_id)
+                        )
+                 """
+                 ]
+
+# The junction tables are keyed by movie first, so the joins from a name to its films need the reverse
+# index, which also holds the movie_id. The statistics only read the id, box office, and release date of
+# each film, which the indexes on movies cover, for the films with a box office and for a range of years.
+ANALYTICS_INDEXES = [*[f"CREATE INDEX {junction}_{id_col[:-len('_id')]} ON {junction}({id_col}, movie_id)"
+                       for junction, id_col, _ in JUNCTIONS],
+                     "CREATE INDEX movies_box_office ON movies(box_office, release_date)",
+                     "CREATE INDEX movies_release_date ON movies(release_date, box_office)"
+                     ]
+
+# The films are keyed by the page_id of their article (see wikitext.page_key), and their titles are no
+# longer unique. The films stored before have no page_id until DBPipeline finds them by title again.
+MYSQL_PAGE_IDS = ["""ALTER TABLE movies
+                         ADD COLUMN page_id BIGINT DEFAULT NULL AFTER movie_id,
+                         ADD UNIQUE INDEX movies_page_id(page_id),
+                         DROP INDEX movie,
+                         ADD INDEX movies_movie(movie)
+                  """
+                  ]
+# SQLite cannot drop a UNIQUE constraint, so movies is rebuilt (keeping its ids) and its indexes recreated.
+SQLITE_PAGE_IDS = ["""CREATE TABLE movies_rebuilt(
+                          movie_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          page_id BIGINT DEFAULT NULL,
+                          movie VARCHAR(200) NOT NULL COLLATE NOCASE,
+                          budget DECIMAL(12,6) DEFAULT NULL,
+                          box_office DECIMAL(12,6) DEFAULT NULL,
+                          release_date DATE DEFAULT NULL
+                          )
+                   """,
+                   """INSERT INTO movies_rebuilt(movie_id, movie, budget, box_office, release_date)
+                      SELECT movie_id, movie, budget, box_office, release_date
+                      FROM movies
+                   """,
+                   "DROP TABLE movies",
+                   "ALTER TABLE movies_rebuilt RENAME TO movies",
+                   "CREATE UNIQUE INDEX movies_page_id ON movies(page_id)",
+                   "CREATE INDEX movies_movie ON movies(movie)",
+                   *[statement for statement in ANALYTICS_INDEXES if " ON movies(" in statement]
+                   ]
+
+# The page ids of the films, in a table of their own which is never partitioned, so that a page_id is stored
+# once even where it is not a unique key of movies (see MYSQL_RELEASE_YEAR). DBPipeline registers the page_id
+# of a film before inserting it: a writer registering the same page_id at once waits until the first one
+# commits, and then finds its film instead of inserting it again.
+PAGE_ID_REGISTRY = ["""CREATE TABLE movie_page_ids(
+                           page_id BIGINT NOT NULL PRIMARY KEY
+                           )
+                    """,
+                    """INSERT INTO movie_page_ids(page_id)
+                       SELECT page_id
+                       FROM movies
+                       WHERE page_id IS NOT NULL
+                    """
+                    ]
+
+# The partitions of a partitioned movies table: the films without a release date, the films released before the
+# first year, one partition per year named p<year> (see partition_movies), and the films released after the last year.
+UNDATED_PARTITION = "p_undated"
+EARLY_PARTITION = "p_early"
+LATE_PARTITION = "p_late"
+
+# MySQL requires the partitioning column in every unique key of the table, and a column of the primary key
+# to be NOT NULL, so the films are partitioned by a stored release_year, which is 0 for the undated films.
+# page_id is only unique within a release year; movie_page_ids keeps it unique across them.
+MYSQL_RELEASE_YEAR = """ALTER TABLE movies
+                            ADD COLUMN release_year SMALLINT AS (IFNULL(YEAR(release_date), 0)) STORED NOT NULL
+                                AFTER release_date,
+                            DROP PRIMARY KEY,
+                            ADD PRIMARY KEY(movie_id, release_year),
+                            DROP INDEX movies_page_id,
+                            ADD UNIQUE INDEX movies_page_id(page_id, release_year)
+                     """
+
+
+def drop_movie_foreign_keys(cursor) -> None:
+    """
+    Drop the foreign keys referencing the movies table which still exist, whatever their names.
+    """
+    cursor.execute("""SELECT DISTINCT TABLE_NAME, CONSTRAINT_NAME
+                      FROM information_schema.KEY_COLUMN_USAGE
+                      WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = 'movies'
+                   """
+                   )
+    for table, constraint in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {constraint}")
+
+
+def add_release_year(cursor) -> None:
+    """
+    Add release_year to the movies table and its keys with MYSQL_RELEASE_YEAR, unless it is already there.
+    """
+    cursor.execute("""SELECT COUNT(*)
+                      FROM information_schema.COLUMNS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'movies' AND COLUMN_NAME = 'release_year'
+                   """
+                   )
+    if not cursor.fetchone()[0]:
+        cursor.execute(MYSQL_RELEASE_YEAR)
+
+
+# A partitioned InnoDB table can neither have nor be referenced by a foreign key, so the foreign keys of the
+# junction and pages tables on movies are dropped first; their films are still found by movie_id. MySQL commits
+# each of these statements on its own, so the steps which were already made are skipped if the migration is
+# interrupted and applied again. The years are given partitions of their own by partition_movies.
+MYSQL_PARTITION_MOVIES = [drop_movie_foreign_keys,
+                          add_release_year,
+                          f"""ALTER TABLE movies PARTITION BY RANGE (release_year) (
+                                  PARTITION {UNDATED_PARTITION} VALUES LESS THAN (1),
+                                  PARTITION {LATE_PARTITION} VALUES LESS THAN MAXVALUE
+                                  )
+                           """
+                          ]
+
+# The schema changes, in the order they are applied: the version, a description, and the statements
+# for each backend, keyed by the backend's name; a step depending on the current schema is a function
+# of the cursor instead of a statement. A migration is never edited once released; a change to the
+# schema is made by appending a new one.
+MIGRATIONS: List[Tuple[int, Text, Dict[Text, List[Union[Text, Callable]]]]] = [
+    (1, "Create the actors_wiki tables", {"mysql": MYSQL_TABLES, "sqlite": SQLITE_TABLES}),
+    (2, "Add the reverse junction indexes and the movies statistics indexes",
+     {"mysql": ANALYTICS_INDEXES, "sqlite": ANALYTICS_INDEXES}),
+    (3, "Key the movies by page_id and make their titles non-unique",
+     {"mysql": MYSQL_PAGE_IDS, "sqlite": SQLITE_PAGE_IDS}),
+    (4, "Register the page ids of the movies", {"mysql": PAGE_ID_REGISTRY, "sqlite": PAGE_ID_REGISTRY}),
+    (5, "Partition movies by release year", {"mysql": MYSQL_PARTITION_MOVIES}),
+]
+
+# The migrations which are only applied to the databases asking for them, with the name of their option (see
+# MySQLBackend.connect). Until then they are skipped, and are not recorded, so a migration after one of them
+# must hold whether it was applied or not.
+OPTIONAL_MIGRATIONS = {5: "partition_movies"}
+
+
+def migrate(conn, backend, options: Collection[Text] = ()) -> List[int]:
+    """
+    Apply the migrations which are missing from the schema_migrations table of the database, in order.
+
+    The first migration creates the tables only if they are missing, so a database created before the
+    migrations were introduced is brought up to date as well. The schema is locked by the backend while
+    the migrations are applied, so several crawls (e.g. the shards of a crawl) may connect at once.
+    MySQL commits each statement changing the schema on its own, so a migration interrupted there may
+    have to be finished by hand; SQLite applies all the pending migrations in one transaction. The
+    OPTIONAL_MIGRATIONS are applied in the order of their versions as well, once they are asked for.
+
+    Args:
+        conn: The DB-API connection to the database.
+        backend (StorageBackend): The backend the connection was made by.
+        options (Collection[Text]): The names of the OPTIONAL_MIGRATIONS to apply as well.
+
+    Returns:
+        applied (List[int]): The versions of the migrations applied.
+    """
+    p = backend.param
+    cursor = conn.cursor()
+    backend.lock_schema(cursor)
+    applied = []
+    try:
+        cursor.execute("""CREATE TABLE IF NOT EXISTS schema_migrations(
+                              version INT PRIMARY KEY,
+                              description VARCHAR(200) NOT NULL,
+                              applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                              )
+                       """
+                       )
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            if version in OPTIONAL_MIGRATIONS and OPTIONAL_MIGRATIONS[version] not in options:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            for statement in statements[backend.name]:
+                if callable(statement):
+                    statement(cursor)
+                else:
+                    cursor.execute(statement)
+            cursor.execute(f"INSERT INTO schema_migrations(version, description) VALUES ({p}, {p})",
+                           (version, description))
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        backend.unlock_schema(cursor)
+        cursor.close()
+    return applied
+
+
+def year_partitions(first_year: int, last_year: int) -> List[Text]:
+    """
+    Get the definitions of the partitions of the films released from first_year to last_year (inclusive).
+    """
+    return [f"PARTITION p{year} VALUES LESS THAN ({year + 1})" for year in range(first_year, last_year + 1)]
+
+
+def partition_movies(conn, backend, first_year: int, last_year: int) -> List[int]:
+    """
+    Add the missing years from first_year to last_year to the partitions of the movies table of a MySQL database.
+
+    The movies table is partitioned by RANGE on release_year by the "partition_movies" migration, which
+    must have been applied. The first time, the films of the years are split out of the p_late partition,
+    and afterwards the years before the first partitioned year are split out of the p_early partition and
+    the years after the last one out of the p_late partition, so the range of years can be extended as the
+    crawl is. A query filtering on movies.release_year only reads the partitions of those years, and a
+    partition can be emptied at once with partitions.py. The junction tables are not partitioned: they hold
+    no release date, and are still found by the movie_id of the partition's films.
+
+    Args:
+        conn: The DB-API connection to the MySQL database.
+        backend (StorageBackend): The backend the connection was made by.
+        first_year (int): The first year with a partition of its own.
+        last_year (int): The last year with a partition of its own (inclusive).
+
+    Returns:
+        added (List[int]): The years whose partitions were added.
+
+    Raises:
+        ValueError: if first_year is after last_year, or movies is not partitioned.
+    """
+    if first_year > last_year:
+        raise ValueError(f"The first year {first_year} of the partitions is after the last year {last_year}")
+    cursor = conn.cursor()
+    backend.lock_schema(cursor)
+    added = []
+    try:
+        cursor.execute("""SELECT PARTITION_NAME
+                          FROM information_schema.PARTITIONS
+                          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'movies' AND PARTITION_NAME IS NOT NULL
+                       """
+                       )
+        names = [row[0] for row in cursor.fetchall()]
+        if not names:
+            raise ValueError("The movies table is not partitioned; apply the partition_movies migration first")
+        years = sorted(int(name[1:]) for name in names if name[1:].isdigit())
+        if not years:
+            partitions = ",\n".join([f"PARTITION {EARLY_PARTITION} VALUES LESS THAN ({first_year})",
+                                      *year_partitions(first_year, last_year),
+                                      f"PARTITION {LATE_PARTITION} VALUES LESS THAN MAXVALUE"])
+            cursor.execute(f"ALTER TABLE movies REORGANIZE PARTITION {LATE_PARTITION} INTO (\n{partitions}\n)")
+            added = list(range(first_year, last_year + 1))
+        else:
+            if first_year < years[0]:
+                partitions = ",\n".join([f"PARTITION {EARLY_PARTITION} VALUES LESS THAN ({first_year})",
+                                          *year_partitions(first_year, years[0] - 1)])
+                cursor.execute(f"ALTER TABLE movies REORGANIZE PARTITION {EARLY_PARTITION} INTO (\n{partitions}\n)")
+                added += range(first_year, years[0])
+            if last_year > years[-1]:
+                partitions = ",\n".join([*year_partitions(years[-1] + 1, last_year),
+                                          f"PARTITION {LATE_PARTITION} VALUES LESS THAN MAXVALUE"])
+                cursor.execute(f"ALTER TABLE movies REORGANIZE PARTITION {LATE_PARTITION} INTO (\n{partitions}\n)")
+                added += range(years[-1] + 1, last_year + 1)
+        if added:
+            logger.info(f"Added the movies partitions of the years {', '.join(map(str, added))}")
+        conn.commit()
+    finally:
+        backend.unlock_schema(cursor)
+        cursor.close()
+    return added
@@ -0,0 +1,68 @@
+import re
+
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Text
+
+# The tokens of a budget or box office string. Footnotes are skipped, and so is anything before the
+# first number (e.g. "US$", "est.", or "over"); anything else after it ends the amount.
+TOKENS = re.compile(r"""(?P<footnote>\[[^\]]*\])
+                        |(?P<number>\d+(?:,\d{3})*(?:\.\d+)?|\.\d+)
+                        |(?P<scale>thousand|million|billion|trillion)\b
+                        |(?P<dash>[-–—]|\bto\b)
+                        |(?P<space>\s+|\$|\\xa0)
+                        |(?P<other>[a-z]+|.)
+                     """, re.IGNORECASE | re.VERBOSE)
+SCALES = {"thousand": Decimal(10) ** 3,
+          "million": Decimal(10) ** 6,
+          "billion": Decimal(10) ** 9,
+          "trillion": Decimal(10) ** 12
+          }
+# The amounts are stored in millions of dollars, in a DECIMAL(12,6) column.
+MILLION = Decimal(10) ** 6
+PLACES = Decimal("0.000001")
+LIMIT = Decimal(10) ** 6
+
+
+@lru_cache(maxsize=4096)
+def parse_money(money: Text) -> Optional[Decimal]:
+    """
+    Parse a budget or box office string into millions of dollars.
+
+    The string is tokenized in a single pass. The amount is the first number, with the scale word
+    following it (e.g. "$12.5 million" or "$1.2 billion"), or the midpoint of the first range (e.g.
+    "$10–12 million" or "$10 million to $12 million", where the scale of the upper bound also applies
+    to a lower bound without one). A number without a scale is in dollars (e.g. "$15,000,000").
+
+    The strings repeat across films, so the results are cached by the raw string.
+
+    Args:
+        money (Text): The budget or box office, as found in the infobox.
+
+    Returns:
+        (Optional[Decimal]): The exact amount in millions, with 6 decimal places, or None if the string
+        has no number, or the amount does not fit in a DECIMAL(12,6) column.
+    """
+    bounds = []
+    scales = []
+    expecting = True
+    for token in TOKENS.finditer(money):
+        kind = token.lastgroup
+        if kind in ("footnote", "space"):
+            continue
+        if kind == "number" and expecting:
+            bounds.append(Decimal(token.group().replace(",", "")))
+            scales.append(None)
+            expecting = False
+        elif kind == "scale" and bounds and not expecting and scales[-1] is None:
+            scales[-1] = SCALES[token.group().lower()]
+        elif kind == "dash" and len(bounds) == 1 and not expecting:
+            expecting = True
+        elif bounds:
+            break
+    if not bounds:
+        return None
+    default_scale = next((scale for scale in reversed(scales) if scale is not None), Decimal(1))
+    amounts = [bound * (scale or default_scale) for bound, scale in zip(bounds, scales)]
+    value = (sum(amounts) / len(amounts) / MILLION).quantize(PLACES)
+    return value if value < LIMIT else None
@@ -0,0 +1,128 @@
+"""
+List the partitions of the movies table, or empty the partition of a release year before it is crawled again.
+
+From the actors_repo directory, run:
+    python -m data_collection.partitions [--truncate YEAR]
+
+The movies table of the MySQL database selected by DB_BACKEND is partitioned by release year when
+DB_PARTITION_YEARS is set (see the partition_movies migration in migrations.py), which happens as this script
+connects, so it can also be used to partition a database crawled before. Without arguments, the partitions are
+listed with the number of films in each.
+
+With --truncate, the links, pages, and registered page ids of the films released in YEAR are deleted from the
+junction, pages, and movie_page_ids tables with one statement per table, and the year's partition of movies is
+then truncated at once instead of deleting its films row by row. These tables are locked until the partition is
+truncated, so the crawls writing to the database at the same time wait for it, and the films they store are not
+left with links and page ids of deleted films. The names are kept, as other films share them. The year is loaded again
+by a crawl of its list page, e.g. scrapy crawl actors_wiki_spider -a start_year=YEAR -a end_year=YEAR, with
+SEEN_PATH unset (or a new file) so that the films are not skipped as seen. A film is in the partition of its
+release year, which is not always the year of the list it is on, so the neighbouring lists may be crawled too.
+"""
+import argparse
+
+from typing import List, Text, Tuple
+
+from scrapy.utils.project import get_project_settings
+
+from .migrations import JUNCTIONS
+from .pipelines import DBPipeline
+
+
+def list_partitions(conn) -> List[Tuple[Text, int]]:
+    """
+    Get the partitions of the movies table with the number of films in each, in the order of their years.
+
+    Args:
+        conn: The DB-API connection to the MySQL database.
+
+    Returns:
+        (List[Tuple[Text, int]]): The name and the number of films of each partition.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""SELECT PARTITION_NAME
+                      FROM information_schema.PARTITIONS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'movies' AND PARTITION_NAME IS NOT NULL
+                      ORDER BY PARTITION_ORDINAL_POSITION
+                   """
+                   )
+    partitions = []
+    # The row counts of information_schema are estimates, so the films are counted.
+    for name, in cursor.fetchall():
+        cursor.execute(f"SELECT COUNT(*) FROM movies PARTITION ({name})")
+        partitions.append((name, cursor.fetchone()[0]))
+    cursor.close()
+    return partitions
+
+
+def truncate_year(conn, year: int) -> int:
+    """
+    Delete the films released in the year, with their links and pages, by truncating their partition of movies.
+
+    The links, pages, and page ids are deleted in one transaction, joined to the films of the partition, before
+    the partition is truncated (which MySQL commits on its own). The tables are locked across both steps, so
+    that no other connection stores a film of the year in between. If the truncation fails, the films are left
+    without links until the year is crawled again.
+
+    Args:
+        conn: The DB-API connection to the MySQL database.
+        year (int): The release year of the films.
+
+    Returns:
+        (int): The number of films deleted.
+
+    Raises:
+        ValueError: if movies has no partition for the year.
+    """
+    partition = f"p{year}"
+    if partition not in dict(list_partitions(conn)):
+        raise ValueError(f"The movies table has no partition {partition}; set DB_PARTITION_YEARS to include {year}")
+    tables = [junction for junction, _, _ in JUNCTIONS] + ["pages"]
+    cursor = conn.cursor()
+    # The tables are not aliased, as a locked table can only be referred to by the name it was locked with.
+    cursor.execute("LOCK TABLES " + ", ".join(f"{table} WRITE" for table in ["movies", "movie_page_ids", *tables]))
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM movies PARTITION ({partition})")
+        films = cursor.fetchone()[0]
+        for table in tables:
+            cursor.execute(f"""DELETE {table}
+                               FROM {table}
+                               JOIN movies PARTITION ({partition})
+                                   ON movies.movie_id = {table}.movie_id
+                            """
+                           )
+        cursor.execute(f"""DELETE movie_page_ids
+                           FROM movie_page_ids
+                           JOIN movies PARTITION ({partition})
+                               ON movies.page_id = movie_page_ids.page_id
+                        """
+                       )
+        conn.commit()
+        cursor.execute(f"ALTER TABLE movies TRUNCATE PARTITION {partition}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("UNLOCK TABLES")
+        cursor.close()
+    return films
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--truncate", type=int, metavar="YEAR", help="the release year of the films to delete")
+    args = parser.parse_args()
+
+    loader = DBPipeline.from_settings(get_project_settings(), writer_thread=False)
+    if loader.backend.name != "mysql":
+        parser.error(f"The {loader.backend.name} backend has no partitions; set DB_BACKEND = 'mysql'")
+    if args.truncate is not None:
+        films = truncate_year(loader.conn, args.truncate)
+        print(f"Deleted the {films} films released in {args.truncate}, with their links and pages")
+    else:
+        for name, films in list_partitions(loader.conn):
+            print(f"{name:>10} {films}")
+    loader.conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,53 @@
 # useful for handling different item types with a single interface
 # from itemadapter import ItemAdapter
 
-import os
-import re
-import sys
+import logging
+import queue
+import random
+import threading
+import time
 
-from datetime import datetime
-from typing import Text
+from typing import Callable, Dict, Iterable, List, Optional, Text, Tuple, Type, Union
 
 import scrapy
-import pymysql
-from dotenv import load_dotenv
 from scrapy.exceptions import DropItem
+from scrapy.settings import Settings
+from scrapy.statscollectors import StatsCollector
+from scrapy.utils.misc import create_instance
+from twisted.internet import threads
+from twisted.internet.defer import Deferred, DeferredList
 
-load_dotenv()
+from .cache import IdentityMap
+from .dates import normalize_date
+from .items import (RECORD_FIELDS, CastItem, DirectorItem, DistributorItem, FilmRecord, MovieItem,
+                    ProductionCoItem)
+from .money import parse_money
+from .sanitize import clean_name
+from .spool import SpoolPipeline
+from .storage import MySQLBackend, StorageBackend, open_backend
+from .wikitext import page_key
+
+logger = logging.getLogger(__name__)
+
+# Maps the name field of each item subtype to the dimension table (with its id and name columns)
+# and the junction table linking that dimension to the movies table.
+NAME_TABLES = {"actor_name": ("actors", "actor_id", "actor", "castlist"),
+               "director": ("directors", "director_id", "director", "filmdirectors"),
+               "distributor": ("distributors", "distributor_id", "distributor", "filmdistributors"),
+               "prod_co": ("productionco", "prod_co_id", "prod_co", "filmprodco")
+               }
+# Maps each table with a name column to its (id column, name column); the movies are looked up by
+# their page_id instead of their title.
+ID_COLUMNS = {"movies": ("movie_id", "page_id"),
+              **{table: (id_col, name_col) for table, id_col, name_col, _ in NAME_TABLES.values()}
+              }
+
+
+def film_key(item: scrapy.Item) -> int:
+    """
+    Get the page_id of the item's film, or the key of its title for the items spooled without one.
+    """
+    return item.get("page_id") or page_key(None, item.get("film"))
 
 
 class DropEmptyPipeline:
@@ -35,6 +69,8 @@ class DropEmptyPipeline:
         If the item is a DirectorItem and the film or director is None, drop the item.
         If the item is a DistributorItem and the film or distributor is None, drop the item.
         If the item is a ProductionCoItem and the film or prod_co is None, drop the item.
+        If the item is a FilmRecord and the film is None, drop the item; otherwise remove the names
+        which are None from its cast, directors, distributors, and prod_cos lists.
 
         Args:
             item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
@@ -66,17 +102,14 @@ class DropEmptyPipeline:
                 is not in the item's keys.
 
             Raises:
-                scrapy.exceptions.DropItem: if the item_field is None after removing the regular expression
-                pattern from item[item_field]
+                scrapy.exceptions.DropItem: if nothing is left of item[item_field] after removing
+                bracketed text and punctuation (see sanitize.clean_name)
             """
             if item_field in item.keys():
-                pattern = r"[\[{]+.*[\]}]+|[({]+.*[)}]*|[({]*.*[)}]+|[,;!:()+\-/{}]+"
-                temp = re.sub(pattern, "", item.get(item_field))
-                if not temp:
+                new = clean_name(item.get(item_field))
+                if new is None:
                     raise DropItem(f"{item_field} missing from item {item}")
                 else:
-                    pattern = r"^[,\/]+"
-                    new = re.sub(pattern, "", item.get(item_field))
                     item[item_field] = new
                     return item
             else:
@@ -84,10 +117,16 @@ class DropEmptyPipeline:
 
         if not item.get("film"):
             raise DropItem(f"film title missing from item {item}")
-        drop_helper("actor_name")
-        drop_helper("director")
-        drop_helper("distributor")
-        drop_helper("prod_co")
+        # A FilmRecord keeps the names which would not have been dropped as separate items.
+        if isinstance(item, FilmRecord):
+            for record_field in RECORD_FIELDS.values():
+                names = (clean_name(name) for name in item.get(record_field) or [])
+                item[record_field] = [name for name in names if name is not None]
+            return item
+        # The other items have a single name field.
+        for item_field in NAME_TABLES:
+            if item_field in item.keys():
+                return drop_helper(item_field)
         return item
 
 
@@ -100,9 +139,11 @@ class DatePipeline:
         Rewrite the date in YYYY-MM-DD format.
 
         If the item is a MovieItem and the release date is not None, we reformat
-        the date in the YYYY-MM-DD format, and return the item with the new date.
-        If the item is a MovieItem and the release date is None, we raise a DropItem
-        exception. Otherwise, the item is returned unmodified.
+        the date in the YYYY-MM-DD format with dates.normalize_date, and return the item
+        with the new date. If the item is a MovieItem and the release date is None or cannot
+        be parsed, we raise a DropItem exception. A FilmRecord with a release date of None
+        (or one which cannot be parsed) is only dropped if it has no names either. Otherwise,
+        the item is returned unmodified.
 
         Args:
             item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
@@ -118,70 +159,23 @@ class DatePipeline:
             item (scrapy.Item): The MovieItem with a modified date, otherwise the item unmodified.
 
         Raises:
-            scrapy.exceptions.DropItem: if the item is a MovieItem and release_date is None.
+            scrapy.exceptions.DropItem: if the item is a MovieItem and release_date is None or cannot be parsed.
         """
         if "release_date" in item.keys():
             release_date = item.get("release_date", None)
             if release_date:
-                junk_pattern = r"\(.+\)"
-                release_date = re.sub(junk_pattern, "", release_date)
-                alpha_pattern = r"[a-z]+"
-                if re.findall(alpha_pattern, release_date):
-                    alpha_mdy = r"(?P<Month>[A-Z][a-z]+)\s(?P<Day>[0-3][0-9]|[0-9]),\s(?P<Year>[0-9]{4})"
-                    alpha_dmy = r"(?P<Day>[0-3][0-9]|[0-9])\s(?P<Month>[A-Z][a-z]+)\s(?P<Year>[0-9]{4})"
-                    alpha_ymd = r"(P<Year>[0-9]{4})[/\-]{1}(?P<Month>[A-Z][a-z]+)[/\-]{1}(?P<Day>[0-3][0-9]|[0-9])"
-                    alpha_ym = r"(?P<Year>[0-9]{4})[/\- ]{1}(?P<Month>[A-Z][a-z]+)"
-                    alpha_my = r"(?P<Month>[A-Z][a-z]+)[/\- ]{1}(?P<Year>[0-9]{4})"
-                    alpha_patterns = [alpha_mdy, alpha_dmy,
-                                      alpha_ymd, alpha_ym,
-                                      alpha_my]
-                    for pattern in alpha_patterns:
-                        match = re.search(pattern, release_date)
-                        if match:
-                            month = match.group("Month")
-                            year = match.group("Year")
-                            if "Day" in match.groupdict().keys():
-                                day = match.group("Day")
-                                if len(day) == 1:
-                                    day = "0" + day
-                            else:
-                                day = "01"
-
-                            try:
-                                new_date = " ".join([month, day, year])
-                                dt = datetime.strptime(new_date, "%B %d %Y")
-                                item["release_date"] = dt.strftime("%Y-%m-%d")
-                                return item
-                            except:
-                                new_date = " ".join([month, day, year])
-                                dt = datetime.strptime(new_date, "%b %d %Y")
-                                item["release_date"] = dt.strftime("%Y-%m-%d")
-                                return item
-
-                else:
-                    ymd = r"(?P<Year>[0-9]{4})[/\- ]{1}(?P<Month>[0-1][0-9]|[0-9])[/\- ](?P<Day>[0-3][0-9]|[0-9])"
-                    ym = r"(?P<Year>[0-9]{4})[/\- ]{1}(?P<Month>[0-1][0-9]|[0-9])"
-                    my = r"(?P<Month>[0-1][0-9]|[0-9])[/\- ]{1}(?P<Year>[0-9]{4})"
-                    y = r"(?P<Year>[0-9]{4})"
-                    num_patterns = [ymd, ym, my, y]
-                    for pattern in num_patterns:
-                        match = re.search(pattern, release_date)
-                        if match:
-                            year = match.group("Year")
-                            if "Day" in match.groupdict().keys():
-                                day = match.group("Day")
-                                if len(day) == 1:
-                                    day = "0" + day
-                            else:
-                                day = "01"
-                            if "Month" in match.groupdict().keys():
-                                month = match.group("Month")
-                                if len(month) == 1:
-                                    month = "0" + month
-                            else:
-                                month = "01"
-                            item["release_date"] = "-".join([year, month, day])
-                            return item
+                new_date = normalize_date(release_date)
+                if new_date is not None:
+                    item["release_date"] = new_date
+                    return item
+                if isinstance(item, FilmRecord) and any(item.get(field) for field in RECORD_FIELDS.values()):
+                    # As for a missing date, the film and its names are kept, without a release date.
+                    item["release_date"] = None
+                    return item
+                raise DropItem(f"Unparseable release date {release_date!r} in item {item}")
+            elif isinstance(item, FilmRecord) and any(item.get(field) for field in RECORD_FIELDS.values()):
+                # The names are still linked to the film, as they would have been as separate items.
+                return item
             else:
                 raise DropItem(f"Release date missing from item {item}")
         else:
@@ -191,14 +185,26 @@ class DatePipeline:
 class MoneyPipeline:
     """
     This class is used to clean the budget and box_office strings.
+
+    Attributes:
+        stats (Optional[scrapy.statscollectors.StatsCollector]): the crawler's stats collector, used to
+            count the budgets and box offices which could not be parsed
     """
+    def __init__(self, stats: Optional[StatsCollector] = None):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
     def process_item(self, item: scrapy.Item, actors_wiki_spider: scrapy.Spider) -> scrapy.Item:
         """
-        Remove "$", "\xa0" strings and convert strings to numbers.
+        Convert the budget and box office strings to exact amounts in millions of dollars.
 
-        If the item is a MovieItem, remove '$' signs, '\xa0' strings, and convert words
-        such as million or thousand to 1000000 or 1000, respectively. Otherwise,
-        return the item unmodified.
+        If the item is a MovieItem (or a FilmRecord), the budget and box_office are parsed by
+        money.parse_money, which handles '$' signs, thousands separators, footnotes, ranges, and
+        words such as million or billion. A field which cannot be parsed is set to None and
+        counted in the 'moneypipeline/unparsed' stat. Otherwise, return the item unmodified.
 
         Args:
             item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
@@ -211,59 +217,20 @@ class MoneyPipeline:
                 for movie info for each movie in the US over the years 2003-2022 (inclusive).
 
         Returns:
-            item (scrapy.Item): The original item with the box office and budget strings modified or
-            the original item unmodified (if the item is not a MovieItem).
+            item (scrapy.Item): The original item with the box office and budget as Decimals (or None)
+            or the original item unmodified (if the item is not a MovieItem).
         """
-        def number_cleaner(num_string: Text) -> Text:
-            """
-            Clean the num_string so it only consists of digits where the units are millions.
-
-            Args:
-                num_string (Text): The string which possibly consists of digits and
-                    words representing numbers
-            Returns:
-                (Text): A string representing the number in num_string in digits where the
-                units are in millions.
-                """
-            pattern = r"\\xa0|\$|,"
-            new_string = re.sub(pattern, "", num_string)
-            nums_pattern = r"(?P<upper>[\d]+\.[\d]+|[\d]+)[-–—]{1}(?P<lower>[\d]+\.[\d]+|[\d]+)"
-            nums_match = re.search(nums_pattern, new_string)
-            mil_pattern = r"million|Million"
-            bil_pattern = r"billion|Billion"
-            mil_match = re.search(mil_pattern, new_string)
-            bil_match = re.search(bil_pattern, new_string)
-            if nums_match:
-                upper = float(nums_match.group("upper"))
-                lower = float(nums_match.group("lower"))
-                number = (upper + lower)/2
-                if mil_match:
-                    return f"{number:.6f}"
-                elif bil_match:
-                    return f"{number*1000:.6f}"
-                else:
-                    return f"{number/1000000:.6f}"
-            else:
-                num_pattern = r"(?P<decimal>[\d]+\.[\d]+|[\d]+)"
-                num_match = re.search(num_pattern, new_string)
-                if num_match:
-                    number = float(num_match.group("decimal"))
-                else:
-                    number = 1
-                if mil_match:
-                    return f"{number:.6f}"
-                elif bil_match:
-                    return f"{number*1000:.6f}"
-                else:
-                    return f"{number/1000000:.6f}"
-
         if "budget" in item.keys():
-            budget = item["budget"]
-            box_office = item["box_office"]
-            if budget:
-                item["budget"] = number_cleaner(item["budget"])
-            if box_office:
-                item["box_office"] = number_cleaner(item["box_office"])
+            for field in ["budget", "box_office"]:
+                money = item.get(field)
+                if not money:
+                    continue
+                item[field] = parse_money(money)
+                if item[field] is None:
+                    logger.debug(f"Could not parse the {field} {money!r} of {item.get('film')!r}")
+                    if self.stats is not None:
+                        self.stats.inc_value("moneypipeline/unparsed")
+                        self.stats.inc_value(f"moneypipeline/unparsed/{field}")
         return item
 
 
@@ -272,272 +239,890 @@ class DBPipeline:
     This class is used to store the movie info in a MySQL database.
 
     Attributes:
-        u (Text): the username to use for logging into MySQL (set
-            as an environment variable)
-        p (Text): the password to use for logging into MySQL (set
-            as an environment variable)
-        h (Text): the hostname to use for logging into MySQL (set
-            as an environment variable)
-        conn (pymysql.connections.Connection): the Connection object created to
-            connect to MySQL
-        cursor (pymysql.cursors.Cursor): the resulting cursor created from the
+        backend (StorageBackend): the database the tables are stored in, MySQL by default (see DB_BACKEND)
+        conn: the DB-API Connection object created by the backend
+        cursor: the resulting cursor created from the
             Connection object
+        batch_size (int): the number of buffered items which triggers a flush; if this
+            is 0, each item is written and committed as soon as it is processed
+        flush_interval (float): the number of seconds after which the buffered items are
+            flushed, even if batch_size has not been reached; 0 disables the time trigger
+        film_buffer (Dict[int, Text]): the title of each buffered film, keyed by page_id
+        movie_buffer (Dict[int, Tuple]): the buffered film, budget, box_office, and release_date
+            of each MovieItem, keyed by page_id
+        link_buffer (Dict[Text, List[Tuple[int, Text]]]): the buffered (page_id, name) pairs
+            of the CastItems, DirectorItems, DistributorItems, and ProductionCoItems, keyed
+            by their name field
+        page_buffer (Dict[Text, Tuple]): the buffered page_id, etag, last_modified, and revision_id
+            of each FilmRecord fetched in incremental mode, keyed by url
+        buffered (int): the number of items in the buffers
+        last_flush (float): the time.monotonic() value of the last flush
+        id_maps (Dict[Text, IdentityMap]): the page_id to id map of the movies table, and the name
+            to id map of the actors, directors, distributors, and productionco tables, keyed by table
+        stats (Optional[scrapy.statscollectors.StatsCollector]): the crawler's stats collector,
+            used to report the hit rate of the id_maps
+        write_queue (Optional[queue.Queue]): the bounded queue of items waiting for the writer thread;
+            if this is None, the items are written on the reactor thread
+        writer (Optional[threading.Thread]): the thread which owns the connection and writes the
+            items from write_queue
+        writer_errors (queue.Queue): the errors of the writer thread whose items were lost, which are
+            raised by close_spider
+        room_waiters (List[Deferred]): the Deferreds of the items waiting for room in write_queue, which
+            the writer thread fires as it takes items from the queue
+        retry_pending (bool): whether the buffers hold the items of a transaction the writer thread
+            failed to commit, which are written again before the next item
+        max_retries (int): the number of times a transaction is retried after a deadlock or a lock
+            wait timeout, e.g. when several shards write to the database at once
+        checkpoint (Optional[Checkpoint]): the spider's checkpoint in resumable mode, in which the
+            films are marked as persisted once their transaction is committed
+        listed_buffer (List[Text]): the listed_url of each buffered FilmRecord, in resumable mode
+        seen (Optional[SeenSet]): the spider's seen-set if SEEN_PATH is set, to which the films are
+            added once their transaction is committed
+        seen_buffer (List[Text]): the seen_urls of each buffered FilmRecord, with a seen-set
     """
-    def __init__(self):
-        self.u = os.environ.get('DB_USER')
-        self.p = os.environ.get('DB_PSWD')
-        self.h = os.environ.get('DB_HOST')
-        self.conn = pymysql.connect(user=self.u, password=self.p, host=self.h)
+    def __init__(self, batch_size: int = 0, flush_interval: float = 0, cache_size: int = 0,
+                 stats: Optional[StatsCollector] = None, writer_queue_size: int = 0, max_retries: int = 0,
+                 backend: Optional[StorageBackend] = None):
+        self.backend = backend or MySQLBackend()
+        self.conn = self.backend.connect()
         self.cursor = self.conn.cursor()
-        try:
-            self.cursor.execute(
-                """CREATE DATABASE IF NOT EXISTS actors_wiki
-                DEFAULT CHARACTER SET utf8"""
-                )
-        except pymysql.Error as err:
-            print(f"Failed creating database: {err}")
-            sys.exit()
-
-        self.cursor.execute("USE actors_wiki")
-        self.conn.database = 'actors_wiki'
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS actors(
-                               actor_id INT AUTO_INCREMENT PRIMARY KEY,
-                               actor VARCHAR(100) NOT NULL UNIQUE
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS directors(
-                               director_id INT AUTO_INCREMENT PRIMARY KEY,
-                               director VARCHAR(100) NOT NULL UNIQUE
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS distributors(
-                               distributor_id INT AUTO_INCREMENT PRIMARY KEY,
-                               distributor VARCHAR(200) NOT NULL UNIQUE
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS productionco(
-                               prod_co_id INT AUTO_INCREMENT PRIMARY KEY,
-                               prod_co VARCHAR(200) NOT NULL UNIQUE
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS movies(
-                               movie_id INT AUTO_INCREMENT PRIMARY KEY,
-                               movie VARCHAR(200) NOT NULL UNIQUE,
-                               budget DECIMAL(12,6) DEFAULT NULL,
-                               box_office DECIMAL (12,6) DEFAULT NULL,
-                               release_date DATE DEFAULT NULL
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS filmdirectors(
-                               movie_id INT,
-                               director_id INT,
-                               PRIMARY KEY(movie_id, director_id),
-                               FOREIGN KEY(movie_id)
-                                   REFERENCES movies(movie_id),
-                               FOREIGN KEY(director_id)
-                                   REFERENCES directors(director_id)
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS filmdistributors(
-                               movie_id INT,
-                               distributor_id INT,
-                               PRIMARY KEY(movie_id, distributor_id),
-                               FOREIGN KEY(movie_id)
-                                   REFERENCES movies(movie_id),
-                               FOREIGN KEY(distributor_id)
-                                   REFERENCES distributors(distributor_id)
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS filmprodco(
-                               movie_id INT,
-                               prod_co_id INT,
-                               PRIMARY KEY(movie_id, prod_co_id),
-                               FOREIGN KEY(movie_id)
-                                   REFERENCES movies(movie_id),
-                               FOREIGN KEY(prod_co_id)
-                                   REFERENCES productionCo(prod_co_id)
-                               )
-                            """
-                            )
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS castlist(
-                               movie_id INT,
-                               actor_id INT,
-                               PRIMARY KEY(movie_id, actor_id),
-                               FOREIGN KEY(movie_id)
-                                   REFERENCES movies(movie_id),
-                               FOREIGN KEY(actor_id)
-                                   REFERENCES actors(actor_id)
-                               )
-                            """
-                            )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.film_buffer = {}
+        self.movie_buffer = {}
+        self.link_buffer = {item_field: [] for item_field in NAME_TABLES}
+        self.page_buffer = {}
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.id_maps = {table: IdentityMap(cache_size) for table in ID_COLUMNS}
+        self.stats = stats
+        self.write_queue = queue.Queue(maxsize=writer_queue_size) if writer_queue_size else None
+        self.writer = None
+        self.writer_errors = queue.Queue()
+        self.room_waiters = []
+        self.retry_pending = False
+        self.max_retries = max_retries
+        self.checkpoint = None
+        self.listed_buffer = []
+        self.seen = None
+        self.seen_buffer = []
 
-    def process_item(self, item: scrapy.Item, actors_wiki_spider: scrapy.Spider) -> scrapy.Item:
+    @classmethod
+    def from_crawler(cls, crawler):
         """
-        Insert the information from the items into the tables.
+        Build the pipeline from the crawler's settings, reporting to the crawler's stats.
+        """
+        return cls.from_settings(crawler.settings, stats=crawler.stats)
+
+    @classmethod
+    def from_settings(cls, settings: Settings, stats: Optional[StatsCollector] = None,
+                      writer_thread: bool = True):
+        """
+        Build the pipeline from the DB_BACKEND, DB_PATH, DB_PARTITION_YEARS, DB_BATCH_SIZE, DB_FLUSH_INTERVAL,
+        DB_CACHE_SIZE, DB_WRITER_QUEUE_SIZE, and DB_MAX_RETRIES settings.
+
+        Args:
+            settings (scrapy.settings.Settings): The project settings.
+            stats (Optional[StatsCollector]): The stats collector to report to, if any.
+            writer_thread (bool): Whether to use a writer thread if DB_WRITER_QUEUE_SIZE is set; this
+                needs a running reactor, so loaders running outside of a crawl pass False.
 
-        Find the Movie_id for the film in the movies table or insert the film into the movies table
-        with budget, box_office, and release_date as Null values.
+        Returns:
+            (DBPipeline): The pipeline.
+        """
+        return cls(batch_size=settings.getint("DB_BATCH_SIZE", 0),
+                   flush_interval=settings.getfloat("DB_FLUSH_INTERVAL", 0),
+                   cache_size=settings.getint("DB_CACHE_SIZE", 0),
+                   stats=stats,
+                   writer_queue_size=settings.getint("DB_WRITER_QUEUE_SIZE", 0) if writer_thread else 0,
+                   max_retries=settings.getint("DB_MAX_RETRIES", 0),
+                   backend=open_backend(settings.get("DB_BACKEND", "mysql"), settings.get("DB_PATH"),
+                                        tuple(map(int, settings.getlist("DB_PARTITION_YEARS"))) or None))
 
-        In the first case, the item is a MovieItem. We start by updating the budget, box_office, and
-        release_date in the Movies table.
+    def open_spider(self, actors_wiki_spider: scrapy.Spider) -> None:
+        """
+        Warm the id_maps with the page ids, names, and ids already stored in the database, and start the writer thread.
 
-        In the other cases, we use the fill_tables function to fill the respective tables.
+        The spider's checkpoint and seen-set, if it has them, are shared with the pipeline.
 
         Args:
-            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
-                or a ProductionCoItem; CastItems have two fields: 'film' and 'actor_name'; DirectorItems
-                have 2 fields: 'film' and 'director'; DistributorItems have 2 fields: 'film' and 'distributor';
-                MovieItems have 4 fields: 'film', 'budget','box_office', and 'release_date';
-                ProductionCoItems have 2 fields: 'film' and 'prod_co'.
+            actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
+                for movie info for each movie in the US over the years 2003-2022 (inclusive).
+
+        Returns:
+            None
+        """
+        for table, (id_col, name_col) in ID_COLUMNS.items():
+            self.cursor.execute(f"""SELECT {name_col}, {id_col}
+                                    FROM {table}
+                                    WHERE {name_col} IS NOT NULL
+                                 """)
+            self.id_maps[table].update(self.cursor.fetchall())
+        self.checkpoint = getattr(actors_wiki_spider, "checkpoint", None)
+        self.seen = getattr(actors_wiki_spider, "seen", None)
+        if self.write_queue is not None:
+            self.writer = threading.Thread(target=self.run_writer, name="DBPipeline-writer", daemon=True)
+            self.writer.start()
+
+    def process_item(self, item: scrapy.Item,
+                     actors_wiki_spider: scrapy.Spider) -> Union[scrapy.Item, Deferred]:
+        """
+        Write the item, or hand it to the writer thread if there is one.
+
+        Putting the item in write_queue never blocks the reactor: if the queue is full, the item waits
+        for a Deferred which the writer thread fires once it has taken an item from the queue, so scrapy
+        stops feeding the pipeline until the writer has caught up, without holding a thread of the
+        reactor's thread pool per waiting item.
 
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                or a ProductionCoItem.
             actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
                 for movie info for each movie in the US over the years 2003-2022 (inclusive).
 
         Returns:
-            item (scrapy.Item): The item is returned unmodified.
+            (Union[scrapy.Item, Deferred]): The item unmodified, or a Deferred firing with the
+            item once it has been queued.
         """
+        if self.write_queue is None:
+            self.write_item(item)
+            return item
 
-        def fill_tables(movie_id: Text) -> None:
-            """
-            Fill the tables according to item subtype.
+        def put(_=None) -> Union[scrapy.Item, Deferred]:
+            try:
+                self.write_queue.put_nowait(item)
+                return item
+            except queue.Full:
+                waiter = Deferred()
+                self.room_waiters.append(waiter)
+                # The writer may have taken an item before the waiter was added, and would not fire it.
+                if not self.write_queue.full():
+                    self.make_room()
+                return waiter.addCallback(put)
 
-            Args:
-                movie_id (Text): The id of the movie in the movies table.
+        return put()
 
-            Returns:
-                None
-            """
+    def make_room(self) -> None:
+        """
+        Fire the Deferreds of the items waiting for room in write_queue, on the reactor thread.
+
+        Returns:
+            None
+        """
+        waiters, self.room_waiters = self.room_waiters, []
+        for waiter in waiters:
+            waiter.callback(None)
 
-            def fill_helper(item_field: Text, id_query: Text, primary_insert_query: Text,
-                            foreign_insert_query: Text) -> None:
-                """
-                Populate the tables.
-
-                Args:
-                    item_field (Text): Either 'actor_name', 'director', 'distributor', or 'prod_co', depending on
-                        the subtype of the item.
-                    id_query (Text): The query used to obtain the id of the value of the item_field
-                        in the actors table, directors table, distributors table or productionco table.
-                    primary_insert_query (Text): The query used to insert the value of the item_field
-                        into the actors table, directors table, distributors table, or productionco table.
-                    foreign_insert_query (Text): The query used to insert the movie_id and the id of the
-                        value of the item_field into the castlist table, filmdirectors table, filmdistributors table,
-                        or filmprodco table as foreign keys.
-
-                Returns:
-                    None
-                """
-                field = item.get(item_field)
-                cur = self.cursor
-                cur.execute(id_query, (field,))
-                field_id_tup = cur.fetchone()
-                if field_id_tup:
-                    field_id = field_id_tup[0]
+    def run_writer(self) -> None:
+        """
+        Write the items from write_queue until the None sentinel is received.
+
+        When the queue has been idle for flush_interval seconds, the buffers are flushed. If a transaction
+        fails, it is rolled back and the error logged, but its items are kept in the buffers (as when flush
+        fails on the reactor thread) and written again before the next item, or by the final flush. Only
+        the errors whose items are lost, those of a final flush which still fails and of an item which
+        cannot be written at all, are put in writer_errors, to be raised by close_spider.
+
+        Returns:
+            None
+        """
+        from twisted.internet import reactor
+
+        timeout = self.flush_interval or None
+        while True:
+            try:
+                item = self.write_queue.get(timeout=timeout)
+                idle = False
+            except queue.Empty:
+                item, idle = None, True
+            if self.room_waiters:
+                reactor.callFromThread(self.make_room)
+            try:
+                if item is None:
+                    self.flush()
+                elif self.retry_pending:
+                    # The items of the failed transaction are written again along with this one.
+                    self.add_to_buffers(item)
+                    self.flush()
+                else:
+                    self.write_item(item)
+                self.retry_pending = False
+            except self.backend.Error as err:
+                if self.stats is not None:
+                    self.stats.inc_value("dbpipeline/writer_errors")
+                self.rollback()
+                if item is not None and not self.retry_pending and not self.batch_size:
+                    self.add_to_buffers(item)
+                self.retry_pending = True
+                if item is None and not idle:
+                    logger.error(f"DBPipeline writer lost {self.buffered} buffered rows: {err!r}")
+                    self.writer_errors.put(err)
                 else:
-                    cur.execute(primary_insert_query, (field,))
-                    cur.execute(id_query, (field,))
-                    field_id = cur.fetchone()[0]
-                cur.execute(foreign_insert_query, (movie_id, field_id))
-
-            if "actor_name" in item.keys() and item.get("actor_name", None):
-                item_field = "actor_name"
-                id_query = """SELECT actor_id
-                              FROM actors 
-                              WHERE actor = %s
-                           """
-                primary_insert_query = """INSERT IGNORE INTO actors(actor)
-                                          VALUES (%s)
-                                       """
-                foreign_insert_query = """INSERT IGNORE INTO castlist(movie_id, actor_id)
-                                          VALUES (%s, %s)
-                                       """
-                fill_helper(item_field, id_query, primary_insert_query, foreign_insert_query)
-            elif "director" in item.keys() and item.get("director", None):
-                item_field = "director"
-                id_query = """SELECT director_id
-                              FROM directors
-                              WHERE director = %s
-                           """
-                primary_insert_query = """INSERT IGNORE INTO directors(director)
-                                          VALUES (%s)
-                                       """
-                foreign_insert_query = """INSERT IGNORE INTO filmdirectors(movie_id, director_id)
-                                          VALUES (%s, %s)
-                                       """
-                fill_helper(item_field, id_query, primary_insert_query, foreign_insert_query)
-            elif "distributor" in item.keys() and item.get("distributor", None):
-                item_field = "distributor"
-                id_query = """SELECT distributor_id
-                              FROM distributors
-                              WHERE distributor = %s
-                           """
-                primary_insert_query = """INSERT IGNORE INTO distributors(distributor)
-                                          VALUES (%s)
-                                       """
-                foreign_insert_query = """INSERT IGNORE INTO filmdistributors(movie_id, distributor_id)
-                                          VALUES (%s, %s)
-                                       """
-                fill_helper(item_field, id_query, primary_insert_query, foreign_insert_query)
-            elif "prod_co" in item.keys() and item.get("prod_co", None):
-                item_field = "prod_co"
-                id_query = """SELECT prod_co_id
-                              FROM productionco
-                              WHERE prod_co = %s
-                           """
-                primary_insert_query = """INSERT IGNORE INTO productionco(prod_co)
-                                          VALUES (%s)
-                                       """
-                foreign_insert_query = """INSERT IGNORE INTO filmprodco(movie_id, prod_co_id)
-                                          VALUES (%s, %s)
-                                       """
-                fill_helper(item_field, id_query, primary_insert_query, foreign_insert_query)
-
-        # Get rid of any double quotation marks in any fields of the item.
-        for key in item.keys():
-            if isinstance(item[key], str):
-                item[key].replace('"', '')
+                    logger.error(f"DBPipeline writer failed to write {self.buffered} buffered rows, "
+                                 f"which are kept and written again: {err!r}")
+            except Exception as err:
+                # The item itself cannot be written (e.g. it has no film), so writing it again would not help.
+                logger.error(f"DBPipeline writer lost {item}: {err!r}")
+                if self.stats is not None:
+                    self.stats.inc_value("dbpipeline/writer_errors")
+                self.rollback()
+                self.writer_errors.put(err)
+            if item is None and not idle:
+                return
+
+    def rollback(self) -> None:
+        """
+        Roll back the current transaction, keeping the buffers so that their items can be written again.
+
+        The id_maps are cleared, since they may hold the ids of names inserted in the rolled back
+        transaction.
+
+        Returns:
+            None
+        """
+        self.conn.rollback()
+        for id_map in self.id_maps.values():
+            id_map.entries.clear()
+
+    def write_item(self, item: scrapy.Item) -> None:
+        """
+        Insert the information from the items into the tables.
+
+        Find the movie_id for the film's page_id in the movies table or insert the film into the movies
+        table with budget, box_office, and release_date as Null values.
+
+        In the first case, the item is a FilmRecord. The movie is updated as for a MovieItem (if
+        the record has a release date), and its names are linked to it as for the items below, all
+        in a single transaction. If the record has a url (in incremental mode), the film's existing
+        links are deleted first, so that it is rewritten as the page now stands, and the page's
+        validators are stored in the same transaction. In resumable mode, the record's listed_url is
+        marked as persisted in the checkpoint once the transaction is committed, and with a seen-set,
+        its seen_urls are then added to the set.
+
+        In the second case, the item is a MovieItem. We start by updating the title, budget, box_office,
+        and release_date in the Movies table.
+
+        In the other cases, we find or insert the name in the actors, directors, distributors, or
+        productionco table, and link it to the movie in the corresponding junction table.
+
+        If batch_size is positive, the item is buffered instead, and written by flush.
 
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord; CastItems have two fields: 'film' and 'actor_name';
+                DirectorItems have 2 fields: 'film' and 'director'; DistributorItems have 2 fields: 'film'
+                and 'distributor'; MovieItems have 4 fields: 'film', 'budget','box_office', and
+                'release_date'; ProductionCoItems have 2 fields: 'film' and 'prod_co'; FilmRecords have
+                the fields of a MovieItem, and the lists 'cast', 'directors', 'distributors', and 'prod_cos'.
+
+        Returns:
+            None
+        """
+        if self.batch_size:
+            self.buffer_item(item)
+            return
+        self.transaction(lambda: self.write_row(item))
+        if self.checkpoint is not None and item.get("listed_url"):
+            self.checkpoint.mark_films([item.get("listed_url")])
+        if self.seen is not None and item.get("seen_urls"):
+            self.seen.mark_films(item.get("seen_urls"))
+
+    def write_row(self, item: scrapy.Item) -> None:
+        """
+        Write a single item as described in write_item, without committing.
+
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord.
+
+        Returns:
+            None
+        """
         # Get the movie_id, this is used in all cases in what follows.
-        film = item.get("film")
-        movie_id_query = """SELECT movie_id
-                            FROM movies
-                            WHERE movie = %s
-                         """
-        movie_insert_query = """INSERT IGNORE INTO movies(movie)
-                                VALUES (%s)
-                             """
-        self.cursor.execute(movie_id_query, (film,))
-        movie_id_tup = self.cursor.fetchone()
-        if movie_id_tup:
-            movie_id = movie_id_tup[0]
-        else:
-            self.cursor.execute(movie_insert_query, (film,))
-            self.cursor.execute(movie_id_query, (film,))
-            movie_id = self.cursor.fetchone()[0]
+        page_id = film_key(item)
+        movie_id = self.get_movie_ids({page_id: item.get("film")})[page_id]
 
-        # In the first case the item is a MovieItem.
-        if "budget" in item.keys():
-            movies_update_query = """UPDATE movies
-                                     SET 
-                                        budget = %s,
-                                        box_office = %s,
-                                        release_date = %s
-                                     WHERE movie_id = %s
-                                  """
-            budget = item.get("budget")
-            box_office = item.get("box_office")
-            release_date = item.get("release_date")
-            self.cursor.execute(movies_update_query, (budget, box_office, release_date, movie_id))
+        # In the first case the item is a FilmRecord, which is written as its MovieItem followed by its names.
+        if isinstance(item, FilmRecord):
+            if item.get("url"):
+                self.clear_links([movie_id])
+            if item.get("release_date"):
+                self.update_movie(movie_id, item)
+            for item_field, record_field in RECORD_FIELDS.items():
+                for name in sorted(item.get(record_field) or []):
+                    self.link_name(item_field, movie_id, name)
+            if item.get("url"):
+                self.store_pages([(item.get("url"), movie_id, item.get("etag"),
+                                   item.get("last_modified"), item.get("revision_id"))])
+        # In the second case the item is a MovieItem.
+        elif "budget" in item.keys():
+            self.update_movie(movie_id, item)
         # In the remaining cases the item is either a CastItem, DirectorItem, DistributorItem, or
         # a ProductionCoItem.
         else:
-            fill_tables(movie_id)
-        self.conn.commit()
+            for item_field in NAME_TABLES:
+                if item.get(item_field, None):
+                    self.link_name(item_field, movie_id, item.get(item_field))
+                    break
+
+    def transaction(self, write: Callable[[], None]) -> None:
+        """
+        Run the writes and commit them, retrying after a deadlock or a lock wait timeout.
+
+        Since the rolled back transaction may have inserted names whose ids are in the id_maps, the
+        id_maps are cleared before the writes are retried.
+
+        Args:
+            write (Callable[[], None]): The function making the writes of the transaction.
+
+        Returns:
+            None
+
+        Raises:
+            Exception: the backend's Error, if the writes fail with any other error, or still fail after
+            max_retries retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                write()
+                self.conn.commit()
+                return
+            except self.backend.Error as err:
+                if not self.backend.is_retryable(err) or attempt == self.max_retries:
+                    raise
+                logger.warning(f"Retrying the transaction after {err!r}")
+                if self.stats is not None:
+                    self.stats.inc_value("dbpipeline/retries")
+                self.conn.rollback()
+                for id_map in self.id_maps.values():
+                    id_map.entries.clear()
+                time.sleep(0.1 * 2 ** attempt * (1 + random.random()))
+
+    def update_movie(self, movie_id: int, item: scrapy.Item) -> None:
+        """
+        Update the title, budget, box_office, and release_date of the movie.
+
+        Args:
+            movie_id (int): The id of the movie in the movies table.
+            item (scrapy.Item): A MovieItem or a FilmRecord.
+
+        Returns:
+            None
+        """
+        p = self.backend.param
+        movies_update_query = f"""UPDATE movies
+                                  SET 
+                                     movie = {p},
+                                     budget = {p},
+                                     box_office = {p},
+                                     release_date = {p}
+                                  WHERE movie_id = {p}
+                               """
+        film = item.get("film")
+        budget = item.get("budget")
+        box_office = item.get("box_office")
+        release_date = item.get("release_date")
+        self.cursor.execute(movies_update_query, (film, budget, box_office, release_date, movie_id))
+
+    def link_name(self, item_field: Text, movie_id: int, name: Text) -> None:
+        """
+        Find or insert the name in its dimension table, and link it to the movie in the junction table.
+
+        Args:
+            item_field (Text): Either 'actor_name', 'director', 'distributor', or 'prod_co'.
+            movie_id (int): The id of the movie in the movies table.
+            name (Text): The actor, director, distributor, or production company.
+
+        Returns:
+            None
+        """
+        table, id_col, _, junction = NAME_TABLES[item_field]
+        name_id = self.get_id(table, name)
+        p = self.backend.param
+        self.cursor.execute(f"""{self.backend.insert_ignore} INTO {junction}(movie_id, {id_col})
+                                VALUES ({p}, {p})
+                             """, (movie_id, name_id))
+
+    def clear_links(self, movie_ids: Iterable[int]) -> None:
+        """
+        Delete the links of the movies from the junction tables.
+
+        Args:
+            movie_ids (Iterable[int]): The ids of the movies in the movies table.
+
+        Returns:
+            None
+        """
+        movie_ids = [(movie_id,) for movie_id in sorted(set(movie_ids))]
+        for _, _, _, junction in NAME_TABLES.values():
+            self.cursor.executemany(f"""DELETE FROM {junction}
+                                        WHERE movie_id = {self.backend.param}
+                                     """, movie_ids)
+
+    def store_pages(self, pages: Iterable[Tuple]) -> None:
+        """
+        Insert or replace the validators of the film pages in the pages table.
+
+        Args:
+            pages (Iterable[Tuple]): The (url, movie_id, etag, last_modified, revision_id) of each page.
+
+        Returns:
+            None
+        """
+        p = self.backend.param
+        upsert = self.backend.upsert("url", ["movie_id", "etag", "last_modified", "revision_id"])
+        self.cursor.executemany(f"""INSERT INTO pages(url, movie_id, etag, last_modified, revision_id)
+                                    VALUES ({p}, {p}, {p}, {p}, {p})
+                                    {upsert}
+                                 """, list(pages))
+
+    def get_id(self, table: Text, name: Text) -> int:
+        """
+        Find the id of the name in the table, inserting the name if it is not there yet.
+
+        The id_maps are checked first, so the database is only queried for names we have not seen.
+
+        Args:
+            table (Text): Either 'actors', 'directors', 'distributors', or 'productionco'.
+            name (Text): The actor, director, distributor, or production company.
+
+        Returns:
+            (int): The id of the name in the table.
+        """
+        name_id = self.id_maps[table].get(name)
+        if name_id is None:
+            id_col, name_col = ID_COLUMNS[table]
+            p = self.backend.param
+            id_query = f"""SELECT {id_col}
+                           FROM {table}
+                           WHERE {name_col} = {p}
+                        """
+            self.cursor.execute(id_query, (name,))
+            name_id_tup = self.cursor.fetchone()
+            if not name_id_tup:
+                self.cursor.execute(f"""{self.backend.insert_ignore} INTO {table}({name_col})
+                                        VALUES ({p})
+                                     """, (name,))
+                self.cursor.execute(id_query, (name,))
+                name_id_tup = self.cursor.fetchone()
+            name_id = name_id_tup[0]
+            self.id_maps[table].put(name, name_id)
+        return name_id
+
+    def buffer_item(self, item: scrapy.Item) -> None:
+        """
+        Add the item to the buffers, and flush them if the batch is full or the flush interval has passed.
+
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord.
+
+        Returns:
+            None
+        """
+        self.add_to_buffers(item)
+        interval_passed = self.flush_interval and time.monotonic() - self.last_flush >= self.flush_interval
+        if self.buffered >= self.batch_size or interval_passed:
+            self.flush()
+
+    def add_to_buffers(self, item: scrapy.Item) -> None:
+        """
+        Add the item to the buffers, to be written by the next flush.
+
+        As in write_item, a later MovieItem for the same film overwrites the title, budget, box_office,
+        and release_date of an earlier one. A FilmRecord counts as one item per row it writes.
+
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord.
+
+        Returns:
+            None
+        """
+        film = item.get("film")
+        page_id = film_key(item)
+        self.film_buffer[page_id] = film
+        if isinstance(item, FilmRecord):
+            if item.get("listed_url"):
+                self.listed_buffer.append(item.get("listed_url"))
+            if item.get("seen_urls"):
+                self.seen_buffer.extend(item.get("seen_urls"))
+            if item.get("url"):
+                self.page_buffer[item.get("url")] = (page_id, item.get("etag"), item.get("last_modified"),
+                                                     item.get("revision_id"))
+                self.buffered += 1
+            if item.get("release_date"):
+                self.movie_buffer[page_id] = (film, item.get("budget"), item.get("box_office"),
+                                              item.get("release_date"))
+                self.buffered += 1
+            for item_field, record_field in RECORD_FIELDS.items():
+                for name in item.get(record_field) or []:
+                    self.link_buffer[item_field].append((page_id, name))
+                    self.buffered += 1
+        elif "budget" in item.keys():
+            self.movie_buffer[page_id] = (film, item.get("budget"), item.get("box_office"), item.get("release_date"))
+            self.buffered += 1
+        else:
+            for item_field in NAME_TABLES:
+                if item.get(item_field, None):
+                    self.link_buffer[item_field].append((page_id, item.get(item_field)))
+                    self.buffered += 1
+                    break
+
+    def flush(self) -> None:
+        """
+        Write the buffered items to the database in a single transaction.
+
+        The rows of every table are written in sorted order, so that concurrent writers lock them in
+        the same order, and the transaction is retried after a deadlock or a lock wait timeout.
+
+        The films are inserted and updated first, and the links of the films fetched in incremental
+        mode are deleted. Then the names of each dimension table are inserted with executemany, the
+        (movie_id, name_id) pairs are inserted into the junction tables, and finally the validators
+        of the pages are stored. Only the names missing from the id_maps are inserted and looked up.
+        In resumable mode, the films of the batch are marked as persisted once it is committed, and
+        with a seen-set, they are then added to the set.
+
+        Returns:
+            None
+        """
+        self.last_flush = time.monotonic()
+        if not self.buffered and not self.listed_buffer and not self.seen_buffer:
+            return
+        self.transaction(self.write_buffers)
+        if self.checkpoint is not None and self.listed_buffer:
+            self.checkpoint.mark_films(self.listed_buffer)
+        if self.seen is not None and self.seen_buffer:
+            self.seen.mark_films(self.seen_buffer)
+        self.film_buffer = {}
+        self.movie_buffer = {}
+        self.link_buffer = {item_field: [] for item_field in NAME_TABLES}
+        self.page_buffer = {}
+        self.listed_buffer = []
+        self.seen_buffer = []
+        self.buffered = 0
+        self.report_cache_stats()
+
+    def write_buffers(self) -> None:
+        """
+        Write the buffered items as described in flush, without committing or clearing the buffers.
+
+        Returns:
+            None
+        """
+        cur = self.cursor
+        p = self.backend.param
+        movie_ids = self.get_movie_ids(self.film_buffer)
+        cur.executemany(f"""UPDATE movies
+                            SET
+                               movie = {p},
+                               budget = {p},
+                               box_office = {p},
+                               release_date = {p}
+                            WHERE movie_id = {p}
+                         """, sorted([(*fields, movie_ids[page_id]) for page_id, fields in self.movie_buffer.items()],
+                                    key=lambda row: row[-1]))
+        if self.page_buffer:
+            self.clear_links(movie_ids[page_id] for page_id, *_ in self.page_buffer.values())
+        for item_field, (table, id_col, _, junction) in NAME_TABLES.items():
+            links = self.link_buffer[item_field]
+            if not links:
+                continue
+            name_ids = self.get_ids(table, {name for _, name in links})
+            pairs = {(movie_ids[page_id], name_ids[name]) for page_id, name in links}
+            cur.executemany(f"""{self.backend.insert_ignore} INTO {junction}(movie_id, {id_col})
+                                VALUES ({p}, {p})
+                             """, sorted(pairs))
+        if self.page_buffer:
+            self.store_pages((url, movie_ids[page_id], *validators)
+                             for url, (page_id, *validators) in sorted(self.page_buffer.items()))
+
+    def get_ids(self, table: Text, names: Iterable[Text], chunk_size: int = 1000) -> Dict[Text, int]:
+        """
+        Find the ids of several names in the table, inserting the names which are not there yet.
+
+        The names missing from the id_maps are inserted with a single executemany, and their ids
+        are fetched with one query per chunk of names.
+
+        Args:
+            table (Text): Either 'actors', 'directors', 'distributors', or 'productionco'.
+            names (Iterable[Text]): The actors, directors, distributors, or production companies.
+            chunk_size (int): The number of names to look up per query.
+
+        Returns:
+            (Dict[Text, int]): The id of each name.
+        """
+        id_map = self.id_maps[table]
+        ids = {}
+        missing = []
+        for name in names:
+            name_id = id_map.get(name)
+            if name_id is None:
+                missing.append(name)
+            else:
+                ids[name] = name_id
+        if not missing:
+            return ids
+        id_col, name_col = ID_COLUMNS[table]
+        p = self.backend.param
+        missing.sort()
+        self.cursor.executemany(f"""{self.backend.insert_ignore} INTO {table}({name_col})
+                                    VALUES ({p})
+                                 """, [(name,) for name in missing])
+        found = {}
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            placeholders = ", ".join([p] * len(chunk))
+            self.cursor.execute(f"""SELECT {name_col}, {id_col}
+                                    FROM {table}
+                                    WHERE {name_col} IN ({placeholders})
+                                 """, chunk)
+            found.update(self.cursor.fetchall())
+        for name in missing:
+            # The name columns use a case and accent insensitive collation, so the stored name may differ
+            # from the one we looked up; those names are resolved one at a time.
+            if name not in found:
+                self.cursor.execute(f"""SELECT {id_col}
+                                        FROM {table}
+                                        WHERE {name_col} = {p}
+                                     """, (name,))
+                found[name] = self.cursor.fetchone()[0]
+            ids[name] = found[name]
+            id_map.put(name, found[name])
+        return ids
+
+    def get_movie_ids(self, films: Dict[int, Text], chunk_size: int = 1000) -> Dict[int, int]:
+        """
+        Find the movie_id of several films by their page_id, inserting the films which are not there yet.
+
+        As in get_ids, the films missing from the id_map of the movies are inserted with a single
+        executemany, and their ids are fetched with one query per chunk of page ids. A film stored
+        before the films were keyed by page_id, and so without one, is given the page_id of the first
+        missing film with its title instead of being inserted again. The page ids are registered in
+        movie_page_ids first, as page_id is only unique within a release year of a partitioned movies
+        table (see migrations.PAGE_ID_REGISTRY): a writer registering a page_id at the same time as this
+        one waits until it commits, and then finds the film instead of inserting it again.
+
+        Args:
+            films (Dict[int, Text]): The title of each film, keyed by page_id.
+            chunk_size (int): The number of page ids to look up per query.
+
+        Returns:
+            (Dict[int, int]): The movie_id of each film, keyed by page_id.
+        """
+        id_map = self.id_maps["movies"]
+        ids = {}
+        missing = []
+        for page_id in films:
+            movie_id = id_map.get(page_id)
+            if movie_id is None:
+                missing.append(page_id)
+            else:
+                ids[page_id] = movie_id
+        if not missing:
+            return ids
+        p = self.backend.param
+        missing.sort()
+        self.cursor.executemany(f"""{self.backend.insert_ignore} INTO movie_page_ids(page_id)
+                                    VALUES ({p})
+                                 """, [(page_id,) for page_id in missing])
+        self.cursor.executemany(f"""UPDATE movies
+                                    SET page_id = {p}
+                                    WHERE movie = {p} AND page_id IS NULL
+                                 """, [(page_id, films[page_id]) for page_id in missing])
+        self.find_movie_ids(missing, ids, chunk_size)
+        rows = [(page_id, films[page_id]) for page_id in missing if page_id not in ids]
+        if rows:
+            self.cursor.executemany(f"""{self.backend.insert_ignore} INTO movies(page_id, movie)
+                                        VALUES ({p}, {p})
+                                     """, rows)
+            self.find_movie_ids([page_id for page_id, _ in rows], ids, chunk_size)
+        return ids
+
+    def find_movie_ids(self, page_ids: List[int], ids: Dict[int, int], chunk_size: int) -> None:
+        """
+        Look up the movie_id of the films stored with the page ids, with one query per chunk of page ids.
+
+        Args:
+            page_ids (List[int]): The page ids to look up.
+            ids (Dict[int, int]): The movie_id of each film found, keyed by page_id, which is updated
+                along with the id_map of the movies.
+            chunk_size (int): The number of page ids to look up per query.
+
+        Returns:
+            None
+        """
+        p = self.backend.param
+        for start in range(0, len(page_ids), chunk_size):
+            chunk = page_ids[start:start + chunk_size]
+            placeholders = ", ".join([p] * len(chunk))
+            self.cursor.execute(f"""SELECT page_id, movie_id
+                                    FROM movies
+                                    WHERE page_id IN ({placeholders})
+                                 """, chunk)
+            for page_id, movie_id in self.cursor.fetchall():
+                ids[page_id] = movie_id
+                self.id_maps["movies"].put(page_id, movie_id)
+
+    def report_cache_stats(self) -> None:
+        """
+        Report the hits, misses, and hit rate of the id_maps in the crawl stats.
+
+        Returns:
+            None
+        """
+        if self.stats is None:
+            return
+        hits = sum(id_map.hits for id_map in self.id_maps.values())
+        misses = sum(id_map.misses for id_map in self.id_maps.values())
+        self.stats.set_value("dbpipeline/cache_hits", hits)
+        self.stats.set_value("dbpipeline/cache_misses", misses)
+        if hits + misses:
+            self.stats.set_value("dbpipeline/cache_hit_rate", round(hits / (hits + misses), 4))
+
+    def close_spider(self, actors_wiki_spider: scrapy.Spider) -> Optional[Deferred]:
+        """
+        Flush any buffered items, report the cache stats, and close the connection.
+
+        If there is a writer thread, it is sent the None sentinel and joined from the reactor's
+        thread pool, so the queued items are written before the connection is closed.
+
+        Args:
+            actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
+                for movie info for each movie in the US over the years 2003-2022 (inclusive).
+
+        Returns:
+            (Optional[Deferred]): A Deferred firing once the writer thread has finished, if there is one.
+
+        Raises:
+            Exception: the error of the writer thread's final flush, if its buffered items were lost.
+        """
+        def finish(_=None) -> None:
+            self.report_cache_stats()
+            self.conn.close()
+            if not self.writer_errors.empty():
+                raise self.writer_errors.get()
+
+        if self.writer is None:
+            self.flush()
+            finish()
+            return None
+
+        def stop_writer() -> None:
+            self.write_queue.put(None)
+            self.writer.join()
+
+        return threads.deferToThread(stop_writer).addCallback(finish)
+
+
+class RoutingPipeline:
+    """
+    This class is used to run each item through only the pipeline stages which apply to its type.
+
+    Instead of listing every stage in ITEM_PIPELINES, where each stage probes every item's fields to
+    decide whether it applies, the item's class is looked up once in ROUTES, and the item is run through
+    that class's chain of stages: the name items skip DatePipeline and MoneyPipeline entirely. Each stage
+    is built once (with its from_crawler, if it has one) and shared by the chains. With the SPOOL_DIR setting,
+    the chains end with a SpoolPipeline instead of DBPipeline.
+
+    The number of items and the time spent in the chain of each item class are reported in the crawl
+    stats, as 'routing/<class>/items' and 'routing/<class>/seconds'. When DBPipeline hands the item to
+    its writer thread through a full queue, the time spent waiting for room is not counted.
+
+    Attributes:
+        stages (Dict[Type, object]): the instance of each stage class
+        chains (Dict[Type, List]): the stage instances each item class goes through, in order
+        stats (Optional[scrapy.statscollectors.StatsCollector]): the crawler's stats collector
+    """
+    ROUTES = {MovieItem: [DropEmptyPipeline, DatePipeline, MoneyPipeline, DBPipeline],
+              FilmRecord: [DropEmptyPipeline, DatePipeline, MoneyPipeline, DBPipeline],
+              CastItem: [DropEmptyPipeline, DBPipeline],
+              DirectorItem: [DropEmptyPipeline, DBPipeline],
+              DistributorItem: [DropEmptyPipeline, DBPipeline],
+              ProductionCoItem: [DropEmptyPipeline, DBPipeline]
+              }
+
+    def __init__(self, stages: Dict[Type, object], stats: Optional[StatsCollector] = None):
+        self.stages = stages
+        self.chains = {item_class: [stages[stage] for stage in route] for item_class, route in self.ROUTES.items()}
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Build each stage of the ROUTES once, as scrapy builds the classes listed in ITEM_PIPELINES.
+
+        With the SPOOL_DIR setting, the items are spooled to shard files by a SpoolPipeline in place of DBPipeline.
+        """
+        sink = SpoolPipeline if crawler.settings.get("SPOOL_DIR") else DBPipeline
+        stage_classes = {stage for route in cls.ROUTES.values() for stage in route}
+        stages = {stage: create_instance(sink if stage is DBPipeline else stage, crawler.settings, crawler)
+                  for stage in stage_classes}
+        return cls(stages, crawler.stats)
+
+    def open_spider(self, actors_wiki_spider: scrapy.Spider) -> Optional[Deferred]:
+        """
+        Open the stages which have an open_spider method.
+        """
+        return self.call_stages("open_spider", actors_wiki_spider)
+
+    def close_spider(self, actors_wiki_spider: scrapy.Spider) -> Optional[Deferred]:
+        """
+        Close the stages which have a close_spider method, e.g. so that DBPipeline flushes its buffers.
+        """
+        return self.call_stages("close_spider", actors_wiki_spider)
+
+    def call_stages(self, method: Text, actors_wiki_spider: scrapy.Spider) -> Optional[Deferred]:
+        """
+        Call the method of every stage which has it.
+
+        Returns:
+            (Optional[Deferred]): A Deferred firing once the Deferreds returned by the stages have fired,
+            if any stage returned one.
+        """
+        results = [getattr(stage, method)(actors_wiki_spider) for stage in self.stages.values()
+                   if hasattr(stage, method)]
+        deferreds = [result for result in results if isinstance(result, Deferred)]
+        if not deferreds:
+            return None
+        return DeferredList(deferreds, fireOnOneErrback=True, consumeErrors=True)
+
+    def process_item(self, item: scrapy.Item, actors_wiki_spider: scrapy.Spider) -> Union[scrapy.Item, Deferred]:
+        """
+        Run the item through the chain of stages of its class.
+
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord.
+            actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
+                for movie info for each movie in the US over the years 2003-2022 (inclusive).
+
+        Returns:
+            (Union[scrapy.Item, Deferred]): The item returned by the last stage, or a Deferred firing
+            with it if a stage returned a Deferred.
+
+        Raises:
+            scrapy.exceptions.DropItem: if a stage drops the item.
+            KeyError: if the item's class has no route.
+        """
+        item_class = type(item)
+        chain = self.chains[item_class]
+        start = time.perf_counter()
+        try:
+            return self.run_chain(item, chain, actors_wiki_spider)
+        finally:
+            if self.stats is not None:
+                self.stats.inc_value(f"routing/{item_class.__name__}/items")
+                self.stats.inc_value(f"routing/{item_class.__name__}/seconds", time.perf_counter() - start, start=0.0)
+
+    @staticmethod
+    def run_chain(item: scrapy.Item, chain: List, actors_wiki_spider: scrapy.Spider) -> Union[scrapy.Item, Deferred]:
+        """
+        Run the item through a chain of stages. If a stage returns a Deferred, the rest of the chain
+        runs once it fires.
+        """
+        for position, stage in enumerate(chain):
+            item = stage.process_item(item, actors_wiki_spider)
+            if isinstance(item, Deferred):
+                return item.addCallback(RoutingPipeline.run_chain, chain[position + 1:], actors_wiki_spider)
         return item
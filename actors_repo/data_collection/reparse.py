@@ -0,0 +1,183 @@
+"""
+Re-parse the film pages stored in a ResponseArchive across a pool of processes, and load the cleaned items.
+
+From the actors_repo directory, run:
+    python -m data_collection.reparse ARCHIVE_PATH [--workers N] [--chunk-size N] [--no-load]
+
+Each worker process opens the archive itself, runs parse_films on its share of the film pages, and
+passes the items through the DropEmptyPipeline, DatePipeline, and MoneyPipeline. The cleaned items
+are streamed back to this process, where they are written by DBPipeline (built from the project
+settings), so the parsing and cleaning scale with the number of cores while the writes stay batched.
+"""
+import argparse
+import logging
+import os
+import time
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Text, Tuple
+
+import scrapy
+from scrapy.exceptions import DropItem
+from scrapy.settings import Settings
+from scrapy.utils.project import get_project_settings
+
+from .archive import ResponseArchive
+from .pipelines import DatePipeline, DBPipeline, DropEmptyPipeline, MoneyPipeline
+from .spiders.actors_wiki_spider import Actorswiki, is_film_page
+
+logger = logging.getLogger(__name__)
+
+# The state of each worker process, set by init_worker.
+worker_archive = None
+worker_spider = None
+worker_stages = None
+
+
+def clean_items(items: Iterable[scrapy.Item], stages: List, spider: scrapy.Spider,
+                counts: dict) -> Iterator[scrapy.Item]:
+    """
+    Pass the items through the cleaning pipelines, as scrapy would.
+
+    Args:
+        items (Iterable[scrapy.Item]): The items produced by the spider.
+        stages (List): The DropEmptyPipeline, DatePipeline, and MoneyPipeline instances, in order.
+        spider (scrapy.Spider): The spider passed to the pipelines.
+        counts (dict): The 'dropped' and 'errors' counters to update.
+
+    Yields:
+        (scrapy.Item): The cleaned items which were not dropped.
+    """
+    for item in items:
+        try:
+            for stage in stages:
+                item = stage.process_item(item, spider)
+        except DropItem:
+            counts["dropped"] += 1
+            continue
+        except Exception as err:
+            logger.error(f"Error processing {item}: {err!r}")
+            counts["errors"] += 1
+            continue
+        yield item
+
+
+def bounded_map(pool: Executor, function: Callable, tasks: Iterable, max_pending: int) -> Iterator:
+    """
+    Map the function over the tasks in the pool, in order, with at most max_pending tasks submitted at once.
+
+    Unlike Executor.map, the tasks are consumed lazily, so a stream of tasks is never held in memory.
+
+    Args:
+        pool (Executor): The pool of workers.
+        function (Callable): The function to apply to each task.
+        tasks (Iterable): The tasks.
+        max_pending (int): The maximum number of submitted tasks whose results have not been yielded.
+
+    Yields:
+        The result of each task, in order.
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(function, task))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """
+    Split the iterable into lists of at most size elements.
+    """
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def init_worker(archive_path: Text, settings: dict) -> None:
+    """
+    Open the archive and build the spider and cleaning pipelines of a worker process.
+
+    Args:
+        archive_path (Text): The path of the ResponseArchive.
+        settings (dict): The settings used by parse_films (e.g. FILM_RECORDS).
+
+    Returns:
+        None
+    """
+    global worker_archive, worker_spider, worker_stages
+    worker_archive = ResponseArchive(archive_path)
+    worker_spider = Actorswiki()
+    worker_spider.settings = Settings(settings)
+    worker_stages = [DropEmptyPipeline(), DatePipeline(), MoneyPipeline()]
+
+
+def parse_chunk(urls: List[Text]) -> Tuple[List[scrapy.Item], dict]:
+    """
+    Parse and clean the stored film pages of the urls in a worker process.
+
+    Args:
+        urls (List[Text]): The URLs of the film pages.
+
+    Returns:
+        (Tuple[List[scrapy.Item], dict]): The cleaned items, and the 'pages', 'dropped', and 'errors' counts.
+    """
+    counts = {"pages": len(urls), "dropped": 0, "errors": 0}
+    items = []
+    for url in urls:
+        response = worker_archive.retrieve(url)
+        if response is None or response.status != 200:
+            continue
+        items.extend(clean_items(worker_spider.parse_films(response), worker_stages, worker_spider, counts))
+    return items, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archive", help="the path of the archive captured with ARCHIVE_MODE=capture")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="the number of parsing processes")
+    parser.add_argument("--chunk-size", type=int, default=20, help="the number of pages per task")
+    parser.add_argument("--no-load", action="store_true", help="parse and clean the pages without writing them")
+    args = parser.parse_args()
+
+    settings = get_project_settings()
+    spider = Actorswiki()
+    spider.settings = settings
+    archive = ResponseArchive(args.archive)
+    loader = None
+    if not args.no_load:
+        loader = DBPipeline.from_settings(settings, writer_thread=False)
+        loader.open_spider(spider)
+    totals = {"pages": 0, "items": 0, "dropped": 0, "errors": 0}
+    start = time.perf_counter()
+    urls = (url for url in archive.urls(include_redirects=False) if is_film_page(url))
+    # The chunks of URLs are submitted as their results are consumed, so at most two chunks per worker (and their
+    # items) are held in memory, however large the archive is.
+    with ProcessPoolExecutor(args.workers, initializer=init_worker,
+                             initargs=(args.archive, {"FILM_RECORDS": settings.getbool("FILM_RECORDS")})) as pool:
+        for items, counts in bounded_map(pool, parse_chunk, chunked(urls, args.chunk_size), 2 * args.workers):
+            for item in items:
+                if loader is not None:
+                    loader.process_item(item, spider)
+            totals["pages"] += counts["pages"]
+            totals["items"] += len(items)
+            totals["dropped"] += counts["dropped"]
+            totals["errors"] += counts["errors"]
+    archive.close()
+    if loader is not None:
+        loader.close_spider(spider)
+    elapsed = time.perf_counter() - start
+    print(f"{totals['pages']} film pages re-parsed by {args.workers} workers in {elapsed:.2f}s "
+          f"({totals['pages'] / elapsed:.1f} pages/sec): {totals['items']} items loaded, "
+          f"{totals['dropped']} dropped, {totals['errors']} errors")
+
+
+if __name__ == "__main__":
+    main()
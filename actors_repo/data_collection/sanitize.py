@@ -0,0 +1,63 @@
+from typing import Optional, Text
+
+# The characters removed as punctuation when they are not part of a bracketed span.
+PUNCTUATION = frozenset(",;!:()+-/{}")
+
+
+def is_blank(name: Text) -> bool:
+    """
+    Check whether nothing is left of the name once bracketed text and punctuation are removed.
+
+    This makes the same decision as checking that
+        re.sub(r"[\\[{]+.*[\\]}]+|[({]+.*[)}]*|[({]*.*[)}]+|[,;!:()+\\-/{}]+", "", name)
+    is empty, in a single scan of the name instead of a backtracking search. Scanning from the left,
+    that pattern removes, at each position:
+        1) from a '[' or '{' to the last ']' or '}' of the line, if there is one after it,
+        2) from a '(' or '{' to the end of the line,
+        3) from any character to the last ')' or '}' of the line, if there is one at or after it,
+        4) the run of characters in PUNCTUATION starting there,
+    and keeps the character otherwise. Since '.' does not match a newline, a newline is always kept.
+
+    Args:
+        name (Text): The film, actor_name, director, distributor, or prod_co.
+
+    Returns:
+        (bool): Whether the name is made only of bracketed text and punctuation.
+    """
+    if "\n" in name:
+        return False
+    last_square = max(name.rfind("]"), name.rfind("}"))
+    last_round = max(name.rfind(")"), name.rfind("}"))
+    i = 0
+    while i < len(name):
+        char = name[i]
+        if char in "[{" and last_square > i:
+            i = last_square + 1
+        elif char in "({":
+            return True
+        elif last_round >= i:
+            i = last_round + 1
+        elif char in PUNCTUATION:
+            # The run of punctuation is removed at once, including any '(' or '{' in it.
+            while i < len(name) and name[i] in PUNCTUATION:
+                i += 1
+        else:
+            return False
+    return True
+
+
+def clean_name(name: Text) -> Optional[Text]:
+    """
+    Remove leading commas and slashes from the name, unless nothing is left of it
+    after removing non-letter characters.
+
+    Args:
+        name (Text): The film, actor_name, director, distributor, or prod_co.
+
+    Returns:
+        (Optional[Text]): The name with leading commas and slashes removed, or None
+        if the name is empty after removing bracketed text and punctuation (see is_blank).
+    """
+    if is_blank(name):
+        return None
+    return name.lstrip(",/")
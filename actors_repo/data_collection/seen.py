@@ -0,0 +1,159 @@
+import math
+import os
+import struct
+import threading
+
+from hashlib import blake2b
+from typing import Iterable, Iterator, Text
+from urllib.parse import quote, unquote, urlsplit
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .wikitext import normalize_title
+
+# The header of a seen-set file: a magic string, the number of bits, and the number of hashes.
+HEADER = struct.Struct("<8sQI")
+MAGIC = b"SEENBLM1"
+
+
+def canonical_url(url: Text) -> Text:
+    """
+    Canonicalize the URL of a wikipedia article, so that the different spellings of a link match.
+
+    Args:
+        url (Text): The URL of an article, e.g. 'http://en.wikipedia.org/wiki/the_Film_(2005_film)#Cast'.
+
+    Returns:
+        (Text): The URL with an https scheme, a lowercase host, no query or fragment, and a normalized
+        title, e.g. 'https://en.wikipedia.org/wiki/The_Film_(2005_film)'.
+    """
+    parts = urlsplit(url)
+    path = parts.path
+    if path.startswith("/wiki/"):
+        title = normalize_title(unquote(path[len("/wiki/"):]))
+        path = "/wiki/" + quote(title.replace(" ", "_"), safe="/:()',!*;@$~")
+    return f"https://{parts.netloc.lower()}{path}"
+
+
+class SeenSet:
+    """
+    This class is used to remember the film pages already ingested, across runs and shards, in bounded memory.
+
+    The set is a Bloom filter stored in a single file: it never forgets a URL which was added, and
+    wrongly reports a URL as seen with a probability of about error_rate once capacity URLs have been
+    added. Saving merges the filter with the one on disk under a file lock, so shards sharing the file
+    keep each other's URLs.
+
+    The films are only marked as seen once they are persisted (see mark_films), by DBPipeline's writer
+    thread or by SpoolPipeline, while the spider checks the set for the films it finds, so the changes
+    to the filter take a lock.
+
+    Attributes:
+        path (Text): the path of the file the filter is stored in
+        num_bits (int): the number of bits of the filter
+        num_hashes (int): the number of bits set for each URL
+        bits (bytearray): the filter
+        added (int): the number of URLs added since the filter was last saved
+        save_every (int): the number of URLs marked after which the filter is saved (0 means only on close)
+        lock (threading.Lock): the lock serializing the changes to the filter
+    """
+    def __init__(self, path: Text, capacity: int = 1000000, error_rate: float = 0.001, save_every: int = 0):
+        self.path = path
+        self.save_every = save_every
+        self.lock = threading.Lock()
+        self.num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.added = 0
+        if os.path.exists(path):
+            self.bits = self.read()
+
+    def positions(self, url: Text) -> Iterator[int]:
+        """
+        Get the bits of the url's canonical form, by double hashing a single 128-bit digest.
+        """
+        digest = blake2b(canonical_url(url).encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        for k in range(self.num_hashes):
+            yield (first + k * second) % self.num_bits
+
+    def add(self, url: Text) -> None:
+        """
+        Add the url to the set.
+
+        Args:
+            url (Text): The URL of a film page, or of a request which was redirected to one.
+
+        Returns:
+            None
+        """
+        for position in self.positions(url):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.added += 1
+
+    def mark_films(self, urls: Iterable[Text]) -> None:
+        """
+        Add the URLs of the films to the set, once the films are persisted, saving it every save_every URLs.
+
+        Args:
+            urls (Iterable[Text]): The URLs of the film pages, and of the requests redirected to them.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            for url in urls:
+                self.add(url)
+            if self.save_every and self.added >= self.save_every:
+                self.save_locked()
+
+    def __contains__(self, url: Text) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(url))
+
+    def read(self) -> bytearray:
+        """
+        Read the filter stored in the file.
+
+        Returns:
+            (bytearray): The bits of the stored filter.
+
+        Raises:
+            ValueError: if the file is not a seen-set of the same size.
+        """
+        with open(self.path, "rb") as stored:
+            magic, num_bits, num_hashes = HEADER.unpack(stored.read(HEADER.size))
+            bits = bytearray(stored.read())
+        if magic != MAGIC or num_bits != self.num_bits or num_hashes != self.num_hashes:
+            raise ValueError(f"{self.path} is not a seen-set of {self.num_bits} bits and {self.num_hashes} hashes")
+        return bits
+
+    def save(self) -> None:
+        """
+        Merge the filter into the file, keeping the URLs added to it by other processes in the meantime.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.save_locked()
+
+    def save_locked(self) -> None:
+        """
+        Save the filter as described in save, with the lock already held.
+        """
+        with open(self.path + ".lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self.path):
+                stored = int.from_bytes(self.read(), "little")
+                merged = stored | int.from_bytes(self.bits, "little")
+                self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as temp:
+                temp.write(HEADER.pack(MAGIC, self.num_bits, self.num_hashes))
+                temp.write(self.bits)
+            os.replace(temp_path, self.path)
+        self.added = 0
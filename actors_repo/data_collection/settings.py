@@ -49,15 +49,57 @@ CONCURRENT_REQUESTS = 2
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
+SPIDER_MIDDLEWARES = {
 #    "data_collection.middlewares.ActorsWikiSpiderMiddleware": 543,
-#}
+    "data_collection.middlewares.SeenFilmsMiddleware": 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
+DOWNLOADER_MIDDLEWARES = {
 #    "data_collection.middlewares.ActorsWikiDownloaderMiddleware": 543,
-#}
+    "data_collection.middlewares.IncrementalMiddleware": 585,
+    "data_collection.middlewares.ResponseArchiveMiddleware": 580,
+    "data_collection.middlewares.TrimFilmPageMiddleware": 575,
+}
+
+# Capture every fetched response into a compressed single-file archive (ARCHIVE_MODE = "capture"), or
+# replay a previous crawl from that archive with no network access or throttling (ARCHIVE_MODE = "replay").
+# For example: scrapy crawl actors_wiki_spider -s ARCHIVE_MODE=replay
+ARCHIVE_MODE = None
+ARCHIVE_PATH = "archive.sqlite"
+
+# Cut the body of each film page down to its heading and infobox before it is parsed (the archive and the incremental
+# checks still see the whole page), which cuts the parse time and the memory held by the responses in flight.
+TRIM_FILM_PAGES = True
+
+# Only re-write the film pages which changed since the last crawl (INCREMENTAL = True). The ETag, Last-Modified,
+# and revision id of each film page are stored in the pages table; known pages are requested conditionally, and
+# the ones which are not modified (or still at the stored revision) are dropped before they are parsed.
+# Incremental crawls produce FilmRecords, so each changed film is rewritten in a single transaction.
+INCREMENTAL = False
+
+# Skip the films already persisted by a previous run or by another shard (SEEN_PATH = "seen.bloom"). The URLs of
+# each film and of its redirects are added to a Bloom filter file once the film is persisted (so the crawl produces
+# FilmRecords), sized for SEEN_CAPACITY URLs with a false positive rate of SEEN_ERROR_RATE (about 1.8MB for the
+# defaults), and saved every SEEN_SAVE_EVERY URLs and on close.
+SEEN_PATH = None
+SEEN_CAPACITY = 1000000
+SEEN_ERROR_RATE = 0.001
+SEEN_SAVE_EVERY = 1000
+
+# Make the crawl resumable (RESUME_DIR = "crawls/actors_wiki"). The pending requests are kept in scrapy's disk queues
+# under RESUME_DIR, with the film pages ahead of the list pages, and the list pages and films which are fully persisted
+# are checkpointed in RESUME_DIR/checkpoint.sqlite. Running the same command again after the crawl was stopped or died
+# picks up where it stopped. Each shard needs its own RESUME_DIR; delete it to start a crawl over.
+RESUME_DIR = None
+
+# Fetch the film pages as rendered html, one request per film (FETCH_MODE = "html"), or fetch their wikitext
+# from the API at WIKI_URL in batches of up to API_BATCH_SIZE titles per request (FETCH_MODE = "api").
+# WIKI_URL can point at a local stand-in server, see tools/wiki_stub.py.
+FETCH_MODE = "html"
+WIKI_URL = "https://en.wikipedia.org"
+API_BATCH_SIZE = 50
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -67,10 +109,50 @@ CONCURRENT_REQUESTS = 2
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-ITEM_PIPELINES = {"data_collection.pipelines.DropEmptyPipeline": 100,
-                  "data_collection.pipelines.DatePipeline": 300,
-                  "data_collection.pipelines.MoneyPipeline": 600,
-                  "data_collection.pipelines.DBPipeline": 800}
+# RoutingPipeline runs each item through the stages which apply to its class (see RoutingPipeline.ROUTES),
+# and reports the items and seconds per class in the crawl stats. To run every item through every stage:
+#ITEM_PIPELINES = {"data_collection.pipelines.DropEmptyPipeline": 100,
+#                  "data_collection.pipelines.DatePipeline": 300,
+#                  "data_collection.pipelines.MoneyPipeline": 600,
+#                  "data_collection.pipelines.DBPipeline": 800}
+ITEM_PIPELINES = {"data_collection.pipelines.RoutingPipeline": 100}
+
+# Produce one FilmRecord per film page (with lists of cast, directors, distributors, and production
+# companies) instead of a MovieItem plus one item per name, so each film makes a single pipeline pass.
+FILM_RECORDS = False
+
+# Store the tables in MySQL (DB_BACKEND = "mysql"), logging in with the DB_USER, DB_PSWD, and DB_HOST environment
+# variables, or in the single SQLite file at DB_PATH (DB_BACKEND = "sqlite"), which needs no server.
+DB_BACKEND = "mysql"
+DB_PATH = "actors_wiki.sqlite"
+# Partition the MySQL movies table by release year, with one partition per year from the first to the last year
+# of DB_PARTITION_YEARS (e.g. DB_PARTITION_YEARS = (2003, 2022)), so that the queries of a range of years only
+# read their partitions, and a year can be emptied and crawled again (see data_collection/partitions.py).
+# Widening the range later adds the partitions of the new years. Partitioning is a migration of its own, recorded in
+# schema_migrations, which drops the foreign keys on movies, as a partitioned InnoDB table cannot have them.
+DB_PARTITION_YEARS = None
+
+# Buffer the items in DBPipeline and write them with executemany in one transaction per batch.
+# A batch is flushed once DB_BATCH_SIZE items are buffered, once DB_FLUSH_INTERVAL seconds have
+# passed since the last flush, and when the spider closes (e.g. DB_BATCH_SIZE = 500). With DB_BATCH_SIZE = 0,
+# each item is committed as it arrives.
+DB_BATCH_SIZE = 0
+DB_FLUSH_INTERVAL = 60
+# The maximum number of names cached per table by DBPipeline's name to id maps (0 means unbounded).
+DB_CACHE_SIZE = 0
+# Hand the items to a dedicated DB writer thread through a queue of at most DB_WRITER_QUEUE_SIZE items,
+# so that MySQL latency does not stall the reactor (e.g. DB_WRITER_QUEUE_SIZE = 1000). With DB_WRITER_QUEUE_SIZE = 0,
+# the items are written on the reactor thread.
+DB_WRITER_QUEUE_SIZE = 0
+# Retry a transaction up to DB_MAX_RETRIES times after a deadlock or a lock wait timeout, which happen when
+# several shards (see the spider's shard_index and shard_count arguments) write to the database at once.
+DB_MAX_RETRIES = 5
+
+# Spool the cleaned items to gzipped JSONL shards under SPOOL_DIR (SPOOL_DIR = "spool") instead of writing them
+# to MySQL during the crawl, with a new shard every SPOOL_SHARD_SIZE items. The shards are then loaded with
+# python -m data_collection.bulkload SPOOL_DIR, which can be run again without crawling.
+SPOOL_DIR = None
+SPOOL_SHARD_SIZE = 50000
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -91,7 +173,8 @@ AUTOTHROTTLE_DEBUG = True
 #HTTPCACHE_EXPIRATION_SECS = 0
 #HTTPCACHE_DIR = "httpcache"
 #HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# The cached responses are kept in a single compressed SQLite file per spider, HTTPCACHE_DIR/<spider name>.sqlite.
+HTTPCACHE_STORAGE = "data_collection.archive.SQLiteCacheStorage"
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
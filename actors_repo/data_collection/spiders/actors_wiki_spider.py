@@ -1,11 +1,36 @@
 from __future__ import print_function
 
-import re
-from typing import Callable, Generator, List, Optional, Text,  Type
+import os
+import shutil
+import zlib
+
+from typing import Dict, Generator, List, Optional, Text
+from urllib.parse import unquote, urlencode, urlparse
 
 import scrapy
+from scrapy import signals
+from scrapy.settings import Settings
+
+from .. import wikitext
+from ..checkpoint import Checkpoint
+from ..infobox import extract_film
+from ..items import (RECORD_FIELDS, CastItem, DirectorItem, DistributorItem, FilmRecord,
+                     MovieItem, ProductionCoItem)
+from ..seen import SeenSet
 
-from ..items import CastItem, DirectorItem, DistributorItem, MovieItem, ProductionCoItem
+
+def is_film_page(url: Text) -> bool:
+    """
+    Check whether the url is a film page (rather than a list of films or robots.txt).
+
+    Args:
+        url (Text): The URL of a request or a stored response.
+
+    Returns:
+        (bool): Whether the URL is a wikipedia article other than a List of American films page.
+    """
+    path = urlparse(url).path
+    return path.startswith("/wiki/") and not path.startswith("/wiki/List_of_American_films")
 
 
 class Actorswiki(scrapy.Spider):
@@ -13,26 +38,169 @@ class Actorswiki(scrapy.Spider):
     This class is used to scrape the list of films by year and subsequently scrape
     each film's wikipedia page for the list of starring actors, director(s), distributor(s),
     production companies, budget, box office, and release date.
+
+    The spider arguments split the crawl across several processes or machines, e.g.
+    scrapy crawl actors_wiki_spider -a start_year=2010 -a end_year=2015 -a shard_index=0 -a shard_count=4
+    Every shard reads the list pages of the year range, and only follows the films whose URL hashes
+    to its shard_index, so the shards never crawl the same film.
+
+    With the RESUME_DIR setting, the progress of the crawl is checkpointed in RESUME_DIR, and a crawl
+    which was stopped or died is resumed by running the same command again: the list pages whose films
+    are all persisted are skipped, and only the films which are not persisted yet are requested.
+
+    With the SEEN_PATH setting (outside of incremental mode), the films persisted by earlier runs or
+    other shards are kept in a SeenSet, which SeenFilmsMiddleware checks before each film is requested.
+    Each FilmRecord carries the URLs its film is known by, and is added to the set by DBPipeline (or
+    SpoolPipeline) once it is persisted.
+
+    Attributes:
+        start_year (int): the first year of the List of American films pages to crawl
+        end_year (int): the last year of the List of American films pages to crawl (inclusive)
+        shard_index (int): the shard of the films crawled by this spider, from 0 to shard_count - 1
+        shard_count (int): the number of shards the films are split into
+        checkpoint (Optional[Checkpoint]): the progress of the crawl, if RESUME_DIR is set
+        seen (Optional[SeenSet]): the films persisted so far, if SEEN_PATH is set
     """
 
     name = 'actors_wiki_spider'
 
+    def __init__(self, start_year: int = 2003, end_year: int = 2022, shard_index: int = 0, shard_count: int = 1,
+                 *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_year = int(start_year)
+        self.end_year = int(end_year)
+        self.shard_index = int(shard_index)
+        self.shard_count = int(shard_count)
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(f"shard_index must be between 0 and {self.shard_count - 1}, not {self.shard_index}")
+        self.checkpoint = None
+        self.seen = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        """
+        Build the spider, and open its checkpoint if RESUME_DIR is set and its seen-set if SEEN_PATH is set.
+
+        The request queue kept in RESUME_DIR by scrapy (see update_settings) is discarded first: it is
+        not flushed while crawling, so it is lost if the crawl dies, and its requests are rebuilt
+        from the checkpoint by start_requests anyway.
+
+        Raises:
+            ValueError: if RESUME_DIR is set in API mode, whose batches are not checkpointed.
+        """
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        resume_dir = crawler.settings.get("RESUME_DIR")
+        if resume_dir:
+            if crawler.settings.get("FETCH_MODE") == "api":
+                raise ValueError("RESUME_DIR is only supported with FETCH_MODE = \"html\"")
+            shutil.rmtree(crawler.settings.get("JOBDIR"), ignore_errors=True)
+            os.makedirs(resume_dir, exist_ok=True)
+            spider.checkpoint = Checkpoint(os.path.join(resume_dir, "checkpoint.sqlite"))
+            crawler.signals.connect(spider.checkpoint_dropped, signal=signals.item_dropped)
+            crawler.signals.connect(spider.close_checkpoint, signal=signals.spider_closed)
+        settings = crawler.settings
+        if settings.get("SEEN_PATH") and not settings.getbool("INCREMENTAL"):
+            spider.seen = SeenSet(settings.get("SEEN_PATH"), settings.getint("SEEN_CAPACITY"),
+                                  settings.getfloat("SEEN_ERROR_RATE"), settings.getint("SEEN_SAVE_EVERY"))
+            crawler.signals.connect(spider.seen_dropped, signal=signals.item_dropped)
+            crawler.signals.connect(spider.close_seen, signal=signals.spider_closed)
+        return spider
+
+    def checkpoint_dropped(self, item: scrapy.Item) -> None:
+        """
+        Mark the film of a dropped FilmRecord as done, since there is nothing of it to persist.
+        """
+        if item.get("listed_url"):
+            self.checkpoint.mark_films([item["listed_url"]])
+
+    def seen_dropped(self, item: scrapy.Item) -> None:
+        """
+        Mark the film of a dropped FilmRecord as seen, since parsing it again would drop it again.
+        """
+        if item.get("seen_urls"):
+            self.seen.mark_films(item["seen_urls"])
+
+    def close_seen(self) -> None:
+        """
+        Save the seen-set, once DBPipeline has written (and marked) the last items.
+        """
+        self.seen.save()
+
+    def close_checkpoint(self) -> None:
+        """
+        Close the checkpoint, once DBPipeline has written (and checkpointed) the last items.
+        """
+        self.checkpoint.close()
+
+    @classmethod
+    def update_settings(cls, settings: Settings) -> None:
+        """
+        Turn off robots.txt, throttling, and the download delay when replaying an archive, turn off
+        robots.txt in API mode, produce FilmRecords in incremental mode and with a seen-set, and keep the
+        request queue on disk in resumable mode.
+
+        Replayed responses never touch the network, so there is nothing to be polite to. The API is
+        disallowed by wikipedia's robots.txt, which is aimed at crawlers of the rendered pages; the
+        requests in API mode are still throttled. In incremental mode, each changed film must be
+        rewritten (and its validators stored) in a single transaction, which needs all of its fields
+        in one item. In resumable mode (RESUME_DIR is set), the pending requests are kept in scrapy's
+        disk queues under RESUME_DIR, so the memory used does not grow with the frontier, and FilmRecords
+        are produced so that each film is persisted (and checkpointed) at once. Likewise, with SEEN_PATH,
+        a film is only marked as seen once all of its fields are persisted, in a single FilmRecord.
+
+        Args:
+            settings (scrapy.settings.Settings): The crawler's settings.
+
+        Returns:
+            None
+        """
+        super().update_settings(settings)
+        if settings.get("ARCHIVE_MODE") == "replay":
+            settings.setdict({"ROBOTSTXT_OBEY": False,
+                              "AUTOTHROTTLE_ENABLED": False,
+                              "DOWNLOAD_DELAY": 0,
+                              "CONCURRENT_REQUESTS": 32
+                              }, priority="spider")
+        if settings.get("FETCH_MODE") == "api":
+            settings.set("ROBOTSTXT_OBEY", False, priority="spider")
+        if settings.getbool("INCREMENTAL") or settings.get("SEEN_PATH"):
+            settings.set("FILM_RECORDS", True, priority="spider")
+        if settings.get("RESUME_DIR"):
+            settings.setdict({"JOBDIR": os.path.join(settings.get("RESUME_DIR"), "frontier"),
+                              "FILM_RECORDS": True
+                              }, priority="spider")
+
     def start_requests(self) -> Generator[scrapy.http.Request, None, None]:
         """
         Visit the wikipedia page for films released each year and parse each page using parselist.
 
+        When resuming, the list pages which were already parsed are not visited again: the films
+        of those pages which are not persisted yet are requested directly instead.
+
         Yields:
             (scrapy.http.Request): The Request object for each wikipedia page with the
-            list of American films released that year.
+            list of American films released that year, or for each film left to crawl.
         """
-        for num in range(2003, 2023):
-            movie_by_year = f"https://en.wikipedia.org/wiki/List_of_American_films_of_{num}"
-            yield scrapy.Request(url=movie_by_year, callback=self.parse_list)
+        wiki_url = self.settings.get("WIKI_URL", "https://en.wikipedia.org")
+        for num in range(self.start_year, self.end_year + 1):
+            movie_by_year = f"{wiki_url}/wiki/List_of_American_films_of_{num}"
+            pending = self.checkpoint.pending_films(movie_by_year) if self.checkpoint is not None else None
+            if pending is None:
+                yield scrapy.Request(url=movie_by_year, callback=self.parse_list)
+                continue
+            self.crawler.stats.inc_value("checkpoint/lists_resumed" if pending else "checkpoint/lists_complete")
+            self.crawler.stats.inc_value("checkpoint/films_pending", len(pending))
+            for film_url in pending:
+                yield self.film_request(film_url)
 
     def parse_list(self, response: scrapy.http.Response) -> Generator[scrapy.http.Request, None, None]:
         """
         Scrape the list of films in each page of films by year to get the link to the film page.
 
+        Only the films in the spider's shard are followed. With FETCH_MODE = "api", the films are
+        instead requested from the API in batches of API_BATCH_SIZE titles, and parsed by parse_api.
+        In resumable mode, the films of the page are recorded in the checkpoint before they are requested.
+
         Args:
             response (scrapy.http.Response): Scrapy's representation of the HTTP Response
                 object arising from the request for one of the List of American
@@ -40,27 +208,133 @@ class Actorswiki(scrapy.Spider):
 
         Yields:
             (scrapy.http.Request): The Request object for each film's wikipedia page for the
-            given year.
+            given year, or for each batch of films in API mode.
         """
+        hrefs = []
         months = ["January", "April", "July", "October"]
         for month in months:
             table = response.xpath('//div/h2[contains(span[2], "'+month+'")]/following-sibling::table[1]/tbody/tr')
             for row in table:
                 href = row.xpath('./td/i/a/@href').get()
-                yield scrapy.Request(url=response.urljoin(href), callback=self.parse_films)
+                if self.in_shard(response.urljoin(href)):
+                    hrefs.append(href)
+        if self.settings.get("FETCH_MODE") == "api":
+            # Only the links to articles have a title; red links point to the edit page instead.
+            titles = [unquote(urlparse(href).path[len("/wiki/"):]).replace("_", " ")
+                      for href in hrefs if href and urlparse(href).path.startswith("/wiki/")]
+            batch_size = self.settings.getint("API_BATCH_SIZE", 50)
+            for start in range(0, len(titles), batch_size):
+                yield self.api_request(titles[start:start + batch_size])
+            return
+        film_urls = [response.urljoin(href) for href in hrefs]
+        if self.checkpoint is not None:
+            self.checkpoint.record_list(self.request_url(response), film_urls)
+        for film_url in film_urls:
+            yield self.film_request(film_url)
+
+    def film_request(self, url: Text) -> scrapy.http.Request:
+        """
+        Request a film page, to be parsed by parse_films.
+
+        The film pages have a higher priority than the list pages, so that the films of a list page
+        are crawled (and persisted) before the next list page adds more films to the queue.
+
+        Args:
+            url (Text): The URL of the film page, as linked from the list page.
+
+        Returns:
+            (scrapy.http.Request): The Request object for the film page.
+        """
+        return scrapy.Request(url=url, callback=self.parse_films, priority=1)
+
+    @staticmethod
+    def request_url(response: scrapy.http.Response) -> Text:
+        """
+        Get the URL the response was requested with, before any redirect.
+        """
+        return response.meta.get("redirect_urls", [response.url])[0]
+
+    def in_shard(self, url: Text) -> bool:
+        """
+        Check whether the film page belongs to the spider's shard.
+
+        The URLs are partitioned by their CRC-32, which (unlike hash) is the same in every process.
+
+        Args:
+            url (Text): The URL of the film page.
+
+        Returns:
+            (bool): Whether the spider should crawl the film page.
+        """
+        return zlib.crc32(url.encode("utf-8")) % self.shard_count == self.shard_index
+
+    def api_request(self, titles: List[Text], continuation: Optional[Dict] = None) -> scrapy.http.Request:
+        """
+        Request the current revision (with its wikitext) of each title from the API at WIKI_URL.
+
+        Args:
+            titles (List[Text]): The titles of the film articles, at most 50.
+            continuation (Optional[Dict]): The 'continue' parameters of the previous response, when the
+                API could not return every page's content at once.
+
+        Returns:
+            (scrapy.http.Request): The Request object for the batch of titles, parsed by parse_api.
+        """
+        params = {"action": "query",
+                  "prop": "revisions",
+                  "rvprop": "ids|content",
+                  "rvslots": "main",
+                  "redirects": "1",
+                  "format": "json",
+                  "formatversion": "2",
+                  "titles": "|".join(titles)
+                  }
+        params.update(continuation or {})
+        wiki_url = self.settings.get("WIKI_URL", "https://en.wikipedia.org")
+        return scrapy.Request(url=f"{wiki_url}/w/api.php?{urlencode(params)}", callback=self.parse_api,
+                              cb_kwargs={"titles": titles})
+
+    def parse_api(self, response: scrapy.http.Response, titles: List[Text]) -> Generator:
+        """
+        Get the fields of each film in a batch from the wikitext of its infobox.
+
+        The pages are produced as by parse_films. Missing pages are skipped, as are the pages whose
+        content did not fit in this response; those are requested again with the continuation. With a
+        seen-set, each film's record carries the URLs of its title and of the titles redirected to it.
+
+        Args:
+            response (scrapy.http.Response): The API's JSON response for a batch of titles.
+            titles (List[Text]): The titles requested.
+
+        Yields:
+            (Union[scrapy.Item, scrapy.http.Request]): The items of each film, as in parse_films, and the
+            Request object for the rest of the batch if the API returned a continuation.
+        """
+        data = response.json()
+        query = data.get("query", {})
+        wiki_url = self.settings.get("WIKI_URL", "https://en.wikipedia.org")
+        redirected = {}
+        for redirect in query.get("redirects", []):
+            redirected.setdefault(redirect["to"], []).append(redirect["from"])
+        for page in query.get("pages", []):
+            revisions = page.get("revisions")
+            if not revisions:
+                continue
+            content = revisions[0]["slots"]["main"]["content"]
+            extra = None
+            if self.seen is not None:
+                titles_seen = [page["title"], *redirected.get(page["title"], [])]
+                extra = {"seen_urls": [f"{wiki_url}/wiki/{title}" for title in titles_seen]}
+            yield from self.film_items(wikitext.extract_film(page["title"], content, page.get("pageid")), extra)
+        if "continue" in data:
+            yield self.api_request(titles, data["continue"])
 
     def parse_films(self, response: scrapy.http.Response) -> Generator[scrapy.Item, None, None]:
         """
         Get the cast list, director(s), production companies, budget, box office, and release date for the film.
 
-        First, we produce a MovieItem with fields 'film', 'budget', 'box_office', and 'release_date'.
-        As outlined below, there are several cases to consider for extracting the release date:
-        1) it is in a list of release dates, and we want the US release date, 2) there is a single
-        Release date listed, or 3) it is listed as the Original air date.
-
-        Next, we use build_items() to produce: DirectorItems with fields 'film', 'director',
-        DistributorItems with fields 'film' and 'distributor', ProductionCoItem with fields
-        'film' and 'prod_co' and CastItems with fields 'film' and 'actor_name'.
+        The fields are extracted in a single pass over the film's infobox by extract_film, and turned
+        into items by film_items.
 
         Args:
             response (scrapy.http.Response): Scrapy's representation of the HTTP Response object
@@ -68,201 +342,54 @@ class Actorswiki(scrapy.Spider):
 
         Yields:
             (scrapy.Item): A MovieItem, CastItem(s), DirectorItem(s), ProductionCoItem(s),
-            and DistributorItem(s) for each film for the given year.
+            and DistributorItem(s) for each film for the given year, or a FilmRecord.
         """
-        # The next two functions are used to construct a MovieItem.
-        def get_movie_fields(paths: List[Text]) -> Optional[Text]:
-            """Get the film's title, budget, or box office.
-
-            Args:
-                 paths (List[Text]): The list of xpaths to use
-                     to get the title, budget, or box office.
-
-            Returns:
-                (Optional[Text]): The film title, budget, or box office as a string, or None.
-            """
-            for field_path in paths:
-                if response.xpath(field_path):
-                    return response.xpath(field_path).get()
-                else:
-                    continue
-            return None
-
-        def get_release_date(start_path: Text, relative_paths: List[Text],
-                             conditions: List[Callable[[Text], bool]]) -> Optional[Text]:
-            """Get the release date of the film.
-
-            Args:
-                start_path (Text): The path containing the rows of a table with a potential
-                    release date.
-                relative_paths (List(Text)): The list of relative paths to try from the first
-                    row in rows_path.
-                conditions (List(function)): The list of conditions to check to verify
-                    that the result is the release date.
-
-            Returns:
-                (Optional[Text]):  The film's release date or None.
-            """
-            rows = response.xpath(start_path)
-            if rows:
-                row = rows[0]
-                for rel_path, condition in zip(relative_paths, conditions):
-                    potential_date = row.xpath(rel_path).get()
-                    if potential_date and not condition(potential_date):
-                        return potential_date
-                    else:
-                        continue
-                return None
-            else:
-                return None
-
-        # This is used to construct CastItems, DirectorItems, DistributorItems, or ProductionCoItems.
-        def build_items(resp: scrapy.http.Response, movie: Text,
-                        item_field: Text) -> Generator[scrapy.Item, None, None]:
-            """
-            Construct the items corresponding to item_field using gen_items.
-
-            Args:
-                resp (scrapy.http.Response): Scrapy's representation of an HTTP
-                    response object arising from the request for the film's wikipedia page.
-                movie (Text): The film's title.
-                item_field (Text): Either 'actor_name', 'director', 'distributor', or 'prod_co'
-                    (the fields of the items CastItem, DirectorItem, DistributorItem, and ProductionCoItem,
-                    respectively, excluding 'film').
-
-            Returns:
-                (Generator[scrapy.Item, None, None): The generator of items constructed
-                using gen_items based on the subtype of the item (CastItem, DirectorItem,
-                DistributorItem, ProductionCoItem).
-
-
-            """
-            def gen_items(item: Type[scrapy.Item], first: Text, second: Text) -> Generator[scrapy.Item, None, None]:
-                """
-                Build CastItems, DirectorItems, DistributorItems, or ProductionCoItems.
-
-                Args:
-                    item (Type[scrapy.Item]): A CastItem, DirectorItem, DistributorItem,
-                         or ProductionCoItem class object
-                    first (Text): The first xpath to try in the case that there are more than one of
-                        the items of this type for this film (CastItem, DirectorItem, DistributorItem,
-                        or ProductionCoItem) to be associated with the movie. For CastItems, this will
-                        always be the case.
-                    second (Text): The xpath to try if the first fails to
-                        produce any results.
-
-                Yields:
-                    (scrapy.Item): An instance of either a CastItem, DirectorItem, DistributorItem,
-                     or ProductionCoItem.
-                """
-                def item_helper(field: Text) -> scrapy.Item:
-                    """
-                    Having found the fields of the item, build the item.
-
-                    Args:
-                        field (Text): The remaining field in the item other than 'film'; this
-                            is either the actor_name, director, distributor, or prod_co.
-
-                    Returns:
-                        (scrapy.Item): An instance of either a CastItem, DirectorItem, DistributorItem,
-                        or ProductionCoItem.
-                    """
-                    built_item = item()
-                    built_item["film"] = movie
-                    built_item[item_field] = field
-                    return built_item
-
-                first_path = resp.xpath(first)
-                if first_path and first_path.xpath('li'):
-                    if first_path.xpath('.//li/a/text()'):
-                        for field in first_path.xpath('.//li/a/text()').getall():
-                            field = field.strip()
-                            if field:
-                                yield item_helper(field)
-                    if first_path.xpath('.//li/text()'):
-                        for field in first_path.xpath('.//li/text()').getall():
-                            field = field.strip()
-                            if field:
-                                yield item_helper(field)
-                else:
-                    second_path = resp.xpath(second)
-                    if second_path and second_path.xpath('./a/text()'):
-                        for field in second_path.xpath('./a/text()').getall():
-                            field = field.strip()
-                            if field:
-                                yield item_helper(field)
-                    if second_path.xpath('./text()'):
-                        for field in second_path.xpath('./text()').getall():
-                            field = field.strip()
-                            if field:
-                                yield item_helper(field)
-
-            if item_field == "actor_name":
-                item = CastItem
-                first = '//tr[contains(th, "Starring")]/td/div/ul'
-                second = '//tr[contains(th, "Starring")]/td'
-                return gen_items(item, first, second)
-            elif item_field == "director":
-                item = DirectorItem
-                first = '//tr[contains(th, "Directed by")]/td/div/ul'
-                second = '//tr[contains(th, "Directed by")]/td'
-                return gen_items(item, first, second)
-            elif item_field == "prod_co":
-                item = ProductionCoItem
-                first = '//tr[contains(th/div, "Production")]/td/div/div/ul'
-                second = '//tr[contains(th/div,"Production")]/td/div'
-                return gen_items(item, first, second)
-            elif item_field == "distributor":
-                item = DistributorItem
-                first = '//tr[contains(th, "Distributed")]/td/div/ul'
-                second = '//tr[contains(th, "Distributed")]/td'
-                return gen_items(item, first, second)
-
-        # Now we construct and yield a MovieItem.
-        film_paths = ['//h1[@id="firstHeading"]/i/text()',
-                      '//h1[@id="firstHeading"]/span/text()'
-                      ]
-        budget_paths = ['//tr[contains(th, "Budget")]/td/text()',
-                        '//tr[contains(th, "Budget")]/td/span/text()',
-                        '//tr[contains(th, "Budget")]/td//li[1]/text()'
-                        ]
-        box_office_paths = ['//tr[contains(th, "Box office")]/td/text()',
-                            '//tr[contains(th, "Box office")]/td/span/text()',
-                            '//tr[contains(th, "Box office")]/td//li[contains(., "total")]/text()',
-                            '//tr[contains(th, "Box office")]/td//li[1]/text()'
-                            ]
-        # This is for the release date.
-        rows_path = '//tr[contains(th/., "date") or contains(th/., "elease")]/td'
-        rel_paths = ['.//li[text()[contains(., "States") or contains(., "US")]]/span/span/text()',
-                     './/li[1]/span/span/text()',
-                     './span/span/text()',
-                     './text()'
-                     ]
-        condition_list = [lambda x: re.sub(r"\(|\)", "", x) == "United States",
-                          lambda x: len(x) < 4,
-                          lambda x: len(x) < 4,
-                          lambda x: len(x) < 4
-                          ]
-        # As we build the MovieItem, we store the film title in the variable film since we will need it
-        # later when constructing the CastItems, DirectorItems, DistributorItems, and ProductionCoItems.
-        m_item = MovieItem()
-        film = get_movie_fields(film_paths)
-        m_item["film"] = film
-        budget = get_movie_fields(budget_paths)
-        m_item["budget"] = budget
-        box_office = get_movie_fields(box_office_paths)
-        m_item["box_office"] = box_office
-        release_date = get_release_date(rows_path, rel_paths, condition_list)
-        m_item["release_date"] = release_date
-        yield m_item
-        # Construct and yield the CastItems, DirectorItems, DistributorItems, and ProductionCoItems.
-        field_names = ["actor_name", "director", "distributor", "prod_co"]
-        for field_name in field_names:
-            if build_items(response, film, field_name):
-                for b_item in build_items(response, film, field_name):
-                    yield b_item
-
+        # Responses built outside of a crawl (e.g. from an archive) are not tied to a request, and have no meta.
+        validators = response.meta.get("page_validators") if response.request is not None else None
+        if self.checkpoint is not None and response.request is not None:
+            validators = {**(validators or {}), "listed_url": self.request_url(response)}
+        if self.seen is not None and response.request is not None:
+            seen_urls = [*response.meta.get("redirect_urls", []), response.request.url, response.url]
+            validators = {**(validators or {}), "seen_urls": seen_urls}
+        yield from self.film_items(extract_film(response), validators)
+
+    def film_items(self, fields: Dict, validators: Optional[Dict] = None) -> Generator[scrapy.Item, None, None]:
+        """
+        Produce the items of a film from its extracted fields.
 
+        First, we produce a MovieItem with fields 'film', 'budget', 'box_office', and 'release_date'.
+        Next, we produce: DirectorItems with fields 'film', 'director', DistributorItems with fields
+        'film' and 'distributor', ProductionCoItem with fields 'film' and 'prod_co' and CastItems
+        with fields 'film' and 'actor_name'. Every item also has the 'page_id' key of the film.
 
+        If the FILM_RECORDS setting is True, a single FilmRecord is produced instead, with the fields
+        of the MovieItem and the lists 'cast', 'directors', 'distributors', and 'prod_cos'. In incremental
+        mode, the record also carries the page's 'url', 'etag', 'last_modified', and 'revision_id', as
+        found by the IncrementalMiddleware, in resumable mode the 'listed_url' it was requested with, and
+        with a seen-set the 'seen_urls' the film is known by.
 
+        Args:
+            fields (Dict): The fields of the film, as returned by extract_film.
+            validators (Optional[Dict]): The validators of the film page in incremental mode, its
+                listed_url in resumable mode, and its seen_urls with a seen-set.
 
+        Yields:
+            (scrapy.Item): A MovieItem, CastItem(s), DirectorItem(s), ProductionCoItem(s),
+            and DistributorItem(s), or a FilmRecord.
+        """
+        page_id = fields["page_id"]
+        film = fields["film"]
+        movie_fields = {field_name: fields[field_name]
+                        for field_name in ["page_id", "film", "budget", "box_office", "release_date"]}
+        # With the FILM_RECORDS setting, the names are collected into a single FilmRecord instead.
+        if self.settings.getbool("FILM_RECORDS"):
+            record_fields = {record_field: fields[field_name] for field_name, record_field in RECORD_FIELDS.items()}
+            yield FilmRecord(**movie_fields, **record_fields, **(validators or {}))
+            return
+        yield MovieItem(**movie_fields)
+        # Construct and yield the CastItems, DirectorItems, DistributorItems, and ProductionCoItems.
+        name_items = {"actor_name": CastItem, "director": DirectorItem,
+                      "distributor": DistributorItem, "prod_co": ProductionCoItem}
+        for field_name, item in name_items.items():
+            for name in fields[field_name]:
+                yield item(page_id=page_id, film=film, **{field_name: name})
@@ -0,0 +1,193 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import time
+import uuid
+
+from decimal import Decimal
+from typing import List, Optional, Text
+
+import scrapy
+from scrapy.statscollectors import StatsCollector
+
+from . import items
+
+logger = logging.getLogger(__name__)
+
+# The suffix of the finished shards; a shard is written as SUFFIX + ".part" and renamed once it is closed.
+SUFFIX = ".jsonl.gz"
+# A lower compression level than gzip's default, which costs a few percent in size but is much faster to write.
+COMPRESS_LEVEL = 6
+# The item classes which may be spooled, keyed by name, and the fields holding Decimal amounts.
+ITEM_CLASSES = {item_class.__name__: item_class
+                for item_class in [items.CastItem, items.DirectorItem, items.DistributorItem,
+                                   items.MovieItem, items.ProductionCoItem, items.FilmRecord]}
+DECIMAL_FIELDS = ("budget", "box_office")
+
+
+def dump_item(item: scrapy.Item) -> Text:
+    """
+    Serialize a cleaned item as a line of JSON, holding its class in 'type' and its amounts as strings.
+    """
+    return json.dumps({"type": type(item).__name__, **{field: item[field] for field in item.keys()}},
+                      default=str, ensure_ascii=False)
+
+
+def load_item(line: Text) -> scrapy.Item:
+    """
+    Rebuild an item from a line written by dump_item.
+    """
+    fields = json.loads(line)
+    item_class = ITEM_CLASSES[fields.pop("type")]
+    for field in DECIMAL_FIELDS:
+        if fields.get(field) is not None:
+            fields[field] = Decimal(fields[field])
+    return item_class(**fields)
+
+
+def shard_paths(spool_dir: Text) -> List[Text]:
+    """
+    Get the paths of the finished shards in the spool directory, in the order they were written.
+    """
+    return sorted(glob.glob(os.path.join(spool_dir, "*" + SUFFIX)))
+
+
+def read_shard(path: Text) -> List[scrapy.Item]:
+    """
+    Read the items of a shard.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as shard:
+        return [load_item(line) for line in shard]
+
+
+class SpoolPipeline:
+    """
+    This class is used to spool the cleaned items to compressed JSONL shard files instead of writing them to MySQL.
+
+    With SPOOL_DIR set, RoutingPipeline ends each chain with this pipeline in place of DBPipeline, so the
+    crawl never waits on the database. Each item is written as a line of JSON to the open shard, which
+    is closed and a new one opened every SPOOL_SHARD_SIZE items. The shards are named after the spider,
+    the start of the crawl, and a random id (so several shards of a crawl can share SPOOL_DIR), and
+    only get their final name once they are complete. They are loaded with data_collection.bulkload.
+
+    Attributes:
+        spool_dir (Text): the directory the shards are written to
+        shard_size (int): the number of items per shard
+        stats (Optional[scrapy.statscollectors.StatsCollector]): the crawler's stats collector
+        prefix (Optional[Text]): the start of the name of each shard of this crawl
+        shard (Optional[gzip.GzipFile]): the open shard
+        shard_path (Optional[Text]): the final path of the open shard
+        shard_items (int): the number of items in the open shard
+        shard_count (int): the number of shards opened so far
+        checkpoint (Optional[Checkpoint]): the spider's checkpoint in resumable mode, in which the
+            films are marked as persisted once the shard holding them is complete
+        listed_buffer (List[Text]): the listed_url of each FilmRecord in the open shard, in resumable mode
+        seen (Optional[SeenSet]): the spider's seen-set if SEEN_PATH is set, to which the films are
+            added once the shard holding them is complete
+        seen_buffer (List[Text]): the seen_urls of each FilmRecord in the open shard, with a seen-set
+    """
+    def __init__(self, spool_dir: Text, shard_size: int = 50000, stats: Optional[StatsCollector] = None):
+        self.spool_dir = spool_dir
+        self.shard_size = shard_size
+        self.stats = stats
+        self.prefix = None
+        self.shard = None
+        self.shard_path = None
+        self.shard_items = 0
+        self.shard_count = 0
+        self.checkpoint = None
+        self.listed_buffer = []
+        self.seen = None
+        self.seen_buffer = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Build the pipeline from the SPOOL_DIR and SPOOL_SHARD_SIZE settings.
+        """
+        return cls(crawler.settings.get("SPOOL_DIR"), crawler.settings.getint("SPOOL_SHARD_SIZE", 50000),
+                   crawler.stats)
+
+    def open_spider(self, actors_wiki_spider: scrapy.Spider) -> None:
+        """
+        Create the spool directory, and share the spider's checkpoint and seen-set, if it has them.
+
+        Args:
+            actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
+                for movie info for each movie in the US over the years 2003-2022 (inclusive).
+
+        Returns:
+            None
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.prefix = f"{actors_wiki_spider.name}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.checkpoint = getattr(actors_wiki_spider, "checkpoint", None)
+        self.seen = getattr(actors_wiki_spider, "seen", None)
+
+    def process_item(self, item: scrapy.Item, actors_wiki_spider: scrapy.Spider) -> scrapy.Item:
+        """
+        Write the item to the open shard, opening a new shard first if there is none.
+
+        Args:
+            item (scrapy.Item): A CastItem, a DirectorItem, a DistributorItem, a MovieItem,
+                a ProductionCoItem, or a FilmRecord.
+            actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
+                for movie info for each movie in the US over the years 2003-2022 (inclusive).
+
+        Returns:
+            item (scrapy.Item): The item unmodified.
+        """
+        if self.shard is None:
+            self.shard_count += 1
+            self.shard_path = os.path.join(self.spool_dir, f"{self.prefix}-{self.shard_count:05d}{SUFFIX}")
+            self.shard = gzip.open(self.shard_path + ".part", "wt", encoding="utf-8", compresslevel=COMPRESS_LEVEL)
+        self.shard.write(dump_item(item) + "\n")
+        self.shard_items += 1
+        if item.get("listed_url"):
+            self.listed_buffer.append(item.get("listed_url"))
+        if item.get("seen_urls"):
+            self.seen_buffer.extend(item.get("seen_urls"))
+        if self.stats is not None:
+            self.stats.inc_value("spool/items")
+        if self.shard_items >= self.shard_size:
+            self.close_shard()
+        return item
+
+    def close_shard(self) -> None:
+        """
+        Close the open shard and give it its final name. In resumable mode, its films are then marked
+        as persisted, and with a seen-set, they are added to the set.
+
+        Returns:
+            None
+        """
+        self.shard.close()
+        os.replace(self.shard_path + ".part", self.shard_path)
+        logger.info(f"Spooled {self.shard_items} items to {self.shard_path}")
+        if self.checkpoint is not None and self.listed_buffer:
+            self.checkpoint.mark_films(self.listed_buffer)
+        if self.seen is not None and self.seen_buffer:
+            self.seen.mark_films(self.seen_buffer)
+        if self.stats is not None:
+            self.stats.inc_value("spool/shards")
+        self.shard = None
+        self.shard_path = None
+        self.shard_items = 0
+        self.listed_buffer = []
+        self.seen_buffer = []
+
+    def close_spider(self, actors_wiki_spider: scrapy.Spider) -> None:
+        """
+        Close the open shard, if there is one.
+
+        Args:
+            actors_wiki_spider (scrapy.Spider): The spider we used to scrape wikipedia
+                for movie info for each movie in the US over the years 2003-2022 (inclusive).
+
+        Returns:
+            None
+        """
+        if self.shard is not None:
+            self.close_shard()
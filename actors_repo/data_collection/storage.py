@@ -0,0 +1,284 @@
+import math
+import os
+import re
+import sqlite3
+import sys
+
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import List, Optional, Set, Text, Tuple
+
+import pymysql
+from dotenv import load_dotenv
+
+from . import migrations
+
+load_dotenv()
+
+# The MySQL errors after which a transaction is rolled back and retried: lock wait timeout and deadlock.
+RETRYABLE_ERRORS = (1205, 1213)
+
+# The amounts are bound as exact decimal strings.
+sqlite3.register_adapter(Decimal, str)
+
+
+class StorageBackend(ABC):
+    """
+    This abstract class is used as an interface to the database storing the actors_wiki tables.
+
+    Each backend connects to its database, applies the pending schema migrations (see migrations.py),
+    which create the actors, directors, distributors, productionco, movies, filmdirectors, filmdistributors,
+    filmprodco, castlist, and pages tables and their indexes, and gives the pieces of SQL which differ between the databases, so that DBPipeline, the bulk
+    loader, and the analytics run the same statements on any backend.
+
+    Attributes:
+        name (Text): the name of the backend, as set in DB_BACKEND
+        param (Text): the placeholder of a query parameter
+        insert_ignore (Text): the start of an INSERT statement which skips the rows breaking a unique key
+        drop_temporary (Text): the start of a statement dropping a temporary table
+        Error (Type[Exception]): the base class of the errors raised by the driver
+    """
+    name = None
+    param = "%s"
+    insert_ignore = "INSERT IGNORE"
+    drop_temporary = "DROP TEMPORARY TABLE"
+    Error = Exception
+
+    @abstractmethod
+    def connect(self, migrate: bool = True):
+        """
+        Connect to the actors_wiki database, applying the migrations missing from its schema.
+
+        Args:
+            migrate (bool): Whether to create the database and apply the migrations; readers such as
+                the analytics pass False, so that they neither wait for nor change the schema.
+
+        Returns:
+            The DB-API connection, whose transactions are committed with commit().
+        """
+        pass
+
+    @abstractmethod
+    def upsert(self, key: Text, columns: List[Text]) -> Text:
+        """
+        Get the clause ending an INSERT statement which updates the columns of the row with the same key instead.
+        """
+        pass
+
+    @abstractmethod
+    def update_from(self, table: Text, source: Text, key: Text, columns: List[Text]) -> Text:
+        """
+        Get the statement updating the columns of the table's rows from the source table's rows with the same key.
+        """
+        pass
+
+    @abstractmethod
+    def is_retryable(self, err: Exception) -> bool:
+        """
+        Check whether a transaction which failed with the error should be rolled back and retried.
+        """
+        pass
+
+    @abstractmethod
+    def lock_schema(self, cursor) -> None:
+        """
+        Wait until no other connection is applying migrations, and keep them from doing so until unlock_schema.
+        """
+        pass
+
+    @abstractmethod
+    def unlock_schema(self, cursor) -> None:
+        """
+        Release the lock taken by lock_schema, once the migrations are committed or rolled back.
+        """
+        pass
+
+    @abstractmethod
+    def used_indexes(self, cursor, query: Text) -> Set[Text]:
+        """
+        Get the names of the indexes the query plan of the database uses for the query.
+        """
+        pass
+
+
+class MySQLBackend(StorageBackend):
+    """
+    This class is used to store the tables in the actors_wiki database of a MySQL server.
+
+    Attributes:
+        u (Text): the username to use for logging into MySQL (set
+            as an environment variable)
+        p (Text): the password to use for logging into MySQL (set
+            as an environment variable)
+        h (Text): the hostname to use for logging into MySQL (set
+            as an environment variable)
+        partition_years (Optional[Tuple[int, int]]): the first and last years of the partitions of the
+            movies table (see DB_PARTITION_YEARS), or None to leave movies unpartitioned
+    """
+    name = "mysql"
+    Error = pymysql.Error
+
+    def __init__(self, partition_years: Optional[Tuple[int, int]] = None):
+        self.u = os.environ.get('DB_USER')
+        self.p = os.environ.get('DB_PSWD')
+        self.h = os.environ.get('DB_HOST')
+        self.partition_years = partition_years
+
+    def connect(self, migrate: bool = True) -> pymysql.connections.Connection:
+        if not migrate:
+            return pymysql.connect(user=self.u, password=self.p, host=self.h, database='actors_wiki')
+        conn = pymysql.connect(user=self.u, password=self.p, host=self.h)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """CREATE DATABASE IF NOT EXISTS actors_wiki
+                DEFAULT CHARACTER SET utf8"""
+                )
+        except pymysql.Error as err:
+            print(f"Failed creating database: {err}")
+            sys.exit()
+
+        cursor.execute("USE actors_wiki")
+        conn.database = 'actors_wiki'
+        # Each query sees the rows committed by the other writers (e.g. other shards) so far, and the
+        # reads take fewer gap locks than under the default REPEATABLE READ.
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        cursor.close()
+        migrations.migrate(conn, self, ["partition_movies"] if self.partition_years else [])
+        if self.partition_years:
+            migrations.partition_movies(conn, self, *self.partition_years)
+        return conn
+
+    def upsert(self, key: Text, columns: List[Text]) -> Text:
+        updates = ",\n".join(f"{column} = VALUES({column})" for column in columns)
+        return f"ON DUPLICATE KEY UPDATE\n{updates}"
+
+    def update_from(self, table: Text, source: Text, key: Text, columns: List[Text]) -> Text:
+        # A temporary source table can only be opened once per statement, so it is joined rather than queried.
+        updates = ",\n".join(f"{table}.{column} = {source}.{column}" for column in columns)
+        return f"UPDATE {table}\nJOIN {source} ON {source}.{key} = {table}.{key}\nSET\n{updates}"
+
+    def is_retryable(self, err: Exception) -> bool:
+        return bool(err.args) and err.args[0] in RETRYABLE_ERRORS
+
+    def lock_schema(self, cursor) -> None:
+        # A named lock, as MySQL commits each statement changing the schema on its own.
+        cursor.execute("SELECT GET_LOCK('actors_wiki.schema', 600)")
+        cursor.fetchone()
+
+    def unlock_schema(self, cursor) -> None:
+        cursor.execute("SELECT RELEASE_LOCK('actors_wiki.schema')")
+        cursor.fetchone()
+
+    def used_indexes(self, cursor, query: Text) -> Set[Text]:
+        cursor.execute("EXPLAIN " + query)
+        key = [column[0] for column in cursor.description].index("key")
+        return {row[key] for row in cursor.fetchall() if row[key]}
+
+
+class StdDev:
+    """
+    This class is used as SQLite's STDDEV aggregate, the population standard deviation, as in MySQL.
+
+    Attributes:
+        count (int): the number of values
+        mean (float): the running mean of the values
+        m2 (float): the running sum of the squared differences from the mean
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def step(self, value) -> None:
+        if value is None:
+            return
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self) -> Optional[float]:
+        return math.sqrt(self.m2 / self.count) if self.count else None
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    This class is used to store the tables in a single SQLite file, which needs no server.
+
+    The file is in WAL mode with synchronous=NORMAL, so the batches written by DBPipeline are large
+    transactions which do not block the readers, and a writer waits up to timeout seconds for a lock
+    held by another process (e.g. another shard) before the transaction is retried. The name columns
+    are case insensitive, as with MySQL's default collation, and the connection has a STDDEV aggregate.
+
+    Attributes:
+        path (Text): the path of the SQLite file
+        timeout (float): the number of seconds to wait for a lock
+    """
+    name = "sqlite"
+    param = "?"
+    insert_ignore = "INSERT OR IGNORE"
+    drop_temporary = "DROP TABLE"
+    Error = sqlite3.Error
+
+    def __init__(self, path: Text, timeout: float = 30):
+        self.path = path
+        self.timeout = timeout
+
+    def connect(self, migrate: bool = True) -> sqlite3.Connection:
+        # The connection is made on the reactor thread and used by DBPipeline's writer thread.
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.create_aggregate("STDDEV", 1, StdDev)
+        if migrate:
+            migrations.migrate(conn, self)
+        return conn
+
+    def upsert(self, key: Text, columns: List[Text]) -> Text:
+        updates = ",\n".join(f"{column} = excluded.{column}" for column in columns)
+        return f"ON CONFLICT({key}) DO UPDATE SET\n{updates}"
+
+    def update_from(self, table: Text, source: Text, key: Text, columns: List[Text]) -> Text:
+        updates = ",\n".join(f"{column} = {source}.{column}" for column in columns)
+        return f"UPDATE {table}\nSET\n{updates}\nFROM {source}\nWHERE {source}.{key} = {table}.{key}"
+
+    def is_retryable(self, err: Exception) -> bool:
+        return isinstance(err, sqlite3.OperationalError) and "locked" in str(err)
+
+    def lock_schema(self, cursor) -> None:
+        # The write lock is held until the transaction applying the migrations ends.
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def unlock_schema(self, cursor) -> None:
+        pass
+
+    def used_indexes(self, cursor, query: Text) -> Set[Text]:
+        cursor.execute("EXPLAIN QUERY PLAN " + query)
+        plan = [detail for *_, detail in cursor.fetchall()]
+        return {name for detail in plan for name in re.findall(r"USING (?:COVERING )?INDEX (\w+)", detail)}
+
+
+def open_backend(name: Text = "mysql", path: Optional[Text] = None,
+                 partition_years: Optional[Tuple[int, int]] = None) -> StorageBackend:
+    """
+    Get the storage backend selected by the DB_BACKEND, DB_PATH, and DB_PARTITION_YEARS settings.
+
+    Args:
+        name (Text): Either 'mysql' or 'sqlite'.
+        path (Optional[Text]): The path of the SQLite file.
+        partition_years (Optional[Tuple[int, int]]): The first and last years of the partitions of the
+            movies table; SQLite has no partitions, so they are ignored there.
+
+    Returns:
+        (StorageBackend): The backend.
+
+    Raises:
+        ValueError: if the backend is unknown.
+    """
+    if name == "mysql":
+        return MySQLBackend(partition_years)
+    if name == "sqlite":
+        return SQLiteBackend(path or "actors_wiki.sqlite")
+    raise ValueError(f"Unknown DB_BACKEND {name!r}, expected 'mysql' or 'sqlite'")
@@ -0,0 +1,386 @@
+import re
+from hashlib import blake2b
+from typing import Dict, List, Optional, Text, Tuple
+
+# The start of the film infobox template in an article's wikitext.
+INFOBOX_START = re.compile(r"\{\{\s*Infobox[ _]film\b", re.IGNORECASE)
+# Markup which never contributes to a field: comments, references, and footnotes.
+NOISE = re.compile(r"<!--.*?-->|<ref[^>]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+LINE_BREAK = re.compile(r"<br\s*/?>|\n", re.IGNORECASE)
+LINK = re.compile(r"\[\[(?:[^\[\]|]*\|)?([^\[\]]*)\]\]")
+HTML_TAG = re.compile(r"<[^>]+>")
+# Templates which wrap a list of names, either as bullets after their first pipe or as their parameters.
+BULLET_LISTS = {"plainlist", "plain list", "flatlist", "flat list"}
+PARAM_LISTS = {"ubl", "unbulleted list", "hlist", "bulleted list", "ublist"}
+# Templates which are rendered as their last unnamed parameter, and currency templates rendered as "$".
+PASSTHROUGH = {"nowrap", "nobr", "small", "lang", "nowrap begin", "avoid wrap", "abbr", "nobold"}
+DOLLARS = {"us$", "usd", "us dollar"}
+# The infobox parameters holding each name field.
+NAME_PARAMS = {"actor_name": ["starring"],
+               "director": ["director"],
+               "distributor": ["distributor"],
+               "prod_co": ["production_companies", "production_company", "studio"]
+               }
+US_LOCATIONS = re.compile(r"United States|\bUS\b|\bU\.S\.")
+# The level 2 section headings of a page, and the italic links to the films in a List of American films page.
+SECTION_HEADING = re.compile(r"^==([^=].*?)==\s*$", re.MULTILINE)
+ITALIC_LINK = re.compile(r"''\s*\[\[([^\[\]|#]+)")
+
+
+def matching_braces(text: Text, start: int) -> int:
+    """
+    Find the end of the template starting at start.
+
+    Args:
+        text (Text): The wikitext.
+        start (int): The index of the template's opening '{{'.
+
+    Returns:
+        (int): The index just past the template's closing '}}', or the length of the text if it is not closed.
+    """
+    depth = 0
+    i = start
+    while i < len(text) - 1:
+        pair = text[i:i + 2]
+        if pair == "{{":
+            depth += 1
+            i += 2
+        elif pair == "}}":
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return len(text)
+
+
+def split_top_level(text: Text, sep: Text = "|") -> List[Text]:
+    """
+    Split the text on the separators which are not inside a nested template or link.
+
+    Args:
+        text (Text): The inside of a template.
+        sep (Text): The separator.
+
+    Returns:
+        (List[Text]): The template name followed by its parameters.
+    """
+    parts = []
+    depth = 0
+    last = 0
+    i = 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        if pair in ("{{", "[["):
+            depth += 1
+            i += 2
+        elif pair in ("}}", "]]"):
+            depth -= 1
+            i += 2
+        else:
+            if text[i] == sep and depth == 0:
+                parts.append(text[last:i])
+                last = i + 1
+            i += 1
+    parts.append(text[last:])
+    return parts
+
+
+def template_params(template: Text) -> Tuple[Text, List[Text], Dict[Text, Text]]:
+    """
+    Split a template into its name, its unnamed parameters, and its named parameters.
+
+    Args:
+        template (Text): The template, including its braces.
+
+    Returns:
+        (Tuple[Text, List[Text], Dict[Text, Text]]): The lowercased name, the unnamed parameters in order,
+        and the named parameters keyed by their lowercased, stripped names.
+    """
+    name, *params = split_top_level(template[2:-2])
+    unnamed = []
+    named = {}
+    for param in params:
+        key, equals, value = param.partition("=")
+        # An '=' inside a nested template or link does not make the parameter named.
+        if equals and "{{" not in key and "[[" not in key:
+            named[key.strip().lower()] = value.strip()
+        else:
+            unnamed.append(param)
+    return name.strip().lower().replace("_", " "), unnamed, named
+
+
+def templates(text: Text) -> List[Tuple[int, int]]:
+    """
+    Find the top level templates in the text.
+
+    Args:
+        text (Text): The wikitext.
+
+    Returns:
+        (List[Tuple[int, int]]): The start and end index of each template, in order.
+    """
+    spans = []
+    i = text.find("{{")
+    while i != -1:
+        end = matching_braces(text, i)
+        spans.append((i, end))
+        i = text.find("{{", end)
+    return spans
+
+
+def infobox_params(wikitext: Text) -> Dict[Text, Text]:
+    """
+    Get the named parameters of the article's film infobox.
+
+    Args:
+        wikitext (Text): The wikitext of a film article.
+
+    Returns:
+        (Dict[Text, Text]): The values of the infobox parameters, without comments and references,
+        keyed by parameter name; empty if the article has no film infobox.
+    """
+    match = INFOBOX_START.search(wikitext)
+    if not match:
+        return {}
+    infobox = wikitext[match.start():matching_braces(wikitext, match.start())]
+    return template_params(NOISE.sub("", infobox))[2]
+
+
+def render_template(template: Text) -> Text:
+    """
+    Render the few inline templates found in infobox values as plain text; the others are dropped.
+
+    Args:
+        template (Text): The template, including its braces.
+
+    Returns:
+        (Text): The rendered template.
+    """
+    name, unnamed, _ = template_params(template)
+    if name in PASSTHROUGH and unnamed:
+        return render(unnamed[-1])
+    if name in DOLLARS and unnamed:
+        return "$" + render(unnamed[0])
+    return ""
+
+
+def render(text: Text) -> Text:
+    """
+    Render wikitext as plain text: templates as in render_template, links as their label, and no html tags.
+
+    Args:
+        text (Text): The wikitext.
+
+    Returns:
+        (Text): The plain text.
+    """
+    pieces = []
+    last = 0
+    for start, end in templates(text):
+        pieces.append(text[last:start])
+        pieces.append(render_template(text[start:end]))
+        last = end
+    pieces.append(text[last:])
+    text = LINK.sub(r"\1", "".join(pieces))
+    return HTML_TAG.sub("", text).replace("'''", "").replace("''", "")
+
+
+def list_entries(value: Text) -> List[Text]:
+    """
+    Split an infobox value into its entries: the items of a list template, or the lines of the value.
+
+    Args:
+        value (Text): The value of an infobox parameter.
+
+    Returns:
+        (List[Text]): The wikitext of each entry.
+    """
+    entries = []
+    last = 0
+    for start, end in templates(value):
+        name, unnamed, _ = template_params(value[start:end])
+        if name in BULLET_LISTS:
+            entries.extend(LINE_BREAK.split(value[last:start]))
+            entries.extend(line.lstrip("*# ") for param in unnamed for line in LINE_BREAK.split(param))
+            last = end
+        elif name in PARAM_LISTS:
+            entries.extend(LINE_BREAK.split(value[last:start]))
+            entries.extend(unnamed)
+            last = end
+    entries.extend(LINE_BREAK.split(value[last:]))
+    return [entry.lstrip("*# ") for entry in entries if entry.strip()]
+
+
+def first_line(value: Optional[Text], prefer: Optional[Text] = None) -> Optional[Text]:
+    """
+    Render the first entry of an infobox value, as the html extractor takes the first text of a cell.
+
+    Args:
+        value (Optional[Text]): The value of an infobox parameter.
+        prefer (Optional[Text]): If set, the first entry containing this text is taken instead, if there is one.
+
+    Returns:
+        (Optional[Text]): The first non-empty entry as plain text, or None.
+    """
+    texts = [text for text in (render(entry).strip() for entry in list_entries(value or "")) if text]
+    if prefer:
+        for text in texts:
+            if prefer in text:
+                return text
+    return texts[0] if texts else None
+
+
+def names(value: Optional[Text]) -> List[Text]:
+    """
+    Get the names listed in an infobox value.
+
+    As in the html extractor, the labels of the links in every entry come first, followed by the text
+    around the links, so that text like "(uncredited)" becomes a separate name which is later dropped.
+
+    Args:
+        value (Optional[Text]): The value of an infobox parameter.
+
+    Returns:
+        (List[Text]): The stripped, non-empty names.
+    """
+    links = []
+    texts = []
+    for entry in list_entries(value or ""):
+        last = 0
+        for link in LINK.finditer(entry):
+            texts.append(entry[last:link.start()])
+            links.append(link.group(1))
+            last = link.end()
+        texts.append(entry[last:])
+    return [name for name in (render(text).strip() for text in links + texts) if name]
+
+
+def release_date(value: Optional[Text]) -> Optional[Text]:
+    """
+    Get the release date from an infobox value, preferring the release in the United States.
+
+    The {{Film date}} and {{Start date}} templates are turned into YYYY-MM-DD (or YYYY-MM, or YYYY)
+    dates; otherwise the first entry of the value is returned as plain text, e.g. "June 15, 2005".
+
+    Args:
+        value (Optional[Text]): The value of the infobox's released parameter.
+
+    Returns:
+        (Optional[Text]): The release date, or None.
+    """
+    value = value or ""
+    releases = []
+    for start, end in templates(value):
+        name, unnamed, _ = template_params(value[start:end])
+        params = [param.strip() for param in unnamed]
+        if name == "film date":
+            # Film date takes a (year, month, day, location) for each release.
+            groups = [params[k:k + 4] for k in range(0, len(params), 4)]
+        elif name == "start date":
+            groups = [params[:3]]
+        else:
+            continue
+        for group in groups:
+            year, month, day, location = (group + ["", "", ""])[:4]
+            if not year.isdigit():
+                continue
+            parts = [year]
+            if month.isdigit():
+                parts.append(month.zfill(2))
+                if day.isdigit():
+                    parts.append(day.zfill(2))
+            releases.append(("-".join(parts), location))
+    if releases:
+        for date, location in releases:
+            if US_LOCATIONS.search(location):
+                return date
+        return releases[0][0]
+    return first_line(value)
+
+
+def extract_film(title: Text, wikitext: Text, page_id: Optional[int] = None) -> Dict:
+    """
+    Extract the film's page key, title, budget, box office, release date, and names from its wikitext.
+
+    This is the counterpart of infobox.extract_film for the pages fetched through the API, or read from a dump.
+
+    Args:
+        title (Text): The title of the article.
+        wikitext (Text): The wikitext of the article.
+        page_id (Optional[int]): The article id of the page, if it is known.
+
+    Returns:
+        (Dict): The 'page_id' of the film (see page_key), its 'film', 'budget', 'box_office', and
+        'release_date' (each a string or None), and the lists of 'actor_name', 'director', 'distributor',
+        and 'prod_co' names.
+    """
+    params = infobox_params(wikitext)
+    film = first_line(params.get("name")) or re.sub(r"\s*\([^()]*film\)$", "", title)
+    fields = {"page_id": page_key(page_id, title),
+              "film": film,
+              "budget": first_line(params.get("budget")),
+              "box_office": first_line(params.get("gross"), prefer="total"),
+              "release_date": release_date(params.get("released"))
+              }
+    for item_field, keys in NAME_PARAMS.items():
+        fields[item_field] = [name for key in keys for name in names(params.get(key))]
+    return fields
+
+
+def page_key(page_id: Optional[int], title: Text) -> int:
+    """
+    Get the integer key identifying a film's article in the movies table.
+
+    The key is the article id of the page, which survives renames and tells apart the films with the
+    same title. When the id is not known, the key is a hash of the normalized title of the article
+    instead, which is negative so that it never collides with an article id.
+
+    Args:
+        page_id (Optional[int]): The article id of the page (wgArticleId), or None (or 0) if it is not known.
+        title (Text): The title of the article, or the target of a link to it, e.g. 'The_Film_(2005_film)'.
+
+    Returns:
+        (int): The article id, or a negative 56 bit hash of the title.
+    """
+    if page_id:
+        return int(page_id)
+    digest = blake2b(normalize_title(title).encode("utf-8"), digest_size=7).digest()
+    return -1 - int.from_bytes(digest, "big")
+
+
+def normalize_title(title: Text) -> Text:
+    """
+    Normalize a link target as MediaWiki does for article titles.
+
+    Args:
+        title (Text): The target of a link, e.g. 'the_Film_(2005_film)#Cast'.
+
+    Returns:
+        (Text): The title of the article, e.g. 'The Film (2005 film)'.
+    """
+    title = " ".join(title.split("#")[0].replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def list_titles(wikitext: Text) -> List[Text]:
+    """
+    Get the titles of the films in a List of American films page.
+
+    As in parse_list, only the films listed in the January, April, July, and October sections are taken.
+
+    Args:
+        wikitext (Text): The wikitext of a List of American films page.
+
+    Returns:
+        (List[Text]): The normalized titles of the films, in the order they are listed.
+    """
+    headings = list(SECTION_HEADING.finditer(wikitext))
+    titles = []
+    for heading, following in zip(headings, headings[1:] + [None]):
+        if not any(month in heading.group(1) for month in ["January", "April", "July", "October"]):
+            continue
+        section = wikitext[heading.end():following.start() if following else len(wikitext)]
+        titles.extend(normalize_title(link) for link in ITALIC_LINK.findall(section))
+    return titles
@@ -0,0 +1 @@
+# This package contains the tools for running the spider against local stand-ins.
@@ -0,0 +1,107 @@
+"""
+Check that the spider's API mode parses the recorded fixtures as expected, without a network or a database.
+
+From the actors_repo directory, run:
+    python -m tools.check_fixtures [FIXTURES_DIR] [--update]
+
+Each list page under FIXTURES_DIR/wiki is parsed by parse_list with FETCH_MODE = "api" and FILM_RECORDS = True,
+each API request it makes is answered from its fixture (found as by the wiki_stub server) and parsed by
+parse_api, following the continuations, and the records are cleaned by the DropEmptyPipeline, DatePipeline,
+and MoneyPipeline. The cleaned records are then compared with FIXTURES_DIR/expected.jsonl, one record per line
+as written by the spool; with --update, the file is written instead. The exit status is 1 if a request has
+no fixture or the records differ from the expected ones.
+"""
+import argparse
+import glob
+import os
+import sys
+
+from collections import deque
+from typing import List, Text
+from urllib.parse import urlsplit
+
+import scrapy
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.utils.project import get_project_settings
+
+from data_collection.pipelines import DatePipeline, DropEmptyPipeline, MoneyPipeline
+from data_collection.reparse import clean_items
+from data_collection.spiders.actors_wiki_spider import Actorswiki
+from data_collection.spool import dump_item
+from tools.wiki_stub import fixture_path
+
+# The WIKI_URL of the requests, which the fixtures do not depend on.
+WIKI_URL = "http://localhost:8080"
+
+
+def parse_fixtures(fixtures_dir: Text) -> List[scrapy.Item]:
+    """
+    Parse the list pages of the fixtures and the API batches they request, as described above.
+
+    Args:
+        fixtures_dir (Text): The directory of the fixtures.
+
+    Returns:
+        (List[scrapy.Item]): The cleaned FilmRecords, in the order they were produced.
+
+    Raises:
+        FileNotFoundError: if a request has no fixture.
+    """
+    settings = get_project_settings()
+    settings.setdict({"FETCH_MODE": "api", "FILM_RECORDS": True, "WIKI_URL": WIKI_URL})
+    spider = Actorswiki()
+    spider.settings = settings
+    stages = [DropEmptyPipeline(), DatePipeline(), MoneyPipeline()]
+    counts = {"dropped": 0, "errors": 0}
+    records = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "wiki", "List_of_American_films_of_*.html"))):
+        with open(path, "rb") as page:
+            response = HtmlResponse(url=f"{WIKI_URL}/wiki/{os.path.basename(path)[:-len('.html')]}",
+                                    body=page.read(), encoding="utf-8")
+        requests = deque(spider.parse_list(response))
+        while requests:
+            request = requests.popleft()
+            parts = urlsplit(request.url)
+            fixture = fixture_path(fixtures_dir, f"{parts.path}?{parts.query}")
+            if not os.path.exists(fixture):
+                raise FileNotFoundError(f"No fixture for {request.url} (expected at {fixture})")
+            with open(fixture, "rb") as batch:
+                response = TextResponse(url=request.url, body=batch.read(), encoding="utf-8", request=request)
+            items = []
+            for result in spider.parse_api(response, **request.cb_kwargs):
+                if isinstance(result, scrapy.Request):
+                    requests.append(result)
+                else:
+                    items.append(result)
+            records.extend(clean_items(items, stages, spider, counts))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures_dir", nargs="?", default="fixtures", help="the directory of the fixtures")
+    parser.add_argument("--update", action="store_true", help="write the records to expected.jsonl")
+    args = parser.parse_args()
+
+    try:
+        lines = [dump_item(record) for record in parse_fixtures(args.fixtures_dir)]
+    except FileNotFoundError as err:
+        print(f"FAIL {err}")
+        sys.exit(1)
+    expected_path = os.path.join(args.fixtures_dir, "expected.jsonl")
+    if args.update:
+        with open(expected_path, "w", encoding="utf-8") as expected_file:
+            expected_file.writelines(line + "\n" for line in lines)
+        print(f"Wrote the {len(lines)} records to {expected_path}")
+        return
+    with open(expected_path, encoding="utf-8") as expected_file:
+        expected = [line.rstrip("\n") for line in expected_file]
+    for line in sorted(set(expected) ^ set(lines)):
+        print(f"{'missing' if line in expected else 'unexpected'} {line}")
+    failed = expected != lines
+    print(f"{'FAIL' if failed else 'ok':>4} {len(lines)} records parsed from the fixtures in {args.fixtures_dir}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+A local stand-in for wikipedia which serves recorded fixtures, so the spider can be run offline.
+
+From the actors_repo directory, run:
+    python -m tools.wiki_stub FIXTURES_DIR [--port 8080] [--record https://en.wikipedia.org]
+
+and point the spider at it with
+    scrapy crawl actors_wiki_spider -s WIKI_URL=http://localhost:8080 -s FETCH_MODE=api
+
+Pages under /wiki/ are served from FIXTURES_DIR/wiki/<title>.html, and API queries from
+FIXTURES_DIR/api/<key>.json, where the key is a hash of the query parameters (with the titles
+sorted, so a batch matches whatever the order of its titles). With --record, the requests which
+have no fixture are forwarded to the given wiki and their responses are saved as fixtures.
+"""
+import argparse
+import hashlib
+import os
+import urllib.error
+import urllib.request
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Text
+from urllib.parse import parse_qsl, urlsplit
+
+
+def fixture_path(fixtures_dir: Text, url: Text) -> Optional[Text]:
+    """
+    Get the path of the fixture for a request.
+
+    Args:
+        fixtures_dir (Text): The directory of the fixtures.
+        url (Text): The path and query of the request.
+
+    Returns:
+        (Optional[Text]): The path of the fixture, or None if the request is neither for a page nor for the API.
+    """
+    parts = urlsplit(url)
+    if parts.path.startswith("/wiki/"):
+        title = parts.path[len("/wiki/"):].replace("/", "%2F")
+        return os.path.join(fixtures_dir, "wiki", title + ".html")
+    if parts.path == "/w/api.php":
+        params = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            if key == "titles":
+                value = "|".join(sorted(value.split("|")))
+            params.append((key, value))
+        key = hashlib.sha1(repr(sorted(params)).encode()).hexdigest()
+        return os.path.join(fixtures_dir, "api", key + ".json")
+    return None
+
+
+def make_handler(fixtures_dir: Text, record: Optional[Text]):
+    """
+    Build the request handler class serving the fixtures in fixtures_dir, and recording from record if it is set.
+    """
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = fixture_path(fixtures_dir, self.path)
+            if path is None:
+                self.send_error(404)
+                return
+            if not os.path.exists(path) and record:
+                self.record(path)
+            if not os.path.exists(path):
+                self.send_error(404, f"no fixture for {self.path}")
+                return
+            with open(path, "rb") as fixture:
+                body = fixture.read()
+            content_type = "application/json" if path.endswith(".json") else "text/html"
+            self.send_response(200)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def record(self, path: Text) -> None:
+            request = urllib.request.Request(record + self.path,
+                                              headers={"User-Agent": "actors-wiki-fixture-recorder"})
+            try:
+                with urllib.request.urlopen(request) as response:
+                    body = response.read()
+            except urllib.error.HTTPError as err:
+                self.log_error(f"recording {self.path} failed: {err}")
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fixture:
+                fixture.write(body)
+
+    return FixtureHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures_dir")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--record", help="the wiki to record the missing fixtures from, e.g. https://en.wikipedia.org")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("localhost", args.port), make_handler(args.fixtures_dir, args.record))
+    print(f"Serving {args.fixtures_dir} on http://localhost:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()